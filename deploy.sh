@@ -236,6 +236,16 @@ check_database_structure() {
 build_images() {
     log_info "构建 Docker 镜像..."
     
+    # 各服务各放一份的共享模块必须一致
+    if command -v python3 &> /dev/null; then
+        if ! python3 "$(dirname "$0")/services/check_shared_modules.py"; then
+            log_error "共享模块不一致，停止构建"
+            exit 1
+        fi
+    else
+        log_warning "未找到 python3，跳过共享模块一致性检查"
+    fi
+    
     # 构建前端镜像
     log_info "构建前端镜像..."
     docker-compose build frontend
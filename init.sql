@@ -109,29 +109,143 @@ CREATE TABLE IF NOT EXISTS `messages` (
   `tags` varchar(500) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '标签，逗号分隔',
   `sort_id` int(11) DEFAULT NULL COMMENT '分类ID，用于前端展示',
   `image_url` text COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '图片URL',
+  `preview_html` text COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '列表卡片摘要（入库和编辑时生成）',
+  `content_html` mediumtext COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '渲染后的正文HTML',
+  `content_hash` char(40) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '生成 content_html 时的正文哈希（含渲染版本）',
   `source_channel` varchar(100) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '来源频道',
   `is_pinned` tinyint(1) DEFAULT 0 COMMENT '是否置顶',
   `is_deleted` tinyint(1) DEFAULT 0 COMMENT '是否删除',
+  `click_count` int(11) NOT NULL DEFAULT 0 COMMENT '点击次数（由前端定期从 Redis 合并）',
+  `last_clicked_at` datetime DEFAULT NULL COMMENT '最后点击时间',
   `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
   `updated_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
   PRIMARY KEY (`id`),
   KEY `idx_sort_id` (`sort_id`),
   KEY `idx_created_at` (`created_at`),
+  KEY `idx_sort_created` (`sort_id`,`created_at`),
   KEY `idx_is_pinned` (`is_pinned`),
-  KEY `idx_is_deleted` (`is_deleted`)
+  KEY `idx_is_deleted` (`is_deleted`),
+  KEY `idx_click_count` (`click_count`),
+  KEY `idx_updated_id` (`updated_at`,`id`),
+  FULLTEXT KEY `ft_title_tags` (`title`,`tags`) WITH PARSER ngram
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='消息表';
 
+-- --------------------------------------------------------
+-- 表的结构 `tags` - 标签表
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `tags` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `name` varchar(100) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '标签名',
+  `article_count` int(11) NOT NULL DEFAULT 0 COMMENT '带有该标签的文章数',
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_name` (`name`),
+  KEY `idx_article_count` (`article_count`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='标签表';
+
+-- --------------------------------------------------------
+-- 表的结构 `message_tags` - 标签与文章的映射（标签倒排索引）
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `message_tags` (
+  `tag_id` int(11) NOT NULL COMMENT '标签ID',
+  `message_id` int(11) NOT NULL COMMENT '文章ID',
+  `message_created_at` timestamp NULL DEFAULT NULL COMMENT '文章发布时间（冗余，用于标签页排序）',
+  PRIMARY KEY (`tag_id`,`message_id`),
+  KEY `idx_tag_created` (`tag_id`,`message_created_at`,`message_id`),
+  KEY `idx_message_id` (`message_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='标签倒排索引';
+
+-- --------------------------------------------------------
+-- 表的结构 `related_articles` - 相关文章（按标签相似度预先计算）
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `related_articles` (
+  `message_id` int(11) NOT NULL COMMENT '文章ID',
+  `related_id` int(11) NOT NULL COMMENT '相关文章ID',
+  `score` float NOT NULL COMMENT '标签 Jaccard 相似度',
+  PRIMARY KEY (`message_id`,`related_id`),
+  KEY `idx_message_score` (`message_id`,`score`),
+  KEY `idx_related_id` (`related_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='相关文章';
+
+-- --------------------------------------------------------
+-- 表的结构 `content_counters` - 内容计数（总数、分类、每日，增量维护）
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `content_counters` (
+  `scope` varchar(16) NOT NULL COMMENT '计数范围：total / sort / day',
+  `scope_key` varchar(32) NOT NULL DEFAULT '' COMMENT '范围键：sort 为 sort_id，day 为 YYYY-MM-DD，total 为空',
+  `article_count` int(11) NOT NULL DEFAULT 0 COMMENT '未删除文章数',
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`scope`,`scope_key`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='内容计数';
+
+-- --------------------------------------------------------
+-- 表的结构 `article_click_logs` - 文章点击日志表
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `article_click_logs` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `article_id` int(11) NOT NULL COMMENT '文章ID',
+  `visitor_ip` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '访问者IP',
+  `user_agent` text COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '用户代理',
+  `referrer` text COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '来源页面',
+  `session_id` varchar(64) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '会话ID',
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '点击时间',
+  PRIMARY KEY (`id`),
+  KEY `idx_article_id` (`article_id`),
+  KEY `idx_created_at` (`created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='文章点击日志表';
+
 -- --------------------------------------------------------
 -- 表的结构 `processed_messages` - 已处理消息表
+-- 按天 RANGE 分区，过期数据由采集服务的分区维护任务整分区删除
+-- （未来分区由维护任务从 pmax 中拆分创建）
 -- --------------------------------------------------------
 
 CREATE TABLE IF NOT EXISTS `processed_messages` (
   `channel_id` bigint(20) NOT NULL COMMENT '频道ID',
   `message_id` bigint(20) NOT NULL COMMENT '消息ID',
-  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP COMMENT '处理时间',
-  PRIMARY KEY (`channel_id`,`message_id`),
+  `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '处理时间',
+  PRIMARY KEY (`channel_id`,`message_id`,`created_at`),
   KEY `idx_created_at` (`created_at`)
-) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='已处理消息表，防止重复采集';
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='已处理消息表，防止重复采集'
+PARTITION BY RANGE (TO_DAYS(`created_at`)) (
+  PARTITION `p_init` VALUES LESS THAN (TO_DAYS('2025-01-01')),
+  PARTITION `pmax` VALUES LESS THAN MAXVALUE
+);
+
+-- --------------------------------------------------------
+-- 表的结构 `scrape_runs` - 采集运行记录表
+-- 每次采集写入一条汇总行（channel 为 NULL）和每个频道一条明细行
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `scrape_runs` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `run_id` char(32) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '采集运行ID',
+  `channel` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '频道（NULL表示整次运行汇总）',
+  `status` enum('completed','failed') NOT NULL DEFAULT 'completed' COMMENT '运行结果',
+  `error` text COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '错误信息',
+  `started_at` datetime NOT NULL COMMENT '开始时间',
+  `finished_at` datetime NOT NULL COMMENT '结束时间',
+  `duration_ms` int(11) NOT NULL DEFAULT 0 COMMENT '总耗时（毫秒）',
+  `total_messages` int(11) NOT NULL DEFAULT 0 COMMENT '拉取消息数',
+  `duplicate_messages` int(11) NOT NULL DEFAULT 0 COMMENT '重复消息数',
+  `new_messages` int(11) NOT NULL DEFAULT 0 COMMENT '新增消息数',
+  `blocked_tags_removed` int(11) NOT NULL DEFAULT 0 COMMENT '移除屏蔽标签数',
+  `bytes_downloaded` bigint(20) NOT NULL DEFAULT 0 COMMENT '下载字节数',
+  `bytes_uploaded` bigint(20) NOT NULL DEFAULT 0 COMMENT '上传字节数',
+  `telegram_ms` int(11) NOT NULL DEFAULT 0 COMMENT 'Telegram 耗时（毫秒）',
+  `image_ms` int(11) NOT NULL DEFAULT 0 COMMENT '图片处理耗时（毫秒）',
+  `upload_ms` int(11) NOT NULL DEFAULT 0 COMMENT '图床上传耗时（毫秒）',
+  `db_ms` int(11) NOT NULL DEFAULT 0 COMMENT '数据库耗时（毫秒）',
+  PRIMARY KEY (`id`),
+  KEY `idx_run_id` (`run_id`),
+  KEY `idx_channel_started_at` (`channel`,`started_at`),
+  KEY `idx_started_at` (`started_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='采集运行记录表';
 
 -- --------------------------------------------------------
 -- 表的结构 `search_logs` - 搜索日志表
@@ -169,6 +283,19 @@ CREATE TABLE IF NOT EXISTS `visit_logs` (
   KEY `idx_visit_source` (`visit_source`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='访问日志表';
 
+-- --------------------------------------------------------
+-- 表的结构 `visit_stats_hourly` - 访问日志小时汇总表
+-- --------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS `visit_stats_hourly` (
+  `hour_start` datetime NOT NULL COMMENT '小时开始时间',
+  `visit_source` varchar(100) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '访问来源类型',
+  `page_bucket` varchar(16) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '页面分类：home / article / search / tag / api / other',
+  `visit_count` int(11) NOT NULL DEFAULT 0 COMMENT '访问次数',
+  `unique_visitors` int(11) NOT NULL DEFAULT 0 COMMENT '该小时内的独立访客数（按IP）',
+  PRIMARY KEY (`hour_start`,`visit_source`,`page_bucket`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='访问日志小时汇总';
+
 -- --------------------------------------------------------
 -- 表的结构 `channels` - 频道信息表
 -- --------------------------------------------------------
@@ -238,10 +365,10 @@ INSERT IGNORE INTO `admin_users` (`username`, `password`, `is_active`) VALUES
 
 CREATE OR REPLACE VIEW `v_statistics` AS
 SELECT 
-    (SELECT COUNT(*) FROM `messages` WHERE `is_deleted` = 0) AS `total_messages`,
-    (SELECT COUNT(*) FROM `messages` WHERE DATE(`created_at`) = CURDATE() AND `is_deleted` = 0) AS `today_count`,
+    (SELECT COALESCE(MAX(`article_count`), 0) FROM `content_counters` WHERE `scope` = 'total' AND `scope_key` = '') AS `total_messages`,
+    (SELECT COALESCE(MAX(`article_count`), 0) FROM `content_counters` WHERE `scope` = 'day' AND `scope_key` = CAST(CURDATE() AS CHAR)) AS `today_count`,
     (SELECT COUNT(*) FROM `channels` WHERE `is_active` = 1) AS `active_channels`,
-    (SELECT COUNT(DISTINCT `sort_id`) FROM `messages` WHERE `sort_id` IS NOT NULL AND `is_deleted` = 0) AS `total_categories`,
+    (SELECT COUNT(*) FROM `content_counters` WHERE `scope` = 'sort' AND `article_count` > 0) AS `total_categories`,
     (SELECT COUNT(*) FROM `messages` WHERE `is_pinned` = 1 AND `is_deleted` = 0) AS `pinned_messages`,
     (SELECT COUNT(*) FROM `advertisements` WHERE `is_active` = 1) AS `active_ads`;
 
@@ -9,6 +9,7 @@ tg2em 后台管理系统
 import os
 import json
 import logging
+import re
 import aiomysql
 import asyncio
 import secrets
@@ -20,11 +21,17 @@ import bcrypt
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, abort
 from werkzeug.utils import secure_filename
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
+import log_setup
+from content_counters import counter_delta_statement
+from content_preview import build_preview
+from content_render import build_rendered
+from tag_index import (
+    CURRENT_TAGS_SQL, RELATED_CANDIDATES_SQL, RELATED_REFERRERS_SQL, refill_statement,
+    related_refresh_statements, related_replace_statements, split_tags, tag_sync_statements
 )
+
+# 配置日志（非阻塞队列输出）
+log_setup.setup_logging(fmt='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
@@ -97,6 +104,16 @@ async def verify_admin_user(username, password):
         logger.error(f"验证用户失败: {e}")
         return None
 
+# ngram 全文索引的分词长度（与 MySQL ngram_token_size 一致，默认 2）
+NGRAM_TOKEN_SIZE = int(os.environ.get('NGRAM_TOKEN_SIZE', 2))
+
+def build_fulltext_query(query):
+    """将搜索词转换为 BOOLEAN MODE 查询（每个词作为短语必须出现），所有词过短时返回 None"""
+    words = [word for word in re.findall(r'[^\s"+\-<>()~*@#]+', query) if len(word) >= NGRAM_TOKEN_SIZE]
+    if not words:
+        return None
+    return ' '.join(f'+"{word}"' for word in words)
+
 async def get_messages(page=1, per_page=20, search=''):
     """获取消息列表"""
     try:
@@ -104,15 +121,25 @@ async def get_messages(page=1, per_page=20, search=''):
             async with conn.cursor(aiomysql.DictCursor) as cursor:
                 offset = (page - 1) * per_page
                 
-                if search:
+                fulltext_query = build_fulltext_query(search) if search else None
+                if fulltext_query:
+                    # ngram 全文索引（标题、标签），总数由窗口函数在同一查询中给出
                     sql = """
-                        SELECT * FROM messages 
-                        WHERE (title LIKE %s OR content LIKE %s OR tags LIKE %s)
-                        ORDER BY is_pinned DESC, created_at DESC 
+                        SELECT m.*, COUNT(*) OVER () AS total_count FROM messages m
+                        WHERE MATCH(m.title, m.tags) AGAINST (%s IN BOOLEAN MODE)
+                        ORDER BY m.is_pinned DESC, m.created_at DESC 
+                        LIMIT %s OFFSET %s
+                    """
+                    await cursor.execute(sql, (fulltext_query, per_page, offset))
+                elif search:
+                    # 单字搜索无法使用 ngram 索引，退回标题 LIKE
+                    sql = """
+                        SELECT m.*, COUNT(*) OVER () AS total_count FROM messages m
+                        WHERE m.title LIKE %s
+                        ORDER BY m.is_pinned DESC, m.created_at DESC 
                         LIMIT %s OFFSET %s
                     """
-                    search_term = f"%{search}%"
-                    await cursor.execute(sql, (search_term, search_term, search_term, per_page, offset))
+                    await cursor.execute(sql, (f"%{search}%", per_page, offset))
                 else:
                     sql = """
                         SELECT * FROM messages 
@@ -123,13 +150,21 @@ async def get_messages(page=1, per_page=20, search=''):
                 
                 messages = await cursor.fetchall()
                 
+                if search and messages:
+                    total = messages[0]['total_count']
+                    for message in messages:
+                        message.pop('total_count', None)
+                    return messages, total
+                
                 # 统计总数
-                if search:
+                if fulltext_query:
                     count_sql = """
                         SELECT COUNT(*) as count FROM messages 
-                        WHERE (title LIKE %s OR content LIKE %s OR tags LIKE %s)
+                        WHERE MATCH(title, tags) AGAINST (%s IN BOOLEAN MODE)
                     """
-                    await cursor.execute(count_sql, (search_term, search_term, search_term))
+                    await cursor.execute(count_sql, (fulltext_query,))
+                elif search:
+                    await cursor.execute("SELECT COUNT(*) as count FROM messages WHERE title LIKE %s", (f"%{search}%",))
                 else:
                     count_sql = "SELECT COUNT(*) as count FROM messages"
                     await cursor.execute(count_sql)
@@ -155,19 +190,66 @@ async def get_message_by_id(message_id):
         logger.error(f"获取消息失败: {e}")
         return None
 
+async def sync_message_tags(cursor, message_id, tags):
+    """
+    同步标签索引和标签文章数，标签有变化时刷新相关推荐并为变短的其他消息的推荐列表补位（随消息修改一起提交）
+    
+    已软删除的消息不进入索引：编辑已删除的消息时按空标签处理
+    """
+    if split_tags(tags):
+        await cursor.execute("SELECT is_deleted FROM messages WHERE id = %s", (message_id,))
+        row = await cursor.fetchone()
+        if row is None or row[0]:
+            tags = []
+    await cursor.execute(CURRENT_TAGS_SQL, (message_id,))
+    current_tags = [row[0] for row in await cursor.fetchall()]
+    statements = tag_sync_statements(message_id, current_tags, tags)
+    if not statements:
+        return
+    for statement, params in statements:
+        await cursor.execute(statement, params)
+    await cursor.execute(RELATED_REFERRERS_SQL, (message_id,))
+    referrers = [row[0] for row in await cursor.fetchall()]
+    candidates = []
+    if split_tags(tags):
+        await cursor.execute(RELATED_CANDIDATES_SQL, (message_id, message_id))
+        candidates = await cursor.fetchall()
+    for statement, params in related_refresh_statements(message_id, tags, candidates):
+        await cursor.execute(statement, params)
+    
+    # 本消息从其他消息的列表中移除后，为变短的列表补位
+    refill = refill_statement(referrers)
+    if refill:
+        await cursor.execute(*refill)
+        for related_id, tag_count in await cursor.fetchall():
+            await cursor.execute(RELATED_CANDIDATES_SQL, (related_id, related_id))
+            for statement, params in related_replace_statements(related_id, tag_count, await cursor.fetchall()):
+                await cursor.execute(statement, params)
+
 async def update_message(message_id, title, content, tags, sort_id, is_pinned):
     """更新消息"""
     try:
         async with mysql_pool.acquire() as conn:
             async with conn.cursor() as cursor:
+                preview_html, image_url = build_preview(content)
+                # 非固定格式的正文这里无法渲染，置空后由前台详情页渲染写回
+                content_html, content_hash = build_rendered(content)
+                # 分类可能改变：按旧分类减一、更新后按新分类加一
+                await cursor.execute(*counter_delta_statement(message_id, -1))
                 sql = """
                     UPDATE messages 
-                    SET title = %s, content = %s, tags = %s, sort_id = %s, is_pinned = %s, updated_at = NOW()
+                    SET title = %s, content = %s, tags = %s, sort_id = %s, is_pinned = %s,
+                        preview_html = %s, image_url = %s, content_html = %s, content_hash = %s, updated_at = NOW()
                     WHERE id = %s
                 """
-                await cursor.execute(sql, (title, content, tags, sort_id, is_pinned, message_id))
+                await cursor.execute(sql, (title, content, tags, sort_id, is_pinned, preview_html, image_url,
+                                           content_html, content_hash, message_id))
+                updated = cursor.rowcount > 0
+                await cursor.execute(*counter_delta_statement(message_id, 1))
+                
+                await sync_message_tags(cursor, message_id, tags)
                 await conn.commit()
-                return cursor.rowcount > 0
+                return updated
     except Exception as e:
         logger.error(f"更新消息失败: {e}")
         return False
@@ -177,10 +259,15 @@ async def delete_message(message_id):
     try:
         async with mysql_pool.acquire() as conn:
             async with conn.cursor() as cursor:
+                # 先按删除前的状态减计数（已删除的消息不会重复扣减）
+                await cursor.execute(*counter_delta_statement(message_id, -1))
                 sql = "UPDATE messages SET is_deleted = 1, updated_at = NOW() WHERE id = %s"
                 await cursor.execute(sql, (message_id,))
+                deleted = cursor.rowcount > 0
+                # 已删除的消息不出现在标签页和相关推荐中，移出标签索引并扣减标签文章数
+                await sync_message_tags(cursor, message_id, [])
                 await conn.commit()
-                return cursor.rowcount > 0
+                return deleted
     except Exception as e:
         logger.error(f"删除消息失败: {e}")
         return False
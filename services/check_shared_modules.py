@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+共享模块一致性检查
+
+采集、后台和前台各自独立构建镜像（构建上下文为各服务目录），
+共享的模块在每个服务中各放一份。只改了其中一份会让各服务写入的摘要、
+标签索引和内容计数互相不一致，这里逐字节比较各份是否相同。
+
+用法（deploy.sh 构建镜像前自动执行）:
+    python services/check_shared_modules.py
+"""
+
+import hashlib
+import os
+import sys
+
+SERVICES = ('admin', 'frontend', 'tg2em')
+
+SHARED_MODULES = (
+    'log_setup.py',
+    'content_preview.py',
+    'content_render.py',
+    'tag_index.py',
+    'content_counters.py',
+)
+
+
+def check(root):
+    """返回不一致的模块 {模块名: {服务: 摘要}}"""
+    mismatched = {}
+    for module in SHARED_MODULES:
+        digests = {}
+        for service in SERVICES:
+            path = os.path.join(root, service, module)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    digests[service] = hashlib.sha1(f.read()).hexdigest()[:12]
+            else:
+                digests[service] = '缺失'
+        if len(set(digests.values())) > 1:
+            mismatched[module] = digests
+    return mismatched
+
+
+def main():
+    mismatched = check(os.path.dirname(os.path.abspath(__file__)))
+    if not mismatched:
+        print(f"✅ {len(SHARED_MODULES)} 个共享模块在 {', '.join(SERVICES)} 中一致")
+        return 0
+    for module, digests in mismatched.items():
+        detail = ', '.join(f"{service}={digest}" for service, digest in digests.items())
+        print(f"❌ {module} 不一致: {detail}")
+    print("请把修改同步到所有服务后再构建")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+访问/搜索日志缓冲写入模块
+请求线程只把记录放入内存缓冲区，由后台线程批量写入数据库
+"""
+
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class BufferedLogWriter:
+    """有界缓冲 + 后台批量 INSERT 的日志写入器"""
+
+    def __init__(self, connection_factory: Callable, max_buffer: int = 10000,
+                 batch_size: int = 200, flush_interval_ms: int = 1000):
+        """
+        初始化写入器（调用 start() 启动后台线程）
+
+        Args:
+            connection_factory: 返回数据库连接上下文管理器的函数（如 get_db_connection）
+            max_buffer: 每张表缓冲的最大记录数，超出时丢弃最旧的记录
+            batch_size: 缓冲达到该数量时立即写入
+            flush_interval_ms: 最长写入间隔（毫秒）
+        """
+        self.connection_factory = connection_factory
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+
+        self._tables: Dict[str, str] = {}
+        self._buffers: Dict[str, Deque[Tuple[Any, ...]]] = {}
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopping = False
+        self._stats = {'queued': 0, 'dropped': 0, 'written': 0, 'failed': 0, 'flushes': 0}
+
+    def register(self, table: str, columns: Sequence[str]):
+        """注册目标表及其列"""
+        placeholders = ', '.join(['%s'] * len(columns))
+        self._tables[table] = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+        self._buffers[table] = deque()
+
+    def add(self, table: str, row: Tuple[Any, ...]):
+        """放入一条记录（不阻塞，缓冲区满时丢弃最旧的记录）"""
+        with self._cond:
+            buffer = self._buffers[table]
+            if len(buffer) >= self.max_buffer:
+                buffer.popleft()
+                self._stats['dropped'] += 1
+            buffer.append(row)
+            self._stats['queued'] += 1
+            if len(buffer) >= self.batch_size:
+                self._cond.notify()
+
+    def start(self):
+        """启动后台写入线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='analytics-writer', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _take_batches(self) -> Dict[str, list]:
+        """取出各表缓冲的全部记录（调用方持有锁）"""
+        batches = {}
+        for table, buffer in self._buffers.items():
+            if buffer:
+                batches[table] = list(buffer)
+                buffer.clear()
+        return batches
+
+    def _ready(self) -> bool:
+        return self._stopping or any(len(buffer) >= self.batch_size for buffer in self._buffers.values())
+
+    def _run(self):
+        while True:
+            with self._cond:
+                deadline = time.monotonic() + self.flush_interval
+                while not self._ready():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                stopping = self._stopping
+                batches = self._take_batches()
+
+            self._write(batches)
+            if stopping:
+                return
+
+    def _write(self, batches: Dict[str, list]):
+        """批量写入（pymysql 的 executemany 会合并为多行 INSERT）"""
+        for table, rows in batches.items():
+            for start in range(0, len(rows), self.batch_size):
+                chunk = rows[start:start + self.batch_size]
+                try:
+                    with self.connection_factory() as conn:
+                        cursor = conn.cursor()
+                        cursor.executemany(self._tables[table], chunk)
+                        conn.commit()
+                    with self._cond:
+                        self._stats['written'] += len(chunk)
+                        self._stats['flushes'] += 1
+                except Exception as e:
+                    with self._cond:
+                        self._stats['failed'] += len(chunk)
+                    logger.error(f"批量写入 {table} 失败，丢弃 {len(chunk)} 条记录: {e}")
+
+    def close(self, timeout: float = 10):
+        """停止后台线程并写入缓冲区中剩余的记录"""
+        with self._cond:
+            if self._stopping:
+                return
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        else:
+            with self._cond:
+                batches = self._take_batches()
+            self._write(batches)
+
+    def stats(self) -> Dict[str, Any]:
+        """写入统计信息"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['buffered'] = {table: len(buffer) for table, buffer in self._buffers.items()}
+        return stats
@@ -12,19 +12,33 @@ import logging
 import pymysql
 import requests
 import socket
-import markdown
-from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from datetime import date, datetime, timedelta
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, g
 from cache_manager import get_cache_manager, CacheKeys, CacheTTL
+from db_pool import init_db_pool
+from analytics_writer import BufferedLogWriter
+from click_counter import ClickCounter
+from search_trends import SearchTrends
+from counter_reconciler import CounterReconciler
+from visit_rollup import VisitRollup
+from content_counters import SCOPE_DAY, SCOPE_SORT, SCOPE_TOTAL, counter_delta_statement
 from cache_decorators import (
-    cache_articles, cache_article_detail, cache_popular_articles, 
-    cache_recent_articles, cache_search_results, cache_categories, 
-    cache_advertisements, invalidate_article_cache, invalidate_articles_list_cache
+    cache_articles, cache_articles_after, cache_tag_articles, cache_article_detail, cache_related_articles,
+    cache_popular_articles, cache_recent_articles, cache_search_results, cache_categories, 
+    cache_advertisements, invalidate_namespaces, ARTICLE_NAMESPACES, ADS_NAMESPACES
+)
+from page_cache import PageCache
+from search_engine import SearchEngine, build_fulltext_query
+from content_preview import build_preview, extract_image_url, render_content_preview
+from content_render import build_rendered, content_hash, render_content_html
+from tag_index import (
+    CURRENT_TAGS_SQL, RELATED_CANDIDATES_SQL, RELATED_REFERRERS_SQL, refill_statement,
+    related_refresh_statements, related_replace_statements, split_tags, tag_sync_statements
 )
 from contextlib import contextmanager
 from functools import wraps
-import re
 import hashlib
+import base64
 
 # ==================== 工具函数 ====================
 
@@ -254,11 +268,11 @@ if ServiceController is None:
         except Exception as e:
             return {'success': False, 'message': f'状态检查失败: {str(e)}'}
 
-# 配置日志 - 简化版本，不使用轮转
+# 配置日志 - 非阻塞队列输出，不使用轮转
 import logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+import log_setup
+log_setup.setup_logging(
+    fmt='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     datefmt='%Y-%m-%d %H:%M:%S'
 )
 logger = logging.getLogger('frontend')
@@ -281,83 +295,11 @@ def inject_seo_config():
 
 # 配置Markdown渲染
 def render_markdown(text):
-    """渲染Markdown文本为HTML"""
-    if not text:
-        return ""
-    
-    # 配置Markdown扩展
-    md = markdown.Markdown(
-        extensions=[
-            'markdown.extensions.fenced_code',
-            'markdown.extensions.tables',
-            'markdown.extensions.toc',
-            'markdown.extensions.codehilite',
-            'markdown.extensions.nl2br',
-            'markdown.extensions.sane_lists'
-        ],
-        extension_configs={
-            'markdown.extensions.codehilite': {
-                'css_class': 'highlight'
-            }
-        }
-    )
-    
-    # 渲染Markdown
-    html = md.convert(text)
-    
-    # 处理图片，添加响应式样式
-    html = re.sub(
-        r'<img([^>]*?)src="([^"]*?)"([^>]*?)>',
-        r'<img\1src="\2"\3 class="img-fluid rounded shadow" style="max-width: 100%; height: auto; margin: 10px 0;">',
-        html
-    )
-    
-    return html
+    """渲染Markdown文本为HTML（采集固定格式走快速路径，其余复用线程内的解析器）"""
+    return render_content_html(text) or ""
 
-# 提取图片URL的过滤器
-def extract_image_url(markdown_image):
-    """从Markdown格式的图片中提取纯URL"""
-    if not markdown_image:
-        return None
-    
-    # 匹配 ![](url) 格式
-    import re
-    match = re.search(r'!\[.*?\]\((.*?)\)', markdown_image)
-    if match:
-        return match.group(1)
-    
-    # 如果不是Markdown格式，直接返回原值
-    return markdown_image
-
-def render_content_preview(content, max_length=200):
-    """渲染内容预览，正确处理图片显示"""
-    if not content:
-        return ""
-    
-    # 使用正则表达式匹配并替换图片语法
-    import re
-    def replace_image(match):
-        url = match.group(1)
-        return f'<img src="{url}" class="img-fluid rounded" style="max-width: 100%; height: auto; max-height: 120px; object-fit: contain; margin: 5px 0; display: block;">'
-    
-    # 先处理图片，再截断内容
-    processed = re.sub(r'!\[.*?\]\((.*?)\)', replace_image, content)
-    
-    # 如果内容太长，截断并添加省略号
-    if len(processed) > max_length:
-        # 找到最后一个完整的标签
-        truncated = processed[:max_length]
-        # 确保不截断HTML标签
-        last_tag = truncated.rfind('>')
-        if last_tag > max_length - 50:  # 如果最后一个标签位置合理
-            truncated = truncated[:last_tag + 1]
-        truncated += "..."
-        return truncated
-    
-    return processed
-
-# 获取广告位
-@cache_advertisements(ttl=CacheTTL.LONG)
+# 获取广告位（前台后台改动会立即失效；独立 admin 服务的改动不通知前台，靠较短的 TTL 生效）
+@cache_advertisements(ttl=CacheTTL.SHORT)
 def get_advertisements(position):
     """获取指定位置的广告位"""
     try:
@@ -365,8 +307,8 @@ def get_advertisements(position):
             cursor = conn.cursor(pymysql.cursors.DictCursor)
             cursor.execute("""
                 SELECT * FROM advertisements 
-                WHERE position = %s AND is_active = 1 
-                ORDER BY sort_order ASC, created_at DESC
+                WHERE (position = %s OR position = 'both') AND is_active = 1 
+                ORDER BY sort_order DESC, created_at DESC
             """, (position,))
             ads = cursor.fetchall()
             return ads if ads else []
@@ -376,8 +318,9 @@ def get_advertisements(position):
 
 @cache_popular_articles(ttl=CacheTTL.SHORT)
 def get_popular_articles(limit=5):
-    """获取热门文章（按点击量排序）"""
+    """获取热门文章（按点击量排序，包含尚未合并到数据库的点击）"""
     try:
+        pending = click_counter.pending_counts()
         with get_db_connection() as conn:
             cursor = conn.cursor(pymysql.cursors.DictCursor)
             cursor.execute("""
@@ -387,50 +330,50 @@ def get_popular_articles(limit=5):
                 ORDER BY click_count DESC, created_at DESC 
                 LIMIT %s
             """, (limit,))
-            articles = cursor.fetchall()
-            return articles if articles else []
+            articles = {article['id']: article for article in cursor.fetchall()}
+            
+            # 有新点击的文章也可能进入前列
+            extra_ids = [article_id for article_id in pending if article_id not in articles]
+            if extra_ids:
+                placeholders = ', '.join(['%s'] * len(extra_ids))
+                cursor.execute(f"""
+                    SELECT id, title, tags, source_channel, created_at, click_count
+                    FROM messages 
+                    WHERE is_deleted = 0 AND id IN ({placeholders})
+                """, extra_ids)
+                articles.update({article['id']: article for article in cursor.fetchall()})
+            
+            for article_id, article in articles.items():
+                article['click_count'] = (article['click_count'] or 0) + pending.get(article_id, 0)
+            
+            ranked = sorted(articles.values(), key=lambda a: (a['click_count'], a['created_at'] or datetime.min), reverse=True)
+            return ranked[:limit]
     except Exception as e:
         logger.error(f"获取热门文章失败: {e}")
         return []
 
-@invalidate_article_cache()
 def track_article_click(article_id, request):
-    """记录文章点击"""
+    """记录文章点击（计数写入 Redis，点击日志进入缓冲批量写入）"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            
-            # 获取访问者信息
-            visitor_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR', '127.0.0.1'))
-            user_agent = request.headers.get('User-Agent', '')
-            referrer = request.headers.get('Referer', '')
-            session_id = session.get('session_id', '')
-            
-            # 记录点击日志
-            cursor.execute("""
-                INSERT INTO article_click_logs (article_id, visitor_ip, user_agent, referrer, session_id)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (article_id, visitor_ip, user_agent, referrer, session_id))
-            
-            # 更新文章点击统计
-            cursor.execute("""
-                UPDATE messages 
-                SET click_count = click_count + 1, last_clicked_at = NOW()
-                WHERE id = %s
-            """, (article_id,))
-            
-            conn.commit()
-            # 文章点击记录成功（减少日志输出）
-            
-            # 手动清除相关缓存
-            cache = get_cache_manager()
-            if cache.is_available():
-                # 清除文章详情缓存
-                cache.delete(f"article:{article_id}")
-                # 清除热门文章缓存
-                cache.delete_pattern("articles:popular:*")
-                # 清除文章列表缓存
-                cache.delete_pattern("articles:list:*")
+        # 获取访问者信息
+        visitor_ip = request.environ.get('HTTP_X_FORWARDED_FOR', request.environ.get('REMOTE_ADDR', '127.0.0.1'))
+        user_agent = request.headers.get('User-Agent', '')
+        referrer = request.headers.get('Referer', '')
+        session_id = session.get('session_id', '')
+        
+        # 记录点击日志
+        analytics_writer.add('article_click_logs', (article_id, visitor_ip, user_agent, referrer, session_id))
+        
+        # 更新文章点击统计（Redis 不可用时直接写数据库）
+        if not click_counter.record(article_id):
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    UPDATE messages 
+                    SET click_count = click_count + 1, last_clicked_at = NOW()
+                    WHERE id = %s
+                """, (article_id,))
+                conn.commit()
             
     except Exception as e:
         logger.error(f"记录文章点击失败: {e}")
@@ -557,13 +500,9 @@ def record_visit():
         referrer = request.headers.get('Referer', '')
         visit_source = analyze_visit_source(user_agent, referrer, page_path)
         
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO visit_logs (visitor_ip, user_agent, page_path, referrer, visit_source, session_id)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (visitor_ip, user_agent, page_path, referrer, visit_source, session.get('session_id')))
-            conn.commit()
+        analytics_writer.add('visit_logs', (
+            visitor_ip, user_agent, page_path, referrer, visit_source, session.get('session_id')
+        ))
     except Exception as e:
         logger.debug(f"记录访问失败: {e}")
 
@@ -647,21 +586,115 @@ DB_CONFIG = {
     'charset': 'utf8mb4'
 }
 
+# 数据库连接池（每个进程一个，启动时预热）
+db_pool = init_db_pool(
+    DB_CONFIG,
+    min_size=int(os.environ.get('MYSQL_POOL_MIN', 2)),
+    max_size=int(os.environ.get('MYSQL_POOL_MAX', 10)),
+    recycle=int(os.environ.get('MYSQL_POOL_RECYCLE', 3600)),
+    timeout=float(os.environ.get('MYSQL_POOL_TIMEOUT', 10))
+)
+try:
+    db_pool.warm()
+except Exception as e:
+    logger.warning(f"MySQL连接池预热失败，将在首次请求时建立连接: {e}")
+
 @contextmanager
 def get_db_connection():
-    """获取数据库连接上下文管理器"""
+    """从连接池借出数据库连接的上下文管理器"""
     conn = None
+    discard = False
     try:
-        conn = pymysql.connect(**DB_CONFIG)
+        conn = db_pool.acquire()
         yield conn
     except Exception as e:
         logger.error(f"数据库连接错误: {e}")
-        if conn:
-            conn.rollback()
+        # 连接层面的错误不再复用该连接，其余错误由归还时回滚
+        discard = isinstance(e, (pymysql.err.OperationalError, pymysql.err.InterfaceError))
         raise
     finally:
         if conn:
-            conn.close()
+            db_pool.release(conn, discard=discard)
+
+# 访问/搜索日志缓冲写入（请求线程不等待数据库写入）
+analytics_writer = BufferedLogWriter(
+    get_db_connection,
+    max_buffer=int(os.environ.get('ANALYTICS_BUFFER_SIZE', 10000)),
+    batch_size=int(os.environ.get('ANALYTICS_BATCH_SIZE', 200)),
+    flush_interval_ms=int(os.environ.get('ANALYTICS_FLUSH_MS', 1000))
+)
+analytics_writer.register('visit_logs', (
+    'visitor_ip', 'user_agent', 'page_path', 'referrer', 'visit_source', 'session_id'
+))
+analytics_writer.register('search_logs', (
+    'search_keyword', 'visitor_ip', 'user_agent', 'results_count'
+))
+analytics_writer.register('article_click_logs', (
+    'article_id', 'visitor_ip', 'user_agent', 'referrer', 'session_id'
+))
+analytics_writer.start()
+
+# 文章点击计数（Redis 累加，后台定期合并到 messages 表）
+click_counter = ClickCounter(
+    get_cache_manager,
+    get_db_connection,
+    flush_interval=int(os.environ.get('CLICK_FLUSH_SECONDS', 30))
+)
+click_counter.start()
+
+# 热门搜索（Redis 有序集合按小时分桶，按时间衰减合并）
+search_trends = SearchTrends(
+    get_cache_manager,
+    half_life_hours=float(os.environ.get('TRENDING_SEARCH_HALF_LIFE_HOURS', 6))
+)
+
+# 内容计数（总数、分类、每日）由写入路径增量维护，后台定期核对
+counter_reconciler = CounterReconciler(
+    get_db_connection,
+    interval=int(os.environ.get('COUNTER_RECONCILE_SECONDS', 3600))
+)
+if counter_reconciler.interval > 0:
+    counter_reconciler.start()
+
+# 访问日志按小时汇总到 visit_stats_hourly，原始日志超过保留天数后清理
+visit_rollup = VisitRollup(
+    get_db_connection,
+    interval=int(os.environ.get('VISIT_ROLLUP_SECONDS', 3600)),
+    retention_days=int(os.environ.get('VISIT_LOG_RETENTION_DAYS', 30))
+)
+if visit_rollup.interval > 0:
+    visit_rollup.start()
+
+# 匿名访客整页缓存（首页、搜索、文章详情、标签页）
+page_cache = PageCache(
+    ttl=int(os.environ.get('PAGE_CACHE_TTL', 60)),
+    enabled=os.environ.get('PAGE_CACHE_ENABLED', 'true').lower() == 'true'
+)
+
+# 进程内搜索索引（标题、标签），后台构建并按 updated_at 增量更新；未就绪时走数据库全文索引
+search_engine = None
+if os.environ.get('SEARCH_ENGINE_ENABLED', 'true').lower() == 'true':
+    search_engine = SearchEngine(
+        get_db_connection,
+        refresh_interval=int(os.environ.get('SEARCH_INDEX_REFRESH_SECONDS', 30)),
+        rebuild_interval=int(os.environ.get('SEARCH_INDEX_REBUILD_SECONDS', 3600))
+    )
+    search_engine.start(os.environ.get('SEARCH_INDEX_PATH'))
+
+# 列表页只取卡片需要的列，整篇 content 只在详情页加载；
+# preview_html 尚未回填的旧文章才顺带取出 content，现场生成摘要
+LIST_COLUMNS = """
+    id, title, tags, sort_id, image_url, source_channel, created_at, click_count, preview_html,
+    IF(preview_html IS NULL, content, NULL) AS content
+"""
+
+def finish_list_rows(articles):
+    """为未回填的文章补齐摘要和首图，并去掉临时取出的 content"""
+    for article in articles:
+        content = article.pop('content', None)
+        if article.get('preview_html') is None:
+            article['preview_html'], article['image_url'] = build_preview(content, article.get('image_url'))
+    return articles
 
 @cache_articles(ttl=CacheTTL.MEDIUM)
 def get_articles(limit=20, offset=0, category=None):
@@ -670,29 +703,203 @@ def get_articles(limit=20, offset=0, category=None):
         with get_db_connection() as conn:
             cursor = conn.cursor(pymysql.cursors.DictCursor)
             if category:
-                sql = """
-                    SELECT * FROM messages 
+                sql = f"""
+                    SELECT {LIST_COLUMNS} FROM messages 
                     WHERE sort_id = %s 
-                    ORDER BY created_at DESC 
+                    ORDER BY created_at DESC, id DESC 
                     LIMIT %s OFFSET %s
                 """
                 cursor.execute(sql, (category, limit, offset))
             else:
-                sql = """
-                    SELECT * FROM messages 
-                    ORDER BY created_at DESC 
+                sql = f"""
+                    SELECT {LIST_COLUMNS} FROM messages 
+                    ORDER BY created_at DESC, id DESC 
                     LIMIT %s OFFSET %s
                 """
                 cursor.execute(sql, (limit, offset))
             
             articles = cursor.fetchall()
             # 成功获取文章（减少日志输出）
-            return articles if articles else []
+            return finish_list_rows(articles) if articles else []
     except Exception as e:
         logger.error(f"获取文章失败: {e}")
         # 数据库连接失败或无数据，返回空列表
         return []
 
+def encode_cursor(article):
+    """由一页最后一篇文章生成分页游标（对客户端不透明）"""
+    raw = f"{article['created_at'].isoformat()}|{article['id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token):
+    """解析分页游标，无效时返回 None"""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8')
+        created_at, _, article_id = raw.partition('|')
+        return datetime.fromisoformat(created_at), int(article_id)
+    except (ValueError, TypeError):
+        return None
+
+@cache_articles_after(ttl=CacheTTL.MEDIUM)
+def get_articles_after(limit=12, cursor=None, category=None):
+    """
+    按 (created_at, id) 游标分页获取文章，任意深度的翻页代价相同，翻页期间有新文章也不会重复
+    
+    Args:
+        limit: 每页数量
+        cursor: 上一页返回的 next_cursor，None 表示第一页
+        category: 分类ID
+        
+    Returns:
+        {'articles': 当前页文章, 'next_cursor': 下一页游标, 'has_more': 是否还有更多}
+    """
+    try:
+        conditions, params = [], []
+        if category:
+            conditions.append("sort_id = %s")
+            params.append(category)
+        if cursor:
+            position = decode_cursor(cursor)
+            if position is None:
+                return {'articles': [], 'next_cursor': None, 'has_more': False}
+            conditions.append("(created_at < %s OR (created_at = %s AND id < %s))")
+            params.extend([position[0], position[0], position[1]])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        
+        with get_db_connection() as conn:
+            cursor_db = conn.cursor(pymysql.cursors.DictCursor)
+            # 多取一行判断是否还有下一页
+            cursor_db.execute(f"""
+                SELECT {LIST_COLUMNS} FROM messages 
+                {where}
+                ORDER BY created_at DESC, id DESC 
+                LIMIT %s
+            """, (*params, limit + 1))
+            articles = cursor_db.fetchall()
+        
+        has_more = len(articles) > limit
+        articles = finish_list_rows(articles[:limit])
+        return {
+            'articles': articles,
+            'next_cursor': encode_cursor(articles[-1]) if has_more else None,
+            'has_more': has_more
+        }
+    except Exception as e:
+        logger.error(f"游标分页获取文章失败: {e}")
+        return {'articles': [], 'next_cursor': None, 'has_more': False}
+
+@cache_tag_articles(ttl=CacheTTL.MEDIUM)
+def get_tag_articles(tag, limit=20, cursor=None):
+    """
+    按标签倒排索引获取文章，按 (发布时间, id) 倒序游标分页
+    
+    Args:
+        tag: 标签名
+        limit: 每页数量
+        cursor: 上一页返回的 next_cursor，None 表示第一页
+        
+    Returns:
+        {'articles': 当前页文章, 'total': 标签文章总数, 'next_cursor': 下一页游标, 'has_more': 是否还有更多}
+    """
+    empty = {'articles': [], 'total': 0, 'next_cursor': None, 'has_more': False}
+    try:
+        names = split_tags([tag])
+        if not names:
+            return empty
+        
+        with get_db_connection() as conn:
+            cursor_db = conn.cursor(pymysql.cursors.DictCursor)
+            cursor_db.execute("SELECT id, article_count FROM tags WHERE name = %s", (names[0],))
+            tag_row = cursor_db.fetchone()
+            if not tag_row:
+                return empty
+            
+            conditions, params = ["mt.tag_id = %s", "m.is_deleted = 0"], [tag_row['id']]
+            if cursor:
+                position = decode_cursor(cursor)
+                if position is None:
+                    return dict(empty, total=tag_row['article_count'])
+                conditions.append("(mt.message_created_at < %s OR (mt.message_created_at = %s AND mt.message_id < %s))")
+                params.extend([position[0], position[0], position[1]])
+            
+            # 沿 idx_tag_created (tag_id, message_created_at, message_id) 倒序扫描，再按主键取文章
+            cursor_db.execute(f"""
+                SELECT {LIST_COLUMNS} FROM message_tags mt
+                JOIN messages m ON m.id = mt.message_id
+                WHERE {' AND '.join(conditions)}
+                ORDER BY mt.message_created_at DESC, mt.message_id DESC
+                LIMIT %s
+            """, (*params, limit + 1))
+            articles = cursor_db.fetchall()
+        
+        has_more = len(articles) > limit
+        articles = finish_list_rows(articles[:limit])
+        return {
+            'articles': articles,
+            'total': tag_row['article_count'],
+            'next_cursor': encode_cursor(articles[-1]) if has_more else None,
+            'has_more': has_more
+        }
+    except Exception as e:
+        logger.error(f"获取标签文章失败: {e}")
+        return empty
+
+def sync_article_tags(cursor, article_id, tags):
+    """
+    同步文章的标签索引、标签文章数和相关推荐（随文章修改一起提交），并为因此变短的其他文章的推荐列表补位
+    
+    已软删除的文章不进入索引：编辑已删除的文章时按空标签处理
+    """
+    if split_tags(tags):
+        cursor.execute("SELECT is_deleted FROM messages WHERE id = %s", (article_id,))
+        row = cursor.fetchone()
+        if row is None or row[0]:
+            tags = []
+    cursor.execute(CURRENT_TAGS_SQL, (article_id,))
+    current_tags = [row[0] for row in cursor.fetchall()]
+    statements = tag_sync_statements(article_id, current_tags, tags)
+    if not statements:
+        # 标签没变，相关推荐也不变
+        return
+    for sql, params in statements:
+        cursor.execute(sql, params)
+    
+    cursor.execute(RELATED_REFERRERS_SQL, (article_id,))
+    referrers = [row[0] for row in cursor.fetchall()]
+    candidates = []
+    if split_tags(tags):
+        cursor.execute(RELATED_CANDIDATES_SQL, (article_id, article_id))
+        candidates = cursor.fetchall()
+    for sql, params in related_refresh_statements(article_id, tags, candidates):
+        cursor.execute(sql, params)
+    
+    # 本文从其他文章的列表中移除后，为变短的列表补位
+    refill = refill_statement(referrers)
+    if refill:
+        cursor.execute(*refill)
+        for related_id, tag_count in cursor.fetchall():
+            cursor.execute(RELATED_CANDIDATES_SQL, (related_id, related_id))
+            for sql, params in related_replace_statements(related_id, tag_count, cursor.fetchall()):
+                cursor.execute(sql, params)
+
+def ensure_content_html(conn, article):
+    """正文 HTML 缺失或与内容哈希不一致（新采集、被编辑、渲染规则升级）时重新渲染并写回"""
+    digest = content_hash(article['content'])
+    if article.get('content_html') is not None and article.get('content_hash') == digest:
+        return
+    
+    article['content_html'], article['content_hash'] = render_content_html(article['content']), digest
+    try:
+        cursor = conn.cursor()
+        # 保持 updated_at 不变，避免搜索索引把渲染结果当成内容修改
+        cursor.execute("""
+            UPDATE messages SET content_html = %s, content_hash = %s, updated_at = updated_at
+            WHERE id = %s
+        """, (article['content_html'], digest, article['id']))
+        conn.commit()
+    except Exception as e:
+        logger.error(f"保存文章渲染结果失败 {article['id']}: {e}")
+
 @cache_article_detail(ttl=CacheTTL.LONG)
 def get_article_by_id(article_id):
     """根据ID获取文章"""
@@ -702,6 +909,8 @@ def get_article_by_id(article_id):
             sql = "SELECT * FROM messages WHERE id = %s"
             cursor.execute(sql, (article_id,))
             article = cursor.fetchone()
+            if article:
+                ensure_content_html(conn, article)
             return article
     except Exception as e:
         logger.error(f"获取文章失败: {e}")
@@ -709,74 +918,46 @@ def get_article_by_id(article_id):
 
 @cache_categories(ttl=CacheTTL.LONG)
 def get_categories():
-    """获取网盘类型分类统计"""
+    """获取网盘类型分类统计（读取物化计数）"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            sql = """
-                SELECT 
-                    CASE 
-                        WHEN sort_id = 1 THEN '夸克网盘'
-                        WHEN sort_id = 2 THEN '阿里云盘'
-                        WHEN sort_id = 3 THEN '百度网盘'
-                        WHEN sort_id = 4 THEN '移动云盘'
-                        ELSE '其他网盘'
-                    END as category_name,
-                    sort_id,
-                    COUNT(*) as count 
-                FROM messages 
-                WHERE sort_id IS NOT NULL 
-                GROUP BY sort_id 
-                ORDER BY count DESC
-            """
-            cursor.execute(sql)
-            categories = cursor.fetchall()
-            # 成功获取网盘分类（减少日志输出）
-            return categories if categories else []
+        counters = get_content_counters()
+        names = {1: '夸克网盘', 2: '阿里云盘', 3: '百度网盘', 4: '移动云盘'}
+        categories = [
+            {'category_name': names.get(sort_id, '其他网盘'), 'sort_id': sort_id, 'count': count}
+            for sort_id, count in counters['categories'].items() if count > 0
+        ]
+        categories.sort(key=lambda category: category['count'], reverse=True)
+        return categories
     except Exception as e:
         logger.error(f"获取网盘分类失败: {e}")
         # 数据库连接失败或无分类数据，返回空列表
         return []
 
 def get_visit_sources():
-    """获取访问来源统计"""
+    """获取最近7天的访问来源统计（读取小时汇总表）"""
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(pymysql.cursors.DictCursor)
             sql = """
-                SELECT 
-                    CASE 
-                        WHEN visit_source = '搜索引擎' THEN '搜索引擎'
-                        WHEN visit_source = '直接访问' THEN '直接访问'
-                        WHEN visit_source = '社交媒体' THEN '社交媒体'
-                        WHEN visit_source = '即时通讯' THEN '即时通讯'
-                        WHEN visit_source = '外部网站' THEN '外部网站'
-                        ELSE '其他'
-                    END as source,
-                    COUNT(*) as count
-                FROM visit_logs 
-                WHERE created_at >= DATE_SUB(NOW(), INTERVAL 7 DAY)
-                GROUP BY 
-                    CASE 
-                        WHEN visit_source = '搜索引擎' THEN '搜索引擎'
-                        WHEN visit_source = '直接访问' THEN '直接访问'
-                        WHEN visit_source = '社交媒体' THEN '社交媒体'
-                        WHEN visit_source = '即时通讯' THEN '即时通讯'
-                        WHEN visit_source = '外部网站' THEN '外部网站'
-                        ELSE '其他'
-                    END
+                SELECT visit_source as source, SUM(visit_count) as count
+                FROM visit_stats_hourly
+                WHERE hour_start >= DATE_SUB(NOW(), INTERVAL 7 DAY)
+                GROUP BY visit_source
                 ORDER BY count DESC
                 LIMIT 6
             """
             cursor.execute(sql)
-            sources = cursor.fetchall()
+            sources = [{'source': row['source'], 'count': int(row['count'])} for row in cursor.fetchall()]
             # 成功获取访问来源（减少日志输出）
-            return sources if sources else []
+            return sources
     except Exception as e:
         logger.error(f"获取访问来源统计失败: {e}")
         return []
 def get_popular_searches():
-    """获取最近24小时的热门搜索关键字"""
+    """获取最近24小时的热门搜索关键字（读取 Redis 排行，Redis 不可用时查询搜索日志）"""
+    searches = search_trends.top(5)
+    if searches is not None:
+        return searches
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(pymysql.cursors.DictCursor)
@@ -818,108 +999,156 @@ def get_recent_articles(limit=5):
         return []
 
 def get_published_articles(limit=10, offset=0):
-    """获取已发布的文章"""
+    """获取已发布的文章（按页码分页，新代码请使用 get_articles_after）"""
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(pymysql.cursors.DictCursor)
-            sql = """
-                SELECT * FROM messages 
-                ORDER BY created_at DESC 
+            sql = f"""
+                SELECT {LIST_COLUMNS} FROM messages 
+                ORDER BY created_at DESC, id DESC 
                 LIMIT %s OFFSET %s
             """
             cursor.execute(sql, (limit, offset))
-            articles = cursor.fetchall()
-            return articles
+            return finish_list_rows(cursor.fetchall())
     except Exception as e:
         logger.error(f"获取已发布文章失败: {e}")
         return []
 
 def log_search(query, results_count):
-    """记录搜索日志"""
+    """记录搜索日志并更新热门搜索"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO search_logs (search_keyword, visitor_ip, user_agent, results_count)
-                VALUES (%s, %s, %s, %s)
-            """, (query, request.remote_addr, request.headers.get('User-Agent', ''), results_count))
-            conn.commit()
+        analytics_writer.add('search_logs', (
+            query, request.remote_addr, request.headers.get('User-Agent', ''), results_count
+        ))
+        search_trends.record(query)
     except Exception as e:
         logger.error(f"记录搜索日志失败: {e}")
 
 @cache_search_results(ttl=CacheTTL.MEDIUM)
-def search_articles(query, limit=10, offset=0):
-    """搜索文章（只搜索标题）"""
+def search_articles_with_total(query, limit=10, offset=0):
+    """
+    搜索文章（匹配标题和标签），按相关度排序
+    
+    优先使用进程内搜索索引，索引未就绪或单字查询时使用 ngram 全文索引
+    
+    Returns:
+        {'articles': 当前页文章, 'total': 结果总数}，总数与结果在同一条查询中计算并一起缓存
+    """
     try:
+        ranked = search_engine.search(query, limit, offset) if search_engine is not None else None
         with get_db_connection() as conn:
             cursor = conn.cursor(pymysql.cursors.DictCursor)
-            sql = """
-                SELECT * FROM messages 
-                WHERE title LIKE %s
-                ORDER BY created_at DESC 
-                LIMIT %s OFFSET %s
-            """
-            search_term = f"%{query}%"
-            cursor.execute(sql, (search_term, limit, offset))
+            if ranked is not None:
+                # 进程内索引给出排序后的文章ID，数据库只按主键取当前页
+                ids, total = ranked
+                articles = []
+                if ids:
+                    placeholders = ', '.join(['%s'] * len(ids))
+                    cursor.execute(f"SELECT {LIST_COLUMNS} FROM messages WHERE id IN ({placeholders})", ids)
+                    rows = {row['id']: row for row in finish_list_rows(cursor.fetchall())}
+                    articles = [rows[article_id] for article_id in ids if article_id in rows]
+                return {'articles': articles, 'total': total}
+            
+            fulltext_query = build_fulltext_query(query)
+            if fulltext_query:
+                cursor.execute(f"""
+                    SELECT {LIST_COLUMNS},
+                           MATCH(m.title, m.tags) AGAINST (%s IN BOOLEAN MODE) AS relevance,
+                           COUNT(*) OVER () AS total_count
+                    FROM messages m
+                    WHERE MATCH(m.title, m.tags) AGAINST (%s IN BOOLEAN MODE)
+                    ORDER BY relevance DESC, m.created_at DESC
+                    LIMIT %s OFFSET %s
+                """, (fulltext_query, fulltext_query, limit, offset))
+            else:
+                # 单字搜索无法使用 ngram 索引，退回标题 LIKE
+                cursor.execute(f"""
+                    SELECT {LIST_COLUMNS}, COUNT(*) OVER () AS total_count
+                    FROM messages m
+                    WHERE m.title LIKE %s
+                    ORDER BY m.created_at DESC
+                    LIMIT %s OFFSET %s
+                """, (f"%{query}%", limit, offset))
             articles = cursor.fetchall()
-            return articles
+            
+            if articles:
+                total = articles[0]['total_count']
+            elif offset > 0:
+                # 页码超出范围时窗口函数没有行可返回，单独统计总数
+                if fulltext_query:
+                    cursor.execute("""
+                        SELECT COUNT(*) AS count FROM messages
+                        WHERE MATCH(title, tags) AGAINST (%s IN BOOLEAN MODE)
+                    """, (fulltext_query,))
+                else:
+                    cursor.execute("SELECT COUNT(*) AS count FROM messages WHERE title LIKE %s", (f"%{query}%",))
+                total = cursor.fetchone()['count']
+            else:
+                total = 0
+            
+            for article in articles:
+                article.pop('total_count', None)
+                article.pop('relevance', None)
+            return {'articles': finish_list_rows(articles), 'total': total}
     except Exception as e:
         logger.error(f"搜索文章失败: {e}")
-        return []
+        return {'articles': [], 'total': 0}
+
+def search_articles(query, limit=10, offset=0):
+    """搜索文章（标题和标签），返回当前页文章"""
+    return search_articles_with_total(query, limit, offset)['articles']
 
 def count_search_results(query):
-    """统计搜索结果数量（只搜索标题）"""
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            sql = """
-                SELECT COUNT(*) as count FROM messages 
-                WHERE title LIKE %s
-            """
-            search_term = f"%{query}%"
-            cursor.execute(sql, (search_term,))
-            result = cursor.fetchone()
-            return result['count']
-    except Exception as e:
-        logger.error(f"统计搜索结果失败: {e}")
-        return 0
+    """统计搜索结果数量（与第一页结果共用缓存）"""
+    return search_articles_with_total(query, 10, 0)['total']
+
+def get_content_counters(days=()):
+    """
+    读取物化计数（按主键查询，与文章总量无关）
+    
+    Args:
+        days: 需要的日期列表
+        
+    Returns:
+        {'total': 文章总数, 'categories': {sort_id: 数量}, 'days': {date: 数量}}
+    """
+    day_keys = [day.isoformat() for day in days]
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        conditions = "scope IN (%s, %s)"
+        params = [SCOPE_TOTAL, SCOPE_SORT]
+        if day_keys:
+            conditions += f" OR (scope = %s AND scope_key IN ({', '.join(['%s'] * len(day_keys))}))"
+            params.extend([SCOPE_DAY, *day_keys])
+        cursor.execute(f"SELECT scope, scope_key, article_count FROM content_counters WHERE {conditions}", params)
+        rows = cursor.fetchall()
+    
+    counters = {'total': 0, 'categories': {}, 'days': {day: 0 for day in days}}
+    for scope, scope_key, count in rows:
+        if scope == SCOPE_TOTAL:
+            counters['total'] = count
+        elif scope == SCOPE_SORT:
+            counters['categories'][int(scope_key)] = count
+        else:
+            counters['days'][date.fromisoformat(scope_key)] = count
+    return counters
 
 def count_articles():
-    """统计文章数量"""
+    """统计文章数量（读取物化计数）"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            sql = "SELECT COUNT(*) as count FROM messages"
-            cursor.execute(sql)
-            result = cursor.fetchone()
-            return result['count']
+        return get_content_counters()['total']
     except Exception as e:
         logger.error(f"统计文章数量失败: {e}")
         return 0
 
-def get_advertisements(position):
-    """获取指定位置的广告"""
-    try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            sql = """
-                SELECT * FROM advertisements 
-                WHERE (position = %s OR position = 'both') AND is_active = 1 
-                ORDER BY sort_order DESC, created_at DESC
-            """
-            cursor.execute(sql, (position,))
-            ads = cursor.fetchall()
-            return ads
-    except Exception as e:
-        logger.error(f"获取广告失败: {e}")
-        return []
-
 @app.route('/')
+@page_cache.cached()
 def index():
     """首页"""
     try:
         # 获取数据（瀑布流初始加载）
-        articles = get_articles(12, 0)  # 减少初始加载数量
+        first_page = get_articles_after(12)  # 减少初始加载数量
+        articles = first_page['articles']
         recent_articles = get_recent_articles(5)
         popular_articles = get_popular_articles(5)  # 获取热门文章
         popular_searches = get_popular_searches()
@@ -951,11 +1180,13 @@ def index():
                              categories=categories,
                              homepage_middle_ads=homepage_middle_ads,
                              mixed_content=mixed_content,
+                             next_cursor=first_page['next_cursor'],
                              stats=stats,
                              seo_config=seo_config)
     except Exception as e:
         logger.error(f"首页路由处理失败: {e}")
-        # 即使出现异常，也返回空数据的页面，确保网站可以访问
+        # 即使出现异常，也返回空数据的页面，确保网站可以访问（降级页面不进入整页缓存）
+        g.page_cache_skip = True
         # 获取SEO配置
         seo_config = get_seo_config()
         
@@ -967,10 +1198,17 @@ def index():
                              categories=[],
                              homepage_middle_ads=[],
                              mixed_content=[],
+                             next_cursor=None,
                              stats={'total_articles': 0, 'data_available': False},
                              seo_config=seo_config)
 
+def _log_cached_search(meta):
+    """整页缓存命中时补记搜索日志"""
+    if meta.get('query'):
+        log_search(meta['query'], meta.get('total_count', 0))
+
 @app.route('/search')
+@page_cache.cached(on_hit=_log_cached_search)
 def search():
     """搜索页面"""
     query = request.args.get('q', '').strip()
@@ -979,12 +1217,13 @@ def search():
     offset = (page - 1) * per_page
     
     if query:
-        # 执行搜索
-        articles = search_articles(query, per_page, offset)
-        total_count = count_search_results(query)
+        # 执行搜索（结果和总数来自同一次查询）
+        result = search_articles_with_total(query, per_page, offset)
+        articles, total_count = result['articles'], result['total']
         
         # 记录搜索日志
         log_search(query, total_count)
+        g.page_cache_meta = {'query': query, 'total_count': total_count}
     else:
         # 显示所有文章
         articles = get_articles(per_page, offset)
@@ -1012,6 +1251,7 @@ def post_detail_legacy(article_id):
 
 @app.route('/article/<int:article_id>')
 @app.route('/article/<int:article_id>.html')
+@page_cache.cached(on_hit=lambda meta, article_id: track_article_click(article_id, request))
 def article_detail(article_id):
     """文章详情页"""
     article = get_article_by_id(article_id)
@@ -1046,23 +1286,36 @@ def api_articles():
     # 记录API访问（用于监控）
     # API访问（减少调试日志）
     
-    page = request.args.get('page', 1, type=int)
+    page = request.args.get('page', type=int)
+    cursor = request.args.get('cursor')
     limit = request.args.get('limit', 10, type=int)
     
     # 限制分页参数
-    if page < 1:
-        page = 1
+    if limit < 1:
+        limit = 10
     if limit > 100:  # 限制最大返回数量
         limit = 100
     
-    offset = (page - 1) * limit
+    if page is not None and cursor is None:
+        # 兼容按页码分页的旧调用
+        page = max(page, 1)
+        articles = get_published_articles(limit, (page - 1) * limit)
+        return jsonify({
+            'success': True,
+            'data': articles,
+            'page': page,
+            'limit': limit
+        })
     
-    articles = get_published_articles(limit, offset)
+    if cursor and decode_cursor(cursor) is None:
+        return jsonify({'success': False, 'message': '无效的分页游标'}), 400
     
+    result = get_articles_after(limit, cursor or None)
     return jsonify({
         'success': True,
-        'data': articles,
-        'page': page,
+        'data': result['articles'],
+        'next_cursor': result['next_cursor'],
+        'has_more': result['has_more'],
         'limit': limit
     })
 
@@ -1264,56 +1517,40 @@ def admin_logout():
 def admin_index():
     """后台管理首页"""
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            
-            # 总文章数
-            cursor.execute("SELECT COUNT(*) as total FROM messages")
-            total_articles = cursor.fetchone()['total']
-            
-            # 今日文章数
-            today = datetime.now().date()
-            cursor.execute(
-                "SELECT COUNT(*) as today FROM messages WHERE DATE(created_at) = %s",
-                (today,)
-            )
-            today_articles = cursor.fetchone()['today']
-            
-            # 昨日文章数
-            yesterday = (datetime.now() - timedelta(days=1)).date()
-            cursor.execute(
-                "SELECT COUNT(*) as yesterday FROM messages WHERE DATE(created_at) = %s",
-                (yesterday,)
-            )
-            yesterday_articles = cursor.fetchone()['yesterday']
-            
-            # 数据采集服务状态（检查真实状态）
-            try:
-                scrape_cont_status = check_service_status_via_docker('scraper')
-                scrape_status = scrape_cont_status.get('status', 'unknown')
-                scrape_status = '运行中' if scrape_status == 'running' else '未运行'
-            except:
-                scrape_status = "未知"
-            
-            # 访问统计（先使用模拟数据，后续可以添加访问记录）
-            daily_visitors = 125
-            total_visitors = total_articles * 15  # 模拟计算
-            
-            # 访问来源 statistical（模拟）
-            visit_sources = get_visit_sources()
-            
-            stats = {
-                'total_articles': total_articles,
-                'today_articles': today_articles,
-                'yesterday_articles': yesterday_articles,
-                'scrape_status': scrape_status,
-                'daily_visitors': daily_visitors,
-                'total_visitors': total_visitors,
-                'visit_sources': visit_sources
-            }
-            
-            return render_template('admin.html', stats=stats)
-            
+        # 总文章数、今日和昨日文章数（物化计数）
+        today = datetime.now().date()
+        yesterday = today - timedelta(days=1)
+        counters = get_content_counters(days=(today, yesterday))
+        total_articles = counters['total']
+        today_articles = counters['days'][today]
+        yesterday_articles = counters['days'][yesterday]
+        
+        # 数据采集服务状态（检查真实状态）
+        try:
+            scrape_cont_status = check_service_status_via_docker('scraper')
+            scrape_status = scrape_cont_status.get('status', 'unknown')
+            scrape_status = '运行中' if scrape_status == 'running' else '未运行'
+        except:
+            scrape_status = "未知"
+        
+        # 访问统计（先使用模拟数据，后续可以添加访问记录）
+        daily_visitors = 125
+        total_visitors = total_articles * 15  # 模拟计算
+        
+        # 访问来源 statistical（模拟）
+        visit_sources = get_visit_sources()
+        
+        stats = {
+            'total_articles': total_articles,
+            'today_articles': today_articles,
+            'yesterday_articles': yesterday_articles,
+            'scrape_status': scrape_status,
+            'daily_visitors': daily_visitors,
+            'total_visitors': total_visitors,
+            'visit_sources': visit_sources
+        }
+        
+        return render_template('admin.html', stats=stats)
     except Exception as e:
         logger.error(f"后台管理页面失败: {e}")
         return render_template('admin.html', 
@@ -1438,14 +1675,19 @@ def admin_article_update(article_id):
         if not title or not content:
             return jsonify({'success': False, 'message': '标题和内容不能为空'}), 400
         
+        preview_html, image_url = build_preview(content)
+        content_html, rendered_hash = build_rendered(content)
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 UPDATE messages 
-                SET title = %s, content = %s, tags = %s
+                SET title = %s, content = %s, tags = %s, preview_html = %s, image_url = %s,
+                    content_html = %s, content_hash = %s
                 WHERE id = %s
-            """, (title, content, tags, article_id))
+            """, (title, content, tags, preview_html, image_url, content_html, rendered_hash, article_id))
+            sync_article_tags(cursor, article_id, tags)
             conn.commit()
+            invalidate_namespaces(*ARTICLE_NAMESPACES)
             
             # 文章更新成功（减少日志输出）
             return jsonify({'success': True, 'message': '更新成功'})
@@ -1460,12 +1702,15 @@ def admin_article_delete(article_id):
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            sync_article_tags(cursor, article_id, [])
+            cursor.execute(*counter_delta_statement(article_id, -1))
             cursor.execute("DELETE FROM messages WHERE id = %s", (article_id,))
             
             if cursor.rowcount == 0:
                 return jsonify({'success': False, 'message': '文章不存在'}), 404
             
             conn.commit()
+            invalidate_namespaces(*ARTICLE_NAMESPACES)
             # 文章删除成功（减少日志输出）
             return jsonify({'success': True, 'message': '删除成功'})
     except Exception as e:
@@ -1541,6 +1786,8 @@ def admin_config_update():
                 """, (str(value), key))
             
             conn.commit()
+            # SEO 等配置会渲染进页面
+            invalidate_namespaces("page")
             # 配置更新成功（减少日志输出）
             
             # 通知采集服务清除配置缓存
@@ -1583,12 +1830,61 @@ def admin_services():
             """)
             service_configs = {row['config_key']: row['config_value'] for row in cursor.fetchall()}
             
+            scrape_trends = get_scrape_run_trends(cursor)
+            
             return render_template('admin_services.html', 
                                  services=services, 
-                                 service_configs=service_configs)
+                                 service_configs=service_configs,
+                                 scrape_trends=scrape_trends)
     except Exception as e:
         logger.error(f"服务管理页面失败: {e}")
-        return render_template('admin_services.html', services=[], service_configs={})
+        return render_template('admin_services.html', services=[], service_configs={},
+                             scrape_trends={'runs': [], 'channels': []})
+
+def get_scrape_run_trends(cursor, run_limit=30):
+    """获取采集运行趋势（最近运行汇总 + 24小时频道统计）"""
+    trends = {'runs': [], 'channels': []}
+    try:
+        cursor.execute("""
+            SELECT run_id, status, error, started_at, finished_at, duration_ms,
+                   total_messages, duplicate_messages, new_messages,
+                   bytes_downloaded, bytes_uploaded,
+                   telegram_ms, image_ms, upload_ms, db_ms
+            FROM scrape_runs
+            WHERE channel IS NULL
+            ORDER BY started_at DESC
+            LIMIT %s
+        """, (run_limit,))
+        for run in cursor.fetchall():
+            minutes = max(run['duration_ms'], 1) / 60000
+            run['messages_per_minute'] = round(run['new_messages'] / minutes, 1)
+            stage_total = sum(run[f'{stage}_ms'] for stage in ('telegram', 'image', 'upload', 'db')) or 1
+            run['stage_percent'] = {
+                stage: round(run[f'{stage}_ms'] * 100 / stage_total, 1)
+                for stage in ('telegram', 'image', 'upload', 'db')
+            }
+            trends['runs'].append(run)
+        
+        cursor.execute("""
+            SELECT channel, COUNT(*) AS runs,
+                   SUM(status = 'failed') AS failed_runs,
+                   SUM(total_messages) AS total_messages,
+                   SUM(new_messages) AS new_messages,
+                   SUM(bytes_downloaded) AS bytes_downloaded,
+                   SUM(bytes_uploaded) AS bytes_uploaded,
+                   SUM(duration_ms) AS duration_ms
+            FROM scrape_runs
+            WHERE channel IS NOT NULL AND started_at >= NOW() - INTERVAL 1 DAY
+            GROUP BY channel
+            ORDER BY new_messages DESC
+        """)
+        for channel in cursor.fetchall():
+            minutes = max(int(channel['duration_ms'] or 0), 1) / 60000
+            channel['messages_per_minute'] = round(int(channel['new_messages'] or 0) / minutes, 1)
+            trends['channels'].append(channel)
+    except Exception as e:
+        logger.warning(f"获取采集运行趋势失败: {e}")
+    return trends
 
 @app.route('/admin/services/<service_name>/start', methods=['POST'])
 @login_required
@@ -2033,26 +2329,26 @@ def telegram_verification_reset():
         return jsonify({'success': False, 'message': '重置失败'}), 500
 
 @app.route('/tag/<tag>')
+@page_cache.cached()
 def tag_articles(tag):
     """标签页面"""
     try:
-        page = request.args.get('page', 1, type=int)
-        limit = 20
-        offset = (page - 1) * limit
+        cursor = request.args.get('cursor')
+        if cursor and decode_cursor(cursor) is None:
+            return redirect(url_for('tag_articles', tag=tag))
         
-        # 搜索包含该标签的文章
-        articles = search_articles(tag, limit=limit, offset=offset)
-        
-        # 计算分页信息
-        total_count = len(articles)  # 简化处理，实际应该查询总数
-        total_pages = (total_count + limit - 1) // limit
+        # 通过标签索引取文章（游标分页，总数来自标签计数）
+        result = get_tag_articles(tag, limit=20, cursor=cursor or None)
         
         return render_template('search.html', 
-                             articles=articles,
+                             articles=result['articles'],
                              query=tag,
-                             current_page=page,
-                             total_pages=total_pages,
-                             total_count=total_count,
+                             tag=tag,
+                             cursor=cursor,
+                             next_cursor=result['next_cursor'],
+                             current_page=1,
+                             total_pages=0,
+                             total_count=result['total'],
                              page_title=f"标签: {tag}")
     except Exception as e:
         logger.error(f"标签页面错误: {e}")
@@ -2092,11 +2388,19 @@ def api_waterfall_load():
     """瀑布流加载更多内容API"""
     try:
         page = request.args.get('page', 1, type=int)
+        cursor = request.args.get('cursor')
         limit = 12  # 每次加载12个
-        offset = (page - 1) * limit
         
-        # 获取文章
-        articles = get_articles(limit=limit, offset=offset)
+        # 获取文章（游标分页；没有游标时按页码兼容旧页面）
+        if cursor:
+            if decode_cursor(cursor) is None:
+                return jsonify({'success': False, 'message': '无效的分页游标'}), 400
+            result = get_articles_after(limit, cursor)
+            articles, next_cursor, has_more = result['articles'], result['next_cursor'], result['has_more']
+        else:
+            articles = get_articles(limit=limit, offset=(page - 1) * limit)
+            next_cursor = encode_cursor(articles[-1]) if len(articles) == limit else None
+            has_more = len(articles) == limit
         
         # 获取广告位
         homepage_resources_ads = get_advertisements('homepage-resources')
@@ -2124,8 +2428,8 @@ def api_waterfall_load():
                         'content': {
                             'id': article['id'],
                             'title': article['title'],
-                            'content': article['content'],
-                            'content_preview': render_content_preview(article['content']),
+                            'content_preview': article['preview_html'],
+                            'image_url': article.get('image_url'),
                             'created_at': created_at_str,
                             'tags': article.get('tags', '')
                         }
@@ -2141,7 +2445,8 @@ def api_waterfall_load():
         return jsonify({
             'success': True,
             'data': processed_data,
-            'has_more': len(articles) == limit,  # 如果返回的文章数等于limit，说明可能还有更多
+            'has_more': has_more,
+            'next_cursor': next_cursor,
             'page': page
         })
         
@@ -2156,32 +2461,17 @@ def api_stats():
     # API访问（减少调试日志）
     
     try:
-        with get_db_connection() as conn:
-            cursor = conn.cursor(pymysql.cursors.DictCursor)
-            # 总文章数
-            cursor.execute("SELECT COUNT(*) as total FROM messages WHERE is_deleted = 0")
-            total_articles = cursor.fetchone()['total']
-            
-            # 今日文章数
-            today = datetime.now().date()
-            cursor.execute(
-                "SELECT COUNT(*) as today FROM messages WHERE DATE(created_at) = %s AND is_deleted = 0",
-                (today,)
-            )
-            today_articles = cursor.fetchone()['today']
-            
-            # 分类数
-            cursor.execute("SELECT COUNT(DISTINCT sort_id) as categories FROM messages WHERE sort_id IS NOT NULL AND is_deleted = 0")
-            total_categories = cursor.fetchone()['categories']
-            
-            return jsonify({
-                'success': True,
-                'data': {
-                    'total_articles': total_articles,
-                    'today_articles': today_articles,
-                    'total_categories': total_categories
-                }
-            })
+        # 总文章数、今日文章数和分类数（物化计数）
+        today = datetime.now().date()
+        counters = get_content_counters(days=(today,))
+        return jsonify({
+            'success': True,
+            'data': {
+                'total_articles': counters['total'],
+                'today_articles': counters['days'][today],
+                'total_categories': sum(1 for count in counters['categories'].values() if count > 0)
+            }
+        })
     except Exception as e:
         logger.error(f"获取统计信息失败: {e}")
         return jsonify({'success': False, 'message': str(e)}), 500
@@ -2411,6 +2701,7 @@ def admin_ads_create():
                 VALUES (%s, %s, %s, %s, %s)
             """, (name, position, ad_code, is_active, sort_order))
             conn.commit()
+        invalidate_namespaces(*ADS_NAMESPACES)
             
         # 广告位创建成功（减少日志输出）
         return jsonify({'success': True, 'message': '广告位创建成功'})
@@ -2465,6 +2756,7 @@ def admin_ads_edit(ad_id):
                 WHERE id = %s
             """, (name, position, ad_code, is_active, sort_order, ad_id))
             conn.commit()
+        invalidate_namespaces(*ADS_NAMESPACES)
             
         logger.info(f"广告位更新成功: {name} by {session.get('username', 'unknown')}")
         return jsonify({'success': True, 'message': '广告位更新成功'})
@@ -2482,6 +2774,7 @@ def admin_ads_delete(ad_id):
             cursor = conn.cursor()
             cursor.execute("DELETE FROM advertisements WHERE id = %s", (ad_id,))
             conn.commit()
+        invalidate_namespaces(*ADS_NAMESPACES)
             
         logger.info(f"广告位删除成功: ID {ad_id} by {session.get('username', 'unknown')}")
         return jsonify({'success': True, 'message': '广告位删除成功'})
@@ -2503,6 +2796,7 @@ def admin_ads_toggle(ad_id):
                 WHERE id = %s
             """, (ad_id,))
             conn.commit()
+        invalidate_namespaces(*ADS_NAMESPACES)
             
         logger.info(f"广告位状态切换成功: ID {ad_id} by {session.get('username', 'unknown')}")
         return jsonify({'success': True, 'message': '状态切换成功'})
@@ -2532,6 +2826,7 @@ def admin_cache():
             memory_usage = info.get('used_memory', 0)
             cache_status['memory_usage'] = f"{memory_usage // 1024 // 1024}MB"
         except Exception as e:
+            cache.report_error(e)
             logger.error(f"获取缓存信息失败: {e}")
     
     return render_template('admin_cache.html', cache_status=cache_status)
@@ -2545,8 +2840,10 @@ def admin_cache_clear():
         if not cache.is_available():
             return jsonify({'success': False, 'message': 'Redis不可用'})
         
-        # 清空当前数据库的所有键
-        cache.redis_client.flushdb()
+        # 递增所有命名空间版本并清理缓存键（不使用 FLUSHDB，保留待合并的点击计数等非缓存数据）
+        cache.bump_namespaces(*CacheKeys.NAMESPACES)
+        for namespace in CacheKeys.NAMESPACES:
+            cache.delete_pattern(f"{namespace}:*")
         
         logger.info(f"缓存清空成功 by {session.get('username', 'unknown')}")
         return jsonify({'success': True, 'message': '缓存清空成功'})
@@ -2579,6 +2876,16 @@ def admin_cache_clear_pattern():
         logger.error(f"按模式清空缓存失败: {e}")
         return jsonify({'success': False, 'message': f'操作失败: {str(e)}'})
 
+@app.route('/admin/db/pool/stats')
+@login_required
+def admin_db_pool_stats():
+    """获取数据库连接池统计信息"""
+    return jsonify({
+        'success': True,
+        'data': db_pool.stats(),
+        'analytics_writer': analytics_writer.stats()
+    })
+
 @app.route('/admin/cache/stats')
 @login_required
 def admin_cache_stats():
@@ -2586,7 +2893,13 @@ def admin_cache_stats():
     try:
         cache = get_cache_manager()
         if not cache.is_available():
-            return jsonify({'success': False, 'message': 'Redis不可用'})
+            return jsonify({
+                'success': False,
+                'message': 'Redis不可用',
+                'circuit': cache.breaker.stats(),
+                'tiers': cache.tier_stats(),
+                'page_cache': page_cache.stats()
+            })
         
         info = cache.redis_client.info()
         stats = {
@@ -2602,6 +2915,10 @@ def admin_cache_stats():
         # 计算命中率
         total_requests = stats['hits'] + stats['misses']
         stats['hit_rate'] = (stats['hits'] / total_requests * 100) if total_requests > 0 else 0
+        stats['circuit'] = cache.breaker.stats()
+        stats['tiers'] = cache.tier_stats()
+        stats['page_cache'] = page_cache.stats()
+        stats['search_index'] = search_engine.stats() if search_engine is not None else None
         
         return jsonify({'success': True, 'data': stats})
         
@@ -2665,55 +2982,21 @@ def generate_meta_description(content, seo_config=None):
     else:
         return truncated + '...'
 
+@cache_related_articles(ttl=CacheTTL.LONG)
 def get_related_articles(article_id, limit=6):
-    """获取相关文章（基于标签相似度）"""
+    """获取相关文章（入库/编辑时按标签相似度预先算好，这里只按主键读取）"""
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor(pymysql.cursors.DictCursor)
-            
-            # 先获取当前文章的标签
-            cursor.execute("SELECT tags FROM messages WHERE id = %s", (article_id,))
-            current_article = cursor.fetchone()
-            
-            if not current_article or not current_article['tags']:
-                return []
-            
-            current_tags = set(tag.strip().lower() for tag in current_article['tags'].split(',') if tag.strip())
-            
-            # 获取所有其他文章
             cursor.execute("""
-                SELECT id, title, tags, created_at
-                FROM messages 
-                WHERE id != %s AND tags IS NOT NULL AND tags != '' AND is_deleted = 0
-                ORDER BY created_at DESC
-                LIMIT 100
-            """, (article_id,))
-            all_articles = cursor.fetchall()
-            
-            # 计算标签相似度
-            related_articles = []
-            for article in all_articles:
-                if not article['tags']:
-                    continue
-                    
-                article_tags = set(tag.strip().lower() for tag in article['tags'].split(',') if tag.strip())
-                
-                # 计算交集
-                common_tags = current_tags.intersection(article_tags)
-                if common_tags:
-                    similarity = len(common_tags) / len(current_tags.union(article_tags))
-                    related_articles.append({
-                        'id': article['id'],
-                        'title': article['title'],
-                        'tags': article['tags'],
-                        'created_at': article['created_at'],
-                        'similarity': similarity
-                    })
-            
-            # 按相似度排序，返回前6个
-            related_articles.sort(key=lambda x: x['similarity'], reverse=True)
-            return related_articles[:limit]
-            
+                SELECT m.id, m.title, m.tags, m.created_at, r.score AS similarity
+                FROM related_articles r
+                JOIN messages m ON m.id = r.related_id
+                WHERE r.message_id = %s AND m.is_deleted = 0
+                ORDER BY r.score DESC, r.related_id DESC
+                LIMIT %s
+            """, (article_id, limit))
+            return cursor.fetchall()
     except Exception as e:
         logger.error(f"获取相关文章失败: {e}")
         return []
@@ -2767,18 +3050,27 @@ def admin_article_update_v2(article_id):
         if not title or not content:
             return jsonify({'success': False, 'message': '标题和内容不能为空'}), 400
         
+        preview_html, image_url = build_preview(content)
+        content_html, rendered_hash = build_rendered(content)
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            # 分类可能改变：按旧分类减一、更新后按新分类加一
+            cursor.execute(*counter_delta_statement(article_id, -1))
             cursor.execute("""
                 UPDATE messages 
-                SET title = %s, content = %s, tags = %s, source_channel = %s, sort_id = %s, updated_at = NOW()
+                SET title = %s, content = %s, tags = %s, source_channel = %s, sort_id = %s,
+                    preview_html = %s, image_url = %s, content_html = %s, content_hash = %s, updated_at = NOW()
                 WHERE id = %s
-            """, (title, content, tags, source_channel, sort_id, article_id))
+            """, (title, content, tags, source_channel, sort_id, preview_html, image_url,
+                  content_html, rendered_hash, article_id))
             
             if cursor.rowcount == 0:
                 return jsonify({'success': False, 'message': '文章不存在'}), 404
             
+            cursor.execute(*counter_delta_statement(article_id, 1))
+            sync_article_tags(cursor, article_id, tags)
             conn.commit()
+            invalidate_namespaces(*ARTICLE_NAMESPACES)
             return jsonify({'success': True, 'message': '文章更新成功'})
     except Exception as e:
         logger.error(f"更新文章失败: {e}")
@@ -2790,12 +3082,15 @@ def admin_article_delete_v2(article_id):
     try:
         with get_db_connection() as conn:
             cursor = conn.cursor()
+            sync_article_tags(cursor, article_id, [])
+            cursor.execute(*counter_delta_statement(article_id, -1))
             cursor.execute("DELETE FROM messages WHERE id = %s", (article_id,))
             
             if cursor.rowcount == 0:
                 return jsonify({'success': False, 'message': '文章不存在'}), 404
             
             conn.commit()
+            invalidate_namespaces(*ARTICLE_NAMESPACES)
             return jsonify({'success': True, 'message': '文章删除成功'})
     except Exception as e:
         logger.error(f"删除文章失败: {e}")
@@ -0,0 +1,91 @@
+"""
+回填列表卡片摘要
+为 preview_html 为空的旧文章生成摘要和首图（按主键分批，不锁整表）
+
+用法（在 frontend 容器内，执行 sql/add_preview_column.sql 之后）:
+    python backfill_previews.py                 # 只处理尚未回填的文章
+    python backfill_previews.py --all           # 摘要规则变化后全部重新生成
+    python backfill_previews.py --batch-size 200
+"""
+
+import argparse
+import logging
+import time
+
+from content_preview import build_preview
+from db_pool import connection_factory_from_env, dict_cursor
+
+logger = logging.getLogger(__name__)
+
+
+def backfill(connect, batch_size=500, regenerate=False, pause=0.05):
+    """
+    分批回填摘要
+
+    Args:
+        connect: 返回数据库连接上下文管理器的工厂
+        batch_size: 每批文章数
+        regenerate: 为 True 时重新生成所有文章的摘要
+        pause: 每批之间的间隔（秒），避免占满数据库
+
+    Returns:
+        更新的文章数
+    """
+    condition = "" if regenerate else "AND preview_html IS NULL"
+    last_id, updated = 0, 0
+    with connect() as conn:
+        cursor = conn.cursor(dict_cursor())
+        while True:
+            cursor.execute(f"""
+                SELECT id, content, image_url FROM messages
+                WHERE id > %s {condition}
+                ORDER BY id LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            params = []
+            for row in rows:
+                preview_html, image_url = build_preview(row['content'], row['image_url'])
+                params.append((preview_html, image_url, row['id']))
+            # 保持 updated_at 不变，避免搜索索引把回填当成内容修改
+            cursor.executemany("""
+                UPDATE messages SET preview_html = %s, image_url = %s, updated_at = updated_at
+                WHERE id = %s
+            """, params)
+            conn.commit()
+
+            updated += len(rows)
+            last_id = rows[-1]['id']
+            logger.info(f"已回填 {updated} 篇文章（id <= {last_id}）")
+            time.sleep(pause)
+    return updated
+
+
+def invalidate_list_caches():
+    """回填后让列表、搜索和整页缓存失效"""
+    try:
+        from cache_manager import CacheKeys, get_cache_manager
+        cache = get_cache_manager()
+        if cache.is_available():
+            cache.bump_namespaces(*CacheKeys.NAMESPACES)
+    except Exception as e:
+        logger.error(f"清除缓存失败: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回填列表卡片摘要')
+    parser.add_argument('--all', action='store_true', help='重新生成所有文章的摘要')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    started = time.perf_counter()
+    updated = backfill(connection_factory_from_env(), args.batch_size, args.all)
+    invalidate_list_caches()
+    print(f"✅ 回填完成: {updated} 篇文章，耗时 {time.perf_counter() - started:.1f} 秒")
+
+
+if __name__ == '__main__':
+    main()
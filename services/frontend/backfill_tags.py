@@ -0,0 +1,155 @@
+"""
+回填标签倒排索引
+把未删除文章的 messages.tags 拆分写入 tags / message_tags（按主键分批），移除已软删除文章的映射，
+重新统计每个标签的文章数，再为每篇文章重新计算相关推荐（related_articles）
+
+用法（在 frontend 容器内，执行 sql/add_tag_index.sql 和 sql/add_related_articles.sql 之后）:
+    python backfill_tags.py                     # 回填全部文章、重新计数并重建相关推荐
+    python backfill_tags.py --recount-only      # 只移除已删除文章的映射并校正标签文章数
+    python backfill_tags.py --related-only      # 只重建相关推荐
+
+文章标签变化或被删除时，后台在同一事务中为因此变短的其他文章的推荐列表补位；
+采集入库时刷新推荐失败仍会留下缺口，可定期（例如每天）运行 --related-only 补齐。
+"""
+
+import argparse
+import logging
+import time
+
+from tag_index import RELATED_CANDIDATES_SQL, rank_related, split_tags
+from db_pool import connection_factory_from_env, dict_cursor
+
+logger = logging.getLogger(__name__)
+
+
+def backfill(connect, batch_size=500, pause=0.05):
+    """
+    分批回填标签映射（可重复执行，已存在的映射会被忽略）
+
+    Returns:
+        处理的文章数
+    """
+    last_id, processed = 0, 0
+    with connect() as conn:
+        cursor = conn.cursor(dict_cursor())
+        while True:
+            cursor.execute("""
+                SELECT id, tags, created_at FROM messages
+                WHERE id > %s AND is_deleted = 0 ORDER BY id LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            mappings = [(name, row['id'], row['created_at']) for row in rows for name in split_tags(row['tags'])]
+            if mappings:
+                names = sorted({name.lower(): name for name, _, _ in mappings}.values())
+                cursor.executemany("INSERT IGNORE INTO tags (name) VALUES (%s)", [(name,) for name in names])
+                cursor.executemany("""
+                    INSERT IGNORE INTO message_tags (tag_id, message_id, message_created_at)
+                    SELECT id, %s, %s FROM tags WHERE name = %s
+                """, [(message_id, created_at, name) for name, message_id, created_at in mappings])
+            conn.commit()
+
+            processed += len(rows)
+            last_id = rows[-1]['id']
+            logger.info(f"已回填 {processed} 篇文章的标签（id <= {last_id}）")
+            time.sleep(pause)
+    return processed
+
+
+def recount(connect):
+    """移除已软删除文章的标签映射，按 message_tags 重新统计每个标签的文章数，并删除没有文章的标签"""
+    with connect() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            DELETE mt FROM message_tags mt JOIN messages m ON m.id = mt.message_id
+            WHERE m.is_deleted = 1
+        """)
+        cursor.execute("""
+            UPDATE tags t
+            LEFT JOIN (SELECT tag_id, COUNT(*) AS total FROM message_tags GROUP BY tag_id) c ON c.tag_id = t.id
+            SET t.article_count = COALESCE(c.total, 0)
+        """)
+        cursor.execute("DELETE FROM tags WHERE article_count = 0")
+        removed = cursor.rowcount
+        conn.commit()
+        return removed
+
+
+def rebuild_related(connect, batch_size=500, pause=0.05):
+    """
+    逐篇重新计算相关推荐（只重写每篇文章自己的列表，全部跑完后列表之间自然一致）
+
+    Returns:
+        处理的文章数
+    """
+    last_id, processed = 0, 0
+    with connect() as conn:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute("SELECT id, tags, is_deleted FROM messages WHERE id > %s ORDER BY id LIMIT %s",
+                           (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            for message_id, tags, is_deleted in rows:
+                cursor.execute("DELETE FROM related_articles WHERE message_id = %s", (message_id,))
+                if is_deleted:
+                    # 已删除的文章也不能留在其他文章的列表中
+                    cursor.execute("DELETE FROM related_articles WHERE related_id = %s", (message_id,))
+                    continue
+                tag_count = len(split_tags(tags))
+                if not tag_count:
+                    continue
+                cursor.execute(RELATED_CANDIDATES_SQL, (message_id, message_id))
+                ranked = rank_related(tag_count, cursor.fetchall())
+                if ranked:
+                    cursor.executemany(
+                        "INSERT INTO related_articles (message_id, related_id, score) VALUES (%s, %s, %s)",
+                        [(message_id, related_id, score) for related_id, score in ranked]
+                    )
+            conn.commit()
+
+            processed += len(rows)
+            last_id = rows[-1][0]
+            logger.info(f"已重建 {processed} 篇文章的相关推荐（id <= {last_id}）")
+            time.sleep(pause)
+    return processed
+
+
+def invalidate_tag_pages():
+    """回填后让标签页、相关推荐和整页缓存失效"""
+    try:
+        from cache_manager import get_cache_manager
+        cache = get_cache_manager()
+        if cache.is_available():
+            cache.bump_namespaces("article", "articles", "page")
+    except Exception as e:
+        logger.error(f"清除缓存失败: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回填标签倒排索引')
+    parser.add_argument('--recount-only', action='store_true', help='只重新统计标签文章数')
+    parser.add_argument('--related-only', action='store_true', help='只重建相关推荐')
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    connect = connection_factory_from_env()
+    started = time.perf_counter()
+    if args.related_only:
+        processed, removed = 0, 0
+    else:
+        processed = 0 if args.recount_only else backfill(connect, args.batch_size)
+        removed = recount(connect)
+    related = 0 if args.recount_only else rebuild_related(connect, args.batch_size)
+    invalidate_tag_pages()
+    print(f"✅ 完成: 回填 {processed} 篇文章，删除 {removed} 个空标签，"
+          f"重建 {related} 篇相关推荐，耗时 {time.perf_counter() - started:.1f} 秒")
+
+
+if __name__ == '__main__':
+    main()
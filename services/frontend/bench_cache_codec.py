@@ -0,0 +1,136 @@
+"""
+缓存编码性能对比
+对比旧的 JSON + datetime 猜测路径与 cache_codec 编码器的编解码耗时和体积
+
+用法（在 frontend 容器内）:
+    python bench_cache_codec.py --limit 20 --iterations 2000
+    python bench_cache_codec.py --synthetic   # 无数据库时使用构造的文章数据
+"""
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from cache_codec import CODECS, msgpack
+
+
+def legacy_encode(value):
+    """旧路径：递归复制并把 datetime 转成字符串后 json.dumps"""
+    def process(obj):
+        if isinstance(obj, dict):
+            return {k: process(v) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [process(item) for item in obj]
+        elif hasattr(obj, 'isoformat'):
+            return obj.isoformat()
+        return obj
+    return json.dumps(process(value), ensure_ascii=False).encode()
+
+
+def legacy_decode(data):
+    """旧路径：json.loads 后对每个字符串尝试 fromisoformat"""
+    def restore(obj):
+        if isinstance(obj, dict):
+            return {k: restore(v) for k, v in obj.items()}
+        elif isinstance(obj, list):
+            return [restore(item) for item in obj]
+        elif isinstance(obj, str):
+            try:
+                return datetime.fromisoformat(obj)
+            except (ValueError, TypeError):
+                return obj
+        return obj
+    return restore(json.loads(data))
+
+
+def load_rows(limit):
+    """从 messages 表读取文章列表页使用的行"""
+    import pymysql
+    conn = pymysql.connect(
+        host=os.environ.get('MYSQL_HOST', 'mysql'),
+        port=int(os.environ.get('MYSQL_PORT', 3306)),
+        user=os.environ.get('MYSQL_USER', 'tg2em'),
+        password=os.environ.get('MYSQL_PASSWORD', 'tg2em2025'),
+        database=os.environ.get('MYSQL_DATABASE', 'tg2em'),
+        charset='utf8mb4'
+    )
+    try:
+        cursor = conn.cursor(pymysql.cursors.DictCursor)
+        cursor.execute("""
+            SELECT id, title, content, tags, source_channel, created_at, click_count
+            FROM messages
+            ORDER BY created_at DESC
+            LIMIT %s
+        """, (limit,))
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+
+def synthetic_rows(limit):
+    """构造与文章列表相近的数据（包含形似日期的标题）"""
+    now = datetime.now().replace(microsecond=0)
+    return [{
+        'id': i,
+        'title': '2024-05-01' if i % 10 == 0 else f'示例文章标题 {i}',
+        'content': '这是一段用于测试的正文内容，包含链接 https://example.com/img.jpg 和一些说明。' * 20,
+        'tags': '#资源 #分享 #测试',
+        'source_channel': 'example_channel',
+        'created_at': now - timedelta(minutes=i),
+        'click_count': i * 3
+    } for i in range(limit)]
+
+
+def bench(name, encode, decode, value, iterations):
+    data = encode(value)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        encode(value)
+    encode_us = (time.perf_counter() - started) / iterations * 1e6
+
+    started = time.perf_counter()
+    for _ in range(iterations):
+        decoded = decode(data)
+    decode_us = (time.perf_counter() - started) / iterations * 1e6
+
+    print(f"{name:<10} 编码 {encode_us:9.1f} µs   解码 {decode_us:9.1f} µs   大小 {len(data):8d} 字节")
+    return decoded
+
+
+def check_round_trip(name, value, decoded):
+    """检查往返后的值是否与原值一致（旧路径会把形似日期的标题变成 datetime）"""
+    mismatches = sum(
+        1 for original, restored in zip(value, decoded)
+        for key in original if original[key] != restored.get(key)
+    )
+    if mismatches:
+        print(f"  ⚠️ {name}: {mismatches} 个字段往返后不一致")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='缓存编码性能对比')
+    parser.add_argument('--limit', type=int, default=20, help='每个缓存值包含的文章数')
+    parser.add_argument('--iterations', type=int, default=2000, help='每项测试的循环次数')
+    parser.add_argument('--synthetic', action='store_true', help='不连接数据库，使用构造的数据')
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.limit) if args.synthetic else load_rows(args.limit)
+    rows = [dict(row) for row in rows]
+    print(f"📊 {len(rows)} 篇文章，每项 {args.iterations} 次")
+
+    decoded = bench('legacy', legacy_encode, legacy_decode, rows, args.iterations)
+    check_round_trip('legacy', rows, decoded)
+
+    for name, codec_class in CODECS.items():
+        if name == 'msgpack' and msgpack is None:
+            print("msgpack    未安装，跳过")
+            continue
+        codec = codec_class()
+        decoded = bench(name, codec.encode, codec.decode, rows, args.iterations)
+        check_round_trip(name, rows, decoded)
+
+
+if __name__ == '__main__':
+    main()
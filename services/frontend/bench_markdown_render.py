@@ -0,0 +1,69 @@
+"""
+正文渲染性能对比
+对比原先每次新建 Markdown 实例的渲染、复用解析器的完整渲染和采集固定格式的快速路径，
+并校验快速路径的输出与完整渲染一致
+
+用法（在 frontend 容器内）:
+    python bench_markdown_render.py                   # 取最新的 500 篇文章
+    python bench_markdown_render.py --limit 2000 --iterations 5
+"""
+
+import argparse
+import re
+import time
+
+import markdown
+
+from content_render import (
+    MARKDOWN_EXTENSIONS, MARKDOWN_EXTENSION_CONFIGS, render_content_html, render_fixed_format
+)
+from db_pool import connection_factory_from_env, dict_cursor
+
+
+def render_legacy(text):
+    """原先的渲染方式：每次新建带六个扩展的 Markdown 实例"""
+    md = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS, extension_configs=MARKDOWN_EXTENSION_CONFIGS)
+    html = md.convert(text)
+    return re.sub(
+        r'<img([^>]*?)src="([^"]*?)"([^>]*?)>',
+        r'<img\1src="\2"\3 class="img-fluid rounded shadow" style="max-width: 100%; height: auto; margin: 10px 0;">',
+        html
+    )
+
+
+def bench(render, contents, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for content in contents:
+            render(content)
+    return (time.perf_counter() - started) / (iterations * len(contents)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='正文渲染性能对比')
+    parser.add_argument('--limit', type=int, default=500, help='取最新的文章数')
+    parser.add_argument('--iterations', type=int, default=3)
+    args = parser.parse_args()
+
+    with connection_factory_from_env()() as conn:
+        cursor = conn.cursor(dict_cursor())
+        cursor.execute("SELECT content FROM messages ORDER BY id DESC LIMIT %s", (args.limit,))
+        contents = [row['content'] for row in cursor.fetchall() if row['content']]
+    if not contents:
+        print("❌ 没有可用的文章")
+        return
+
+    fixed = [content for content in contents if render_fixed_format(content) is not None]
+    mismatched = [content for content in fixed if render_content_html(content) != render_legacy(content)]
+    print(f"📦 {len(contents)} 篇文章，{len(fixed)} 篇走快速路径，输出不一致 {len(mismatched)} 篇")
+
+    print(f"{'方案':<24}{'每篇 (ms)':>12}")
+    print(f"{'每次新建 Markdown':<24}{bench(render_legacy, contents, args.iterations):>12.4f}")
+    print(f"{'复用解析器 + 快速路径':<24}{bench(render_content_html, contents, args.iterations):>12.4f}")
+    if fixed:
+        print(f"{'固定格式 - 新建 Markdown':<24}{bench(render_legacy, fixed, args.iterations):>12.4f}")
+        print(f"{'固定格式 - 快速路径':<24}{bench(render_fixed_format, fixed, args.iterations):>12.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+搜索性能对比
+对比进程内搜索索引、ngram 全文索引和原先的标题 LIKE 查询
+
+用法（在 frontend 容器内）:
+    python bench_search_engine.py                     # 使用 search_logs 中最热门的查询
+    python bench_search_engine.py 电影 阿里云盘 --iterations 50
+"""
+
+import argparse
+import time
+
+from db_pool import connection_factory_from_env, dict_cursor
+from search_engine import SearchEngine, build_fulltext_query
+
+
+def bench_sql(connect, sql, params, iterations):
+    with connect() as conn:
+        cursor = conn.cursor(dict_cursor())
+        started = time.perf_counter()
+        for _ in range(iterations):
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        return (time.perf_counter() - started) / iterations * 1000, len(rows)
+
+
+def popular_queries(connect, limit):
+    with connect() as conn:
+        cursor = conn.cursor(dict_cursor())
+        cursor.execute("""
+            SELECT search_keyword FROM search_logs
+            GROUP BY search_keyword ORDER BY COUNT(*) DESC LIMIT %s
+        """, (limit,))
+        return [row['search_keyword'] for row in cursor.fetchall()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='搜索性能对比')
+    parser.add_argument('queries', nargs='*', help='查询词，默认取 search_logs 中最热门的查询')
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    connect = connection_factory_from_env()
+    queries = args.queries or popular_queries(connect, 10)
+
+    engine = SearchEngine(connect)
+    started = time.perf_counter()
+    engine.rebuild()
+    print(f"📦 索引构建 {time.perf_counter() - started:.2f} 秒: {engine.stats()}")
+
+    print(f"{'查询':<16}{'LIKE (ms)':>12}{'FULLTEXT (ms)':>16}{'索引首次 (ms)':>16}{'索引缓存 (ms)':>16}{'结果数':>10}")
+    for query in queries:
+        like_ms, _ = bench_sql(connect, """
+            SELECT * FROM messages WHERE title LIKE %s ORDER BY created_at DESC LIMIT %s OFFSET 0
+        """, (f"%{query}%", args.limit), args.iterations)
+        like_count_ms, _ = bench_sql(connect, "SELECT COUNT(*) AS count FROM messages WHERE title LIKE %s",
+                                     (f"%{query}%",), args.iterations)
+
+        # 与前台退回全文索引时的查询一致（单字查询无法使用 ngram 索引，不测）
+        fulltext_query = build_fulltext_query(query)
+        fulltext_ms = float('nan')
+        if fulltext_query:
+            fulltext_ms, _ = bench_sql(connect, """
+                SELECT m.*,
+                       MATCH(m.title, m.tags) AGAINST (%s IN BOOLEAN MODE) AS relevance,
+                       COUNT(*) OVER () AS total_count
+                FROM messages m
+                WHERE MATCH(m.title, m.tags) AGAINST (%s IN BOOLEAN MODE)
+                ORDER BY relevance DESC, m.created_at DESC
+                LIMIT %s OFFSET 0
+            """, (fulltext_query, fulltext_query, args.limit), args.iterations)
+
+        engine._results.clear()
+        started = time.perf_counter()
+        result = engine.search(query, args.limit)
+        cold_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        for _ in range(args.iterations):
+            engine.search(query, args.limit)
+        warm_ms = (time.perf_counter() - started) / args.iterations * 1000
+
+        total = result[1] if result is not None else '-'
+        print(f"{query:<16}{like_ms + like_count_ms:>12.3f}{fulltext_ms:>16.3f}{cold_ms:>16.3f}{warm_ms:>16.4f}{total:>10}")
+
+
+if __name__ == '__main__':
+    main()
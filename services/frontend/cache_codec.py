@@ -0,0 +1,151 @@
+"""
+缓存序列化模块
+带格式版本字节的二进制编码，datetime/date/Decimal 使用显式类型标记
+"""
+
+import base64
+import json
+import logging
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Optional
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - 未安装 msgpack 时退回 JSON 编码
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# msgpack 扩展类型编号
+EXT_DATETIME = 1
+EXT_DATE = 2
+EXT_DECIMAL = 3
+EXT_TIMEDELTA = 4
+
+
+class CacheCodec:
+    """缓存编码器基类
+
+    编码结果的第一个字节是格式版本；解码时版本不一致视为未命中，
+    升级格式后旧条目会被自然重建，不会被错误解析。
+    """
+
+    name = 'base'
+    format_version = 0
+
+    def encode(self, value: Any) -> bytes:
+        return bytes([self.format_version]) + self._encode(value)
+
+    def decode(self, data: bytes) -> Optional[Any]:
+        """解码，格式版本不匹配时返回 None"""
+        if not data or data[0] != self.format_version:
+            return None
+        return self._decode(data[1:])
+
+    def _encode(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def _decode(self, payload: bytes) -> Any:
+        raise NotImplementedError
+
+
+class MsgpackCodec(CacheCodec):
+    """msgpack 编码（默认）"""
+
+    name = 'msgpack'
+    format_version = 1
+
+    @staticmethod
+    def _default(obj):
+        # datetime 是 date 的子类，需要先判断
+        if isinstance(obj, datetime):
+            return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode())
+        if isinstance(obj, date):
+            return msgpack.ExtType(EXT_DATE, obj.isoformat().encode())
+        if isinstance(obj, Decimal):
+            return msgpack.ExtType(EXT_DECIMAL, str(obj).encode())
+        if isinstance(obj, timedelta):
+            return msgpack.ExtType(EXT_TIMEDELTA, str(obj.total_seconds()).encode())
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        raise TypeError(f"无法缓存的类型: {type(obj).__name__}")
+
+    @staticmethod
+    def _ext_hook(code, data):
+        if code == EXT_DATETIME:
+            return datetime.fromisoformat(data.decode())
+        if code == EXT_DATE:
+            return date.fromisoformat(data.decode())
+        if code == EXT_DECIMAL:
+            return Decimal(data.decode())
+        if code == EXT_TIMEDELTA:
+            return timedelta(seconds=float(data.decode()))
+        return msgpack.ExtType(code, data)
+
+    def _encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=self._default, use_bin_type=True, datetime=False)
+
+    def _decode(self, payload: bytes) -> Any:
+        return msgpack.unpackb(payload, ext_hook=self._ext_hook, raw=False, strict_map_key=False)
+
+
+class JsonCodec(CacheCodec):
+    """JSON 编码（未安装 msgpack 时使用），特殊类型以 {"__t": 类型, "v": 值} 标记"""
+
+    name = 'json'
+    format_version = 2
+
+    _TAGS = {
+        'dt': datetime.fromisoformat,
+        'd': date.fromisoformat,
+        'dec': Decimal,
+        'td': lambda v: timedelta(seconds=float(v)),
+        'b': base64.b64decode
+    }
+
+    @staticmethod
+    def _default(obj):
+        if isinstance(obj, datetime):
+            return {'__t': 'dt', 'v': obj.isoformat()}
+        if isinstance(obj, date):
+            return {'__t': 'd', 'v': obj.isoformat()}
+        if isinstance(obj, Decimal):
+            return {'__t': 'dec', 'v': str(obj)}
+        if isinstance(obj, timedelta):
+            return {'__t': 'td', 'v': str(obj.total_seconds())}
+        if isinstance(obj, bytes):
+            return {'__t': 'b', 'v': base64.b64encode(obj).decode('ascii')}
+        if isinstance(obj, (set, frozenset)):
+            return list(obj)
+        raise TypeError(f"无法缓存的类型: {type(obj).__name__}")
+
+    @classmethod
+    def _object_hook(cls, obj):
+        tag = obj.get('__t')
+        if tag is not None and len(obj) == 2 and tag in cls._TAGS:
+            return cls._TAGS[tag](obj['v'])
+        return obj
+
+    def _encode(self, value: Any) -> bytes:
+        return json.dumps(value, default=self._default, ensure_ascii=False, separators=(',', ':')).encode()
+
+    def _decode(self, payload: bytes) -> Any:
+        return json.loads(payload, object_hook=self._object_hook)
+
+
+CODECS = {codec.name: codec for codec in (MsgpackCodec, JsonCodec)}
+
+
+def get_codec(name: Optional[str] = None) -> CacheCodec:
+    """
+    获取缓存编码器
+
+    Args:
+        name: msgpack 或 json，默认优先使用 msgpack
+    """
+    name = name or ('msgpack' if msgpack is not None else 'json')
+    if name == 'msgpack' and msgpack is None:
+        logger.warning("未安装 msgpack，缓存改用 JSON 编码")
+        name = 'json'
+    return CODECS[name]()
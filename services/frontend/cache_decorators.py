@@ -4,20 +4,138 @@
 """
 
 import functools
+import hashlib
+import inspect
 import logging
-from typing import Any, Callable, Optional, Union
+import re
+import string
+import threading
+import time
+from typing import Any, Callable, Optional, Tuple, Union
 from cache_manager import get_cache_manager, CacheKeys, CacheTTL
 
 logger = logging.getLogger(__name__)
 
-def cached(key_template: str, ttl: Union[int, None] = None, key_func: Optional[Callable] = None):
+# 文章内容变化时需要失效的命名空间（详情、列表、搜索、分类、整页缓存）
+ARTICLE_NAMESPACES = ("article", "articles", "search", "categories", "page")
+
+# 广告变化时需要失效的命名空间
+ADS_NAMESPACES = ("ads", "page")
+
+def invalidate_namespaces(*namespaces: str) -> bool:
+    """递增命名空间版本，使这些命名空间下的缓存失效（不扫描、不删除键）"""
+    return get_cache_manager().bump_namespaces(*namespaces)
+
+# 可以原样放进缓存键的参数值（其余的取哈希，避免超长键和通配符/分隔符注入）
+_SAFE_KEY_VALUE = re.compile(r'^[\w.\-]{0,64}$')
+
+def _key_part(value: Any) -> str:
+    """参数值转换为缓存键片段"""
+    text = str(value)
+    if _SAFE_KEY_VALUE.match(text):
+        return text
+    return '~' + hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+def compile_key_builder(key_template: str, func: Callable, key_exclude: Tuple[str, ...] = ()) -> Callable:
+    """
+    按函数签名校验键模板并生成键函数（装饰时执行一次，模板不匹配时抛出 ValueError）
+    
+    模板中的占位符必须都是函数参数；函数参数也必须都出现在模板中（key_exclude 列出的除外），
+    否则不同参数会共用同一个缓存键。
+    
+    Args:
+        key_template: 缓存键模板，如 "search:{query}:{limit}:{offset}"
+        func: 被缓存的函数
+        key_exclude: 不参与缓存键的参数名
+    """
+    sig = inspect.signature(func)
+    params = list(sig.parameters.values())
+    placeholders = [field for _, field, _, _ in string.Formatter().parse(key_template) if field is not None]
+    
+    where = f"{func.__qualname__} 的缓存键模板 {key_template!r}"
+    for param in params:
+        if param.kind in (param.VAR_POSITIONAL, param.VAR_KEYWORD):
+            raise ValueError(f"{where}: 不支持 *args/**kwargs，请改用 key_func")
+    names = [param.name for param in params]
+    unknown = [field for field in placeholders if field not in names]
+    if unknown:
+        raise ValueError(f"{where}: 占位符 {unknown} 不是函数参数")
+    missing = [name for name in names if name not in placeholders and name not in key_exclude]
+    if missing:
+        raise ValueError(f"{where}: 缺少参数 {missing}（不参与缓存键的参数请放入 key_exclude）")
+    
+    # 占位符 -> (位置下标, 默认值)，调用时按位置/关键字直接取值，不再 bind()
+    slots = []
+    for field in placeholders:
+        index = names.index(field)
+        param = params[index]
+        positional = index if param.kind != param.KEYWORD_ONLY else None
+        slots.append((field, positional, param.default))
+    template = re.sub(r'\{(\w+)\}', '{}', key_template)
+    
+    def build_key(*args, **kwargs) -> str:
+        values = []
+        for name, index, default in slots:
+            if index is not None and index < len(args):
+                value = args[index]
+            elif name in kwargs:
+                value = kwargs[name]
+            elif default is not inspect.Parameter.empty:
+                value = default
+            else:
+                raise TypeError(f"{func.__qualname__}() 缺少参数 {name!r}")
+            values.append(_key_part(value))
+        return template.format(*values)
+    
+    return build_key
+
+# 软过期缓存的包装格式：{'value': 结果, 'fresh_until': 软过期时间戳}
+_FRESH_UNTIL = 'fresh_until'
+
+def _wrap_stale(value: Any, soft_ttl: int) -> dict:
+    return {'value': value, _FRESH_UNTIL: time.time() + soft_ttl}
+
+def _unwrap_stale(entry: Any):
+    """返回 (结果, 是否已软过期)"""
+    if isinstance(entry, dict) and _FRESH_UNTIL in entry and 'value' in entry:
+        return entry['value'], entry[_FRESH_UNTIL] < time.time()
+    return entry, False
+
+def _refresh_in_background(cache, cache_key: str, token: str, func: Callable, args, kwargs,
+                           ttl: Optional[int], soft_ttl: int):
+    """后台重建软过期的缓存（调用方已持有重建锁）"""
+    def refresh():
+        try:
+            result = func(*args, **kwargs)
+            if result is not None:
+                cache.set(cache_key, _wrap_stale(result, soft_ttl), ttl)
+        except Exception as e:
+            logger.error(f"后台刷新缓存失败 {cache_key}: {e}")
+        finally:
+            cache.release_lock(cache_key, token)
+    
+    threading.Thread(target=refresh, name='cache-refresh', daemon=True).start()
+
+def cached(key_template: str, ttl: Union[int, None] = None, key_func: Optional[Callable] = None,
+           namespace: Optional[str] = None, soft_ttl: Optional[int] = None,
+           lock_timeout: float = 10, lock_wait: float = 0.5, key_exclude: Tuple[str, ...] = ()):
     """
     缓存装饰器
     
+    缓存未命中时只有拿到重建锁的请求执行原函数，其余请求短暂等待其结果（单飞），
+    等待超时后再自行执行，避免热点键过期时所有请求同时查库。
+    
     Args:
-        key_template: 缓存键模板，支持{arg_name}占位符
+        key_template: 缓存键模板，支持{arg_name}占位符；装饰时按函数签名校验，
+                      超长或含特殊字符的参数值取哈希
         ttl: 过期时间（秒），None表示使用默认值
         key_func: 自定义键生成函数，接收函数参数，返回缓存键
+        namespace: 缓存命名空间，默认取键模板的第一段；键会带上命名空间版本号，
+                   递增版本（见 cache_invalidate）即可让旧缓存失效
+        soft_ttl: 软过期时间（秒，需小于 ttl）；超过后继续返回旧值，同时由一个请求在后台刷新
+        lock_timeout: 重建锁的过期时间（秒），0 表示不做单飞控制
+        lock_wait: 未拿到重建锁时等待其他请求写入缓存的最长秒数
+        key_exclude: 不参与缓存键的参数名
     
     Example:
         @cached("user:{user_id}", ttl=300)
@@ -27,8 +145,32 @@ def cached(key_template: str, ttl: Union[int, None] = None, key_func: Optional[C
         @cached("articles:list", ttl=600, key_func=lambda limit, offset: f"articles:list:{limit}:{offset}")
         def get_articles(limit, offset):
             return db.get_articles(limit, offset)
+        
+        @cached("articles:recent:{limit}", ttl=300, soft_ttl=60)
+        def get_recent_articles(limit):
+            return db.get_recent_articles(limit)
     """
+    cache_namespace = namespace or key_template.split(':', 1)[0]
+    if soft_ttl is not None and ttl is not None and soft_ttl >= ttl:
+        raise ValueError(f"soft_ttl ({soft_ttl}) 必须小于 ttl ({ttl}): {key_template}")
+    
     def decorator(func: Callable) -> Callable:
+        build_key = key_func or compile_key_builder(key_template, func, key_exclude)
+        
+        def store(cache, cache_key, result):
+            if result is not None:
+                cache.set(cache_key, _wrap_stale(result, soft_ttl) if soft_ttl else result, ttl)
+        
+        def wait_for_result(cache, cache_key):
+            """等待持锁请求写入缓存，超时返回None"""
+            deadline = time.monotonic() + lock_wait
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = cache.get(cache_key)
+                if entry is not None:
+                    return _unwrap_stale(entry)[0]
+            return None
+        
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             cache = get_cache_manager()
@@ -37,54 +179,54 @@ def cached(key_template: str, ttl: Union[int, None] = None, key_func: Optional[C
             if not cache.is_available():
                 return func(*args, **kwargs)
             
-            # 生成缓存键
-            if key_func:
-                cache_key = key_func(*args, **kwargs)
-            else:
-                # 使用模板生成键
-                cache_key = key_template
-                # 获取函数参数名
-                import inspect
-                sig = inspect.signature(func)
-                bound_args = sig.bind(*args, **kwargs)
-                bound_args.apply_defaults()
-                
-                # 替换模板中的占位符
-                for param_name, param_value in bound_args.arguments.items():
-                    cache_key = cache_key.replace(f"{{{param_name}}}", str(param_value))
+            # 生成缓存键（模板已在装饰时编译）
+            cache_key = build_key(*args, **kwargs)
+            
+            # 带上命名空间版本
+            cache_key = f"{cache_key}:v{cache.get_namespace_version(cache_namespace)}"
             
             # 尝试从缓存获取
-            cached_result = cache.get(cache_key)
-            if cached_result is not None:
-                # 缓存命中（减少调试日志）
-                return cached_result
+            entry = cache.get(cache_key)
+            if entry is not None:
+                result, stale = _unwrap_stale(entry)
+                if stale:
+                    # 软过期：返回旧值，只有拿到锁的请求触发后台刷新
+                    token = cache.acquire_lock(cache_key, lock_timeout or 10)
+                    if token:
+                        _refresh_in_background(cache, cache_key, token, func, args, kwargs, ttl, soft_ttl)
+                return result
             
-            # 缓存未命中，执行原函数
-            # 缓存未命中（减少调试日志）
-            result = func(*args, **kwargs)
+            # 缓存未命中：单飞重建
+            token = cache.acquire_lock(cache_key, lock_timeout) if lock_timeout else None
+            if lock_timeout and token is None and cache.is_available():
+                result = wait_for_result(cache, cache_key)
+                if result is not None:
+                    return result
             
-            # 将结果存入缓存
-            if result is not None:
-                cache.set(cache_key, result, ttl)
-                # 结果已缓存（减少调试日志）
+            try:
+                result = func(*args, **kwargs)
+                store(cache, cache_key, result)
+            finally:
+                if token:
+                    cache.release_lock(cache_key, token)
             
             return result
         
         return wrapper
     return decorator
 
-def cache_invalidate(pattern: str):
+def cache_invalidate(*namespaces: str):
     """
     缓存失效装饰器
-    在函数执行后删除匹配的缓存
+    在函数执行后递增命名空间版本，使这些命名空间下的缓存失效（不扫描、不删除键）
     
     Args:
-        pattern: 要删除的缓存键模式
+        namespaces: 要失效的缓存命名空间
     
     Example:
-        @cache_invalidate("articles:*")
+        @cache_invalidate("articles", "search")
         def update_article(article_id):
-            # 更新文章后，删除所有文章相关缓存
+            # 更新文章后，文章列表和搜索缓存失效
             pass
     """
     def decorator(func: Callable) -> Callable:
@@ -92,11 +234,8 @@ def cache_invalidate(pattern: str):
         def wrapper(*args, **kwargs):
             result = func(*args, **kwargs)
             
-            # 执行函数后删除缓存
-            cache = get_cache_manager()
-            if cache.is_available():
-                deleted_count = cache.delete_pattern(pattern)
-                # 缓存失效（减少日志输出）
+            # 执行函数后递增命名空间版本
+            invalidate_namespaces(*namespaces)
             
             return result
         
@@ -136,25 +275,37 @@ def cache_conditional(condition_func: Callable[[Any], bool]):
     return decorator
 
 # 预定义的缓存装饰器
-def cache_articles(ttl: int = CacheTTL.MEDIUM):
-    """文章列表缓存装饰器"""
-    return cached("articles:list:{limit}:{offset}", ttl=ttl)
+def cache_articles(ttl: int = CacheTTL.MEDIUM, soft_ttl: Optional[int] = CacheTTL.SHORT):
+    """文章列表缓存装饰器（首页热点键，软过期后后台刷新）"""
+    return cached("articles:list:{category}:{limit}:{offset}", ttl=ttl, soft_ttl=soft_ttl)
+
+def cache_articles_after(ttl: int = CacheTTL.MEDIUM, soft_ttl: Optional[int] = CacheTTL.SHORT):
+    """游标分页文章列表缓存装饰器（同一游标链上的访客共用缓存）"""
+    return cached("articles:after:{category}:{limit}:{cursor}", ttl=ttl, soft_ttl=soft_ttl)
+
+def cache_tag_articles(ttl: int = CacheTTL.MEDIUM):
+    """标签文章列表缓存装饰器（游标分页，含标签文章总数）"""
+    return cached("articles:tag:{tag}:{limit}:{cursor}", ttl=ttl)
 
 def cache_article_detail(ttl: int = CacheTTL.LONG):
     """文章详情缓存装饰器"""
     return cached("article:{article_id}", ttl=ttl)
 
-def cache_popular_articles(ttl: int = CacheTTL.SHORT):
-    """热门文章缓存装饰器"""
-    return cached("articles:popular:{limit}", ttl=ttl)
+def cache_related_articles(ttl: int = CacheTTL.LONG):
+    """相关文章缓存装饰器"""
+    return cached("article:related:{article_id}:{limit}", ttl=ttl)
 
-def cache_recent_articles(ttl: int = CacheTTL.SHORT):
-    """最新文章缓存装饰器"""
-    return cached("articles:recent:{limit}", ttl=ttl)
+def cache_popular_articles(ttl: int = CacheTTL.SHORT, soft_ttl: Optional[int] = 60):
+    """热门文章缓存装饰器（软过期后后台刷新）"""
+    return cached("articles:popular:{limit}", ttl=ttl, soft_ttl=soft_ttl)
+
+def cache_recent_articles(ttl: int = CacheTTL.SHORT, soft_ttl: Optional[int] = 60):
+    """最新文章缓存装饰器（软过期后后台刷新）"""
+    return cached("articles:recent:{limit}", ttl=ttl, soft_ttl=soft_ttl)
 
 def cache_search_results(ttl: int = CacheTTL.MEDIUM):
     """搜索结果缓存装饰器"""
-    return cached("search:{query}:{page}:{per_page}", ttl=ttl)
+    return cached("search:{query}:{limit}:{offset}", ttl=ttl)
 
 def cache_categories(ttl: int = CacheTTL.LONG):
     """分类列表缓存装饰器"""
@@ -165,13 +316,17 @@ def cache_advertisements(ttl: int = CacheTTL.LONG):
     return cached("ads:{position}", ttl=ttl)
 
 def invalidate_article_cache():
-    """文章相关缓存失效装饰器"""
-    return cache_invalidate("article:*")
+    """文章内容变化时的缓存失效装饰器（详情、列表、搜索、分类、整页缓存）"""
+    return cache_invalidate(*ARTICLE_NAMESPACES)
 
 def invalidate_articles_list_cache():
     """文章列表缓存失效装饰器"""
-    return cache_invalidate("articles:*")
+    return cache_invalidate("articles")
 
 def invalidate_search_cache():
     """搜索缓存失效装饰器"""
-    return cache_invalidate("search:*")
+    return cache_invalidate("search")
+
+def invalidate_ads_cache():
+    """广告位缓存失效装饰器"""
+    return cache_invalidate(*ADS_NAMESPACES)
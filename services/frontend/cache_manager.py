@@ -1,22 +1,106 @@
 """
 Redis缓存管理模块
 提供统一的缓存接口和策略
+
+命名空间版本（cache:ns:{namespace}）不设过期时间，但 Redis 使用 allkeys-lru 时仍可能被淘汰。
+版本键缺失时先用毫秒时间戳 SET NX 初始化再 INCR，新版本号总是大于被淘汰前的任何版本，
+旧版本下的缓存不会被误当成最新。
 """
 
-import json
+import os
+import time
 import logging
+import threading
+import uuid
 import redis
 from typing import Any, Optional, Union
 from datetime import timedelta
+from local_cache import LocalCache
+from cache_codec import CacheCodec, get_codec
 
 logger = logging.getLogger(__name__)
 
+class CircuitBreaker:
+    """Redis熔断器：根据实际操作的失败判断健康状态，熔断期间由后台线程探测恢复"""
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    
+    def __init__(self, probe, failure_threshold=3, window=10, probe_interval=2):
+        """
+        Args:
+            probe: 探测函数，成功返回即视为恢复
+            failure_threshold: 窗口期内连接失败/超时达到该次数后熔断
+            window: 失败计数窗口（秒）
+            probe_interval: 熔断期间的探测间隔（秒）
+        """
+        self.probe = probe
+        self.failure_threshold = failure_threshold
+        self.window = window
+        self.probe_interval = probe_interval
+        self.state = self.CLOSED
+        self.opened_at = None
+        self.trips = 0
+        self._failures = []
+        self._lock = threading.Lock()
+    
+    def allow(self) -> bool:
+        """是否允许访问Redis（熔断时直接走数据库）"""
+        return self.state == self.CLOSED
+    
+    def record_failure(self):
+        """记录一次连接失败或超时"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.OPEN:
+                return
+            self._failures = [t for t in self._failures if now - t < self.window]
+            self._failures.append(now)
+            if len(self._failures) < self.failure_threshold:
+                return
+            self.state = self.OPEN
+            self.opened_at = time.time()
+            self.trips += 1
+            self._failures = []
+        
+        logger.error(f"Redis连续失败，熔断 {self.probe_interval} 秒后开始探测恢复")
+        threading.Thread(target=self._probe_until_recovered, name='redis-probe', daemon=True).start()
+    
+    def _probe_until_recovered(self):
+        while True:
+            time.sleep(self.probe_interval)
+            try:
+                self.probe()
+            except Exception:
+                continue
+            with self._lock:
+                self.state = self.CLOSED
+                self.opened_at = None
+            logger.info("Redis已恢复，关闭熔断")
+            return
+    
+    def stats(self) -> dict:
+        """熔断器状态"""
+        return {
+            'state': self.state,
+            'opened_at': self.opened_at,
+            'trips': self.trips
+        }
+
 class CacheManager:
     """Redis缓存管理器"""
     
-    def __init__(self, host='localhost', port=6379, db=0, password=None, decode_responses=True):
+    # 视为Redis不健康的错误（计入熔断）
+    CONNECTION_ERRORS = (redis.exceptions.ConnectionError, redis.exceptions.TimeoutError)
+    
+    # 跨进程失效本地缓存的 pub/sub 频道
+    INVALIDATION_CHANNEL = "cache:invalidate"
+    
+    def __init__(self, host='localhost', port=6379, db=0, password=None, decode_responses=True,
+                 max_connections=50, socket_timeout=1.0, local_cache: Optional[LocalCache] = None,
+                 codec: Optional[CacheCodec] = None):
         """
-        初始化Redis连接
+        初始化Redis连接池（不做预检 ping，连接按需建立）
         
         Args:
             host: Redis服务器地址
@@ -24,38 +108,43 @@ class CacheManager:
             db: 数据库编号
             password: 密码
             decode_responses: 是否自动解码响应
+            max_connections: 连接池最大连接数
+            socket_timeout: 连接/读写超时（秒），超时计入熔断
+            local_cache: 进程内 L1 缓存，None 表示只使用 Redis
+            codec: 缓存值编码器，默认 msgpack（未安装时退回 JSON）
         """
-        try:
-            self.redis_client = redis.Redis(
-                host=host,
-                port=port,
-                db=db,
-                password=password,
-                decode_responses=decode_responses,
-                socket_connect_timeout=5,
-                socket_timeout=5,
-                retry_on_timeout=True
-            )
-            # 测试连接
-            self.redis_client.ping()
-            # Redis连接成功（减少日志输出）
-        except Exception as e:
-            logger.error(f"Redis连接失败: {e}")
-            self.redis_client = None
+        pool_kwargs = dict(
+            host=host,
+            port=port,
+            db=db,
+            password=password,
+            max_connections=max_connections,
+            socket_connect_timeout=socket_timeout,
+            socket_timeout=socket_timeout
+        )
+        self.pool = redis.ConnectionPool(decode_responses=decode_responses, **pool_kwargs)
+        self.redis_client = redis.Redis(connection_pool=self.pool)
+        # 缓存值是带版本字节的二进制编码，使用不解码响应的独立连接池
+        self.binary_pool = redis.ConnectionPool(decode_responses=False, **pool_kwargs)
+        self.binary_client = redis.Redis(connection_pool=self.binary_pool)
+        self.codec = codec or get_codec(os.getenv('CACHE_CODEC') or None)
+        self.breaker = CircuitBreaker(self.redis_client.ping)
+        self.local = local_cache
+        self._stats = {'hits': 0, 'misses': 0}
+        self._listener = None
     
     def is_available(self) -> bool:
-        """检查Redis是否可用"""
-        if not self.redis_client:
-            return False
-        try:
-            self.redis_client.ping()
-            return True
-        except:
-            return False
+        """检查Redis是否可用（读取熔断状态，不发起请求）"""
+        return self.breaker.allow()
+    
+    def report_error(self, error: Exception):
+        """报告Redis操作错误，连接失败和超时计入熔断"""
+        if isinstance(error, self.CONNECTION_ERRORS):
+            self.breaker.record_failure()
     
     def get(self, key: str) -> Optional[Any]:
         """
-        获取缓存数据
+        获取缓存数据（先查进程内 L1，再查 Redis）
         
         Args:
             key: 缓存键
@@ -63,42 +152,35 @@ class CacheManager:
         Returns:
             缓存数据，如果不存在或解析失败返回None
         """
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+        
         if not self.is_available():
             return None
             
         try:
-            value = self.redis_client.get(key)
-            if value is None:
+            # 同一次往返取值和剩余TTL，L1 条目不比 Redis 中的键活得更久
+            pipe = self.binary_client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.ttl(key)
+            value, remaining_ttl = pipe.execute()
+            # 格式版本不一致（升级前写入的旧条目）按未命中处理，由调用方重建
+            result = self.codec.decode(value) if value is not None else None
+            if result is None:
+                self._stats['misses'] += 1
                 return None
+            self._stats['hits'] += 1
             
-            # 尝试解析JSON
-            try:
-                parsed_value = json.loads(value)
-                # 恢复datetime对象
-                return self._restore_datetime_objects(parsed_value)
-            except (json.JSONDecodeError, TypeError):
-                # 如果不是JSON，直接返回字符串
-                return value
+            if self.local is not None:
+                self.local.set(key, result, len(value), remaining_ttl if remaining_ttl > 0 else None)
+            return result
         except Exception as e:
+            self.report_error(e)
             logger.error(f"获取缓存失败 {key}: {e}")
             return None
     
-    def _restore_datetime_objects(self, obj: Any) -> Any:
-        """递归恢复对象中的datetime对象"""
-        if isinstance(obj, dict):
-            return {k: self._restore_datetime_objects(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [self._restore_datetime_objects(item) for item in obj]
-        elif isinstance(obj, str):
-            # 尝试解析ISO格式的datetime字符串
-            try:
-                from datetime import datetime
-                return datetime.fromisoformat(obj)
-            except (ValueError, TypeError):
-                return obj
-        else:
-            return obj
-    
     def set(self, key: str, value: Any, ttl: Optional[Union[int, timedelta]] = None) -> bool:
         """
         设置缓存数据
@@ -115,44 +197,24 @@ class CacheManager:
             return False
             
         try:
-            # 序列化数据，处理datetime对象
-            serialized_value = self._serialize_value(value)
+            serialized_value = self.codec.encode(value)
             
             # 设置TTL
             if ttl is None:
-                self.redis_client.set(key, serialized_value)
+                self.binary_client.set(key, serialized_value)
             else:
                 if isinstance(ttl, timedelta):
                     ttl = int(ttl.total_seconds())
-                self.redis_client.setex(key, ttl, serialized_value)
+                self.binary_client.setex(key, ttl, serialized_value)
             
+            if self.local is not None:
+                self.local.set(key, value, len(serialized_value), ttl)
             return True
         except Exception as e:
+            self.report_error(e)
             logger.error(f"设置缓存失败 {key}: {e}")
             return False
     
-    def _serialize_value(self, value: Any) -> str:
-        """序列化值，处理datetime等特殊类型"""
-        if isinstance(value, (dict, list)):
-            # 递归处理字典和列表中的datetime对象
-            processed_value = self._process_datetime_objects(value)
-            return json.dumps(processed_value, ensure_ascii=False)
-        elif hasattr(value, 'isoformat'):  # datetime对象
-            return value.isoformat()
-        else:
-            return str(value)
-    
-    def _process_datetime_objects(self, obj: Any) -> Any:
-        """递归处理对象中的datetime对象"""
-        if isinstance(obj, dict):
-            return {k: self._process_datetime_objects(v) for k, v in obj.items()}
-        elif isinstance(obj, list):
-            return [self._process_datetime_objects(item) for item in obj]
-        elif hasattr(obj, 'isoformat'):  # datetime对象
-            return obj.isoformat()
-        else:
-            return obj
-    
     def delete(self, key: str) -> bool:
         """
         删除缓存
@@ -168,17 +230,20 @@ class CacheManager:
             
         try:
             result = self.redis_client.delete(key)
+            self.publish_invalidation(f"key:{key}")
             return result > 0
         except Exception as e:
+            self.report_error(e)
             logger.error(f"删除缓存失败 {key}: {e}")
             return False
     
-    def delete_pattern(self, pattern: str) -> int:
+    def delete_pattern(self, pattern: str, batch_size: int = 500) -> int:
         """
-        批量删除匹配模式的缓存
+        批量删除匹配模式的缓存（SCAN + UNLINK，不阻塞Redis，仅用于后台清理）
         
         Args:
             pattern: 匹配模式（支持*通配符）
+            batch_size: 每批扫描/删除的键数量
             
         Returns:
             删除的键数量
@@ -187,14 +252,210 @@ class CacheManager:
             return 0
             
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                return self.redis_client.delete(*keys)
-            return 0
+            deleted = 0
+            batch = []
+            for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    deleted += self.redis_client.unlink(*batch)
+                    batch = []
+            if batch:
+                deleted += self.redis_client.unlink(*batch)
+            self.publish_invalidation(f"pattern:{pattern}")
+            return deleted
         except Exception as e:
+            self.report_error(e)
             logger.error(f"批量删除缓存失败 {pattern}: {e}")
             return 0
     
+    @staticmethod
+    def _version_seed() -> int:
+        """版本键缺失时的初始值（毫秒时间戳），保证重建后的版本单调递增"""
+        return int(time.time() * 1000)
+    
+    def get_namespace_version(self, namespace: str) -> int:
+        """
+        获取缓存命名空间的当前版本
+        
+        Args:
+            namespace: 命名空间（缓存键的第一段，如 articles）
+            
+        Returns:
+            版本号，Redis不可用时返回0
+        """
+        version_key = CacheKeys.NAMESPACE_VERSION.format(namespace=namespace)
+        if self.local is not None:
+            version = self.local.get(version_key)
+            if version is not None:
+                return version
+        
+        if not self.is_available():
+            return 0
+            
+        try:
+            version = self.redis_client.get(version_key)
+            if version is None:
+                # 版本键缺失（首次使用或被淘汰）时用时间戳初始化
+                pipe = self.redis_client.pipeline(transaction=False)
+                pipe.set(version_key, self._version_seed(), nx=True)
+                pipe.get(version_key)
+                version = pipe.execute()[1]
+            version = int(version) if version else 0
+            if self.local is not None:
+                self.local.set(version_key, version, len(version_key))
+            return version
+        except Exception as e:
+            self.report_error(e)
+            logger.error(f"获取缓存版本失败 {namespace}: {e}")
+            return 0
+    
+    def bump_namespaces(self, *namespaces: str) -> bool:
+        """
+        递增命名空间版本，使该命名空间下的旧缓存全部失效（旧键随TTL自然过期）
+        
+        Args:
+            namespaces: 要失效的命名空间
+            
+        Returns:
+            是否成功
+        """
+        if not self.is_available():
+            return False
+            
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            seed = self._version_seed()
+            for namespace in namespaces:
+                version_key = CacheKeys.NAMESPACE_VERSION.format(namespace=namespace)
+                pipe.set(version_key, seed, nx=True)
+                pipe.incr(version_key)
+                pipe.publish(self.INVALIDATION_CHANNEL, f"ns:{namespace}")
+            pipe.execute()
+            for namespace in namespaces:
+                self._apply_invalidation(f"ns:{namespace}")
+            return True
+        except Exception as e:
+            self.report_error(e)
+            logger.error(f"递增缓存版本失败 {namespaces}: {e}")
+            return False
+    
+    # 仅当锁仍属于自己时删除（比较并删除）
+    _RELEASE_LOCK_SCRIPT = """
+    if redis.call('get', KEYS[1]) == ARGV[1] then
+        return redis.call('del', KEYS[1])
+    end
+    return 0
+    """
+    
+    def acquire_lock(self, key: str, timeout: float = 10) -> Optional[str]:
+        """
+        获取短期互斥锁（SET NX PX），用于缓存重建的单飞控制
+        
+        Args:
+            key: 被保护的缓存键
+            timeout: 锁自动过期时间（秒），防止持有者崩溃后死锁
+            
+        Returns:
+            锁令牌，未获取到或Redis不可用时返回None
+        """
+        if not self.is_available():
+            return None
+            
+        token = uuid.uuid4().hex
+        try:
+            if self.redis_client.set(CacheKeys.LOCK.format(key=key), token, nx=True, px=int(timeout * 1000)):
+                return token
+            return None
+        except Exception as e:
+            self.report_error(e)
+            logger.error(f"获取缓存锁失败 {key}: {e}")
+            return None
+    
+    def release_lock(self, key: str, token: str):
+        """释放 acquire_lock 获取的锁"""
+        if not self.is_available():
+            return
+        try:
+            self.redis_client.eval(self._RELEASE_LOCK_SCRIPT, 1, CacheKeys.LOCK.format(key=key), token)
+        except Exception as e:
+            self.report_error(e)
+            logger.error(f"释放缓存锁失败 {key}: {e}")
+    
+    def publish_invalidation(self, message: str):
+        """
+        通知所有进程失效本地缓存
+        
+        Args:
+            message: key:<键>、ns:<命名空间>、pattern:<模式> 或 all
+        """
+        self._apply_invalidation(message)
+        if not self.is_available():
+            return
+        try:
+            self.redis_client.publish(self.INVALIDATION_CHANNEL, message)
+        except Exception as e:
+            self.report_error(e)
+            logger.error(f"发布缓存失效消息失败 {message}: {e}")
+    
+    def _apply_invalidation(self, message: str):
+        """在本进程的 L1 缓存中执行失效"""
+        if self.local is None:
+            return
+        kind, _, target = message.partition(':')
+        if kind == 'key':
+            self.local.delete(target)
+        elif kind == 'ns':
+            self.local.delete(CacheKeys.NAMESPACE_VERSION.format(namespace=target))
+            self.local.delete_prefix(f"{target}:")
+        elif kind == 'pattern':
+            self.local.delete_pattern(target)
+        else:
+            self.local.clear()
+    
+    def start_invalidation_listener(self):
+        """启动后台线程订阅失效消息"""
+        if self.local is None or self._listener is not None:
+            return
+        self._listener = threading.Thread(target=self._listen_invalidations, name='cache-invalidation', daemon=True)
+        self._listener.start()
+    
+    def _listen_invalidations(self):
+        while True:
+            if not self.is_available():
+                time.sleep(self.breaker.probe_interval)
+                continue
+            
+            pubsub = self.redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(self.INVALIDATION_CHANNEL)
+                # 断线期间可能错过失效消息
+                self.local.clear()
+                while self.is_available():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message.get('type') == 'message':
+                        self._apply_invalidation(message['data'])
+            except Exception as e:
+                logger.warning(f"缓存失效订阅中断，稍后重连: {e}")
+                time.sleep(1)
+            finally:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+    
+    def tier_stats(self) -> dict:
+        """各缓存层的命中统计"""
+        hits, misses = self._stats['hits'], self._stats['misses']
+        total = hits + misses
+        return {
+            'l1': self.local.stats() if self.local is not None else None,
+            'l2': {
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': (hits / total * 100) if total > 0 else 0
+            }
+        }
+    
     def exists(self, key: str) -> bool:
         """
         检查键是否存在
@@ -211,6 +472,7 @@ class CacheManager:
         try:
             return bool(self.redis_client.exists(key))
         except Exception as e:
+            self.report_error(e)
             logger.error(f"检查缓存存在性失败 {key}: {e}")
             return False
     
@@ -230,6 +492,7 @@ class CacheManager:
         try:
             return self.redis_client.ttl(key)
         except Exception as e:
+            self.report_error(e)
             logger.error(f"获取TTL失败 {key}: {e}")
             return -2
     
@@ -250,6 +513,7 @@ class CacheManager:
         try:
             return self.redis_client.incrby(key, amount)
         except Exception as e:
+            self.report_error(e)
             logger.error(f"递增计数器失败 {key}: {e}")
             return None
     
@@ -272,6 +536,7 @@ class CacheManager:
                 ttl = int(ttl.total_seconds())
             return bool(self.redis_client.expire(key, ttl))
         except Exception as e:
+            self.report_error(e)
             logger.error(f"设置过期时间失败 {key}: {e}")
             return False
 
@@ -281,13 +546,15 @@ class CacheKeys:
     
     # 文章相关
     ARTICLE = "article:{id}"  # 单篇文章
-    ARTICLES_LIST = "articles:list:{limit}:{offset}"  # 文章列表
+    RELATED_ARTICLES = "article:related:{article_id}:{limit}"  # 相关文章
+    ARTICLES_LIST = "articles:list:{category}:{limit}:{offset}"  # 文章列表
     ARTICLES_CATEGORY = "articles:category:{category}:{limit}:{offset}"  # 分类文章
     RECENT_ARTICLES = "articles:recent:{limit}"  # 最新文章
     POPULAR_ARTICLES = "articles:popular:{limit}"  # 热门文章
+    TAG_ARTICLES = "articles:tag:{tag}:{limit}:{cursor}"  # 标签文章（游标分页）
     
     # 搜索相关
-    SEARCH_RESULTS = "search:{query}:{page}:{per_page}"  # 搜索结果
+    SEARCH_RESULTS = "search:{query}:{limit}:{offset}"  # 搜索结果（查询词过长时取哈希）
     POPULAR_SEARCHES = "search:popular"  # 热门搜索
     
     # 分类相关
@@ -301,6 +568,18 @@ class CacheKeys:
     
     # 首页相关
     HOMEPAGE_DATA = "homepage:data"  # 首页完整数据
+    
+    # 整页缓存（匿名访客的渲染结果，digest 为 host+路径+查询参数的哈希）
+    PAGE = "page:{digest}:v{version}"
+    
+    # 命名空间版本（内容变化时递增，缓存键带上版本号）
+    NAMESPACE_VERSION = "cache:ns:{namespace}"
+    
+    # 缓存重建锁
+    LOCK = "cache:lock:{key}"
+    
+    # 可缓存的命名空间（后台清空缓存时只清理这些前缀）
+    NAMESPACES = ("article", "articles", "search", "categories", "ads", "stats", "homepage", "page")
 
 # 缓存TTL常量（秒）
 class CacheTTL:
@@ -318,23 +597,32 @@ class CacheTTL:
     # 超长期缓存（1天）
     VERY_LONG = 86400  # 1天
 
-# 全局缓存管理器实例
+# 全局缓存管理器实例（进程内共享一个连接池）
+_cache_manager: Optional[CacheManager] = None
+_cache_manager_lock = threading.Lock()
+
 def get_cache_manager() -> CacheManager:
     """获取缓存管理器实例"""
-    import os
-    
-    # 从环境变量读取Redis配置
-    redis_host = os.getenv('REDIS_HOST', 'localhost')
-    redis_port = int(os.getenv('REDIS_PORT', '6379'))
-    redis_db = int(os.getenv('REDIS_DB', '0'))
-    redis_password = os.getenv('REDIS_PASSWORD', None)
-    
-    return CacheManager(
-        host=redis_host,
-        port=redis_port,
-        db=redis_db,
-        password=redis_password
-    )
+    global _cache_manager
+    if _cache_manager is None:
+        with _cache_manager_lock:
+            if _cache_manager is None:
+                # 从环境变量读取Redis配置
+                _cache_manager = CacheManager(
+                    host=os.getenv('REDIS_HOST', 'localhost'),
+                    port=int(os.getenv('REDIS_PORT', '6379')),
+                    db=int(os.getenv('REDIS_DB', '0')),
+                    password=os.getenv('REDIS_PASSWORD', None),
+                    max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', '50')),
+                    socket_timeout=float(os.getenv('REDIS_SOCKET_TIMEOUT', '1.0')),
+                    local_cache=LocalCache(
+                        max_entries=int(os.getenv('LOCAL_CACHE_MAX_ENTRIES', '1000')),
+                        max_bytes=int(os.getenv('LOCAL_CACHE_MAX_BYTES', str(16 * 1024 * 1024))),
+                        ttl=float(os.getenv('LOCAL_CACHE_TTL', '10'))
+                    ) if os.getenv('LOCAL_CACHE_ENABLED', 'true').lower() == 'true' else None
+                )
+                _cache_manager.start_invalidation_listener()
+    return _cache_manager
 
 # 创建全局实例
 cache_manager = get_cache_manager()
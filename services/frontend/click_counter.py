@@ -0,0 +1,185 @@
+"""
+文章点击计数模块
+点击先累加到 Redis，由后台线程定期批量合并到 messages 表
+
+待合并的计数键不设过期时间，但 Redis 使用 allkeys-lru 时仍可能在内存不足时被淘汰。
+这些键最多只保存一个合并周期（默认 30 秒）内的点击，被淘汰时丢失的只是这段时间的部分点击数，
+对热门排序这类近似统计可以接受，因此不为它们单独调整淘汰策略。
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class ClickCounter:
+    """Redis 写回式点击计数器"""
+
+    # 待合并点击数：clicks:pending:{id}；最后点击时间：clicks:last:{id}；有待合并点击的文章：clicks:dirty
+    PENDING_KEY = "clicks:pending:{id}"
+    LAST_KEY = "clicks:last:{id}"
+    DIRTY_KEY = "clicks:dirty"
+
+    def __init__(self, cache_getter: Callable, connection_factory: Callable,
+                 flush_interval: int = 30, batch_size: int = 500):
+        """
+        初始化点击计数器（调用 start() 启动后台合并线程）
+
+        Args:
+            cache_getter: 返回 CacheManager 的函数
+            connection_factory: 返回数据库连接上下文管理器的函数
+            flush_interval: 合并到数据库的间隔（秒）
+            batch_size: 每批合并的文章数
+        """
+        self.cache_getter = cache_getter
+        self.connection_factory = connection_factory
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _redis(self):
+        cache = self.cache_getter()
+        return cache.redis_client if cache.is_available() else None
+
+    def record(self, article_id: int) -> bool:
+        """记录一次点击，Redis 不可用时返回 False"""
+        client = self._redis()
+        if client is None:
+            return False
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.incr(self.PENDING_KEY.format(id=article_id))
+            pipe.set(self.LAST_KEY.format(id=article_id), int(time.time()), ex=86400)
+            pipe.sadd(self.DIRTY_KEY, article_id)
+            pipe.execute()
+            return True
+        except Exception as e:
+            self.cache_getter().report_error(e)
+            logger.error(f"记录点击计数失败 {article_id}: {e}")
+            return False
+
+    def pending_counts(self, max_articles: int = 200) -> Dict[int, int]:
+        """
+        尚未合并到数据库的点击数
+
+        Args:
+            max_articles: 最多读取的文章数，超过时随机抽取（SRANDMEMBER），避免每次读取整个集合
+        """
+        client = self._redis()
+        if client is None:
+            return {}
+        try:
+            ids = [int(article_id) for article_id in client.srandmember(self.DIRTY_KEY, max_articles)]
+            if not ids:
+                return {}
+            counts = client.mget([self.PENDING_KEY.format(id=article_id) for article_id in ids])
+            return {article_id: int(count) for article_id, count in zip(ids, counts) if count}
+        except Exception as e:
+            self.cache_getter().report_error(e)
+            logger.error(f"读取待合并点击数失败: {e}")
+            return {}
+
+    def flush(self) -> int:
+        """将 Redis 中的点击数合并到 messages 表，返回合并的文章数"""
+        client = self._redis()
+        if client is None:
+            return 0
+
+        flushed = 0
+        while True:
+            try:
+                ids: List[str] = client.spop(self.DIRTY_KEY, self.batch_size) or []
+                if not ids:
+                    break
+
+                # 先从集合中取出再 GETDEL：期间的新点击会重新加入集合，下一轮合并
+                pipe = client.pipeline(transaction=False)
+                for article_id in ids:
+                    pipe.getdel(self.PENDING_KEY.format(id=article_id))
+                    pipe.get(self.LAST_KEY.format(id=article_id))
+                results = pipe.execute()
+            except Exception as e:
+                self.cache_getter().report_error(e)
+                logger.error(f"读取点击计数失败: {e}")
+                break
+
+            rows = []
+            for index, article_id in enumerate(ids):
+                count, last_clicked = results[index * 2], results[index * 2 + 1]
+                if count and int(count) > 0:
+                    last_clicked_at = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(int(last_clicked or time.time())))
+                    rows.append((int(count), last_clicked_at, last_clicked_at, int(article_id)))
+            if not rows:
+                continue
+
+            # 按 id 排序，多进程并发合并时加锁顺序一致
+            rows.sort(key=lambda row: row[3])
+            try:
+                with self.connection_factory() as conn:
+                    cursor = conn.cursor()
+                    cursor.execute(*self._merge_statement(rows))
+                    conn.commit()
+                flushed += len(rows)
+            except Exception as e:
+                logger.error(f"合并点击计数到数据库失败，放回 Redis 等待重试: {e}")
+                self._restore(client, rows)
+                break
+
+        return flushed
+
+    @staticmethod
+    def _merge_statement(rows):
+        """
+        把一批点击数合并成一条 UPDATE ... JOIN 语句（executemany 对 UPDATE 仍是逐行往返）
+
+        Args:
+            rows: [(点击数, 最后点击时间, 最后点击时间, 文章ID), ...]
+        """
+        clicks = " UNION ALL ".join(
+            ["SELECT %s AS id, %s AS clicks, CAST(%s AS DATETIME) AS last_clicked_at"]
+            + ["SELECT %s, %s, CAST(%s AS DATETIME)"] * (len(rows) - 1)
+        )
+        sql = f"""
+            UPDATE messages m
+            JOIN ({clicks}) c ON c.id = m.id
+            SET m.click_count = m.click_count + c.clicks,
+                m.last_clicked_at = GREATEST(COALESCE(m.last_clicked_at, c.last_clicked_at), c.last_clicked_at)
+        """
+        params = tuple(value for count, last_clicked_at, _, article_id in rows
+                       for value in (article_id, count, last_clicked_at))
+        return sql, params
+
+    def _restore(self, client, rows):
+        """数据库写入失败时把点击数加回 Redis"""
+        try:
+            pipe = client.pipeline(transaction=False)
+            for count, _, _, article_id in rows:
+                pipe.incrby(self.PENDING_KEY.format(id=article_id), count)
+                pipe.sadd(self.DIRTY_KEY, article_id)
+            pipe.execute()
+        except Exception as e:
+            self.cache_getter().report_error(e)
+            logger.error(f"放回点击计数失败，丢失 {len(rows)} 篇文章的点击数: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def start(self):
+        """启动后台合并线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='click-counter', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10):
+        """停止后台线程并做最后一次合并"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
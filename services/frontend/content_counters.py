@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+内容计数器
+
+content_counters 保存未删除文章的物化计数：总数（total）、按分类（sort，键为 sort_id）、
+按发布日期（day，键为 YYYY-MM-DD）。入库、删除、软删除和修改分类时随文章改动增量更新，
+统计页面按主键读取；前台定期核对一次，修正并发或手工改库造成的偏差。
+这里只生成 SQL 语句，由各服务用自己的数据库驱动执行；
+采集、后台和前台三个服务各放一份相同的文件，修改时请同步
+（services/check_shared_modules.py 检查各份是否一致，deploy.sh 构建镜像前自动执行）。
+"""
+
+SCOPE_TOTAL = 'total'
+SCOPE_SORT = 'sort'
+SCOPE_DAY = 'day'
+
+# 按文章当前的分类和发布日期增减计数；文章已软删除时不计（软删除时先减再标记删除）
+_DELTA_SQL = """
+    INSERT INTO content_counters (scope, scope_key, article_count)
+    SELECT s.scope,
+           CASE s.scope
+               WHEN 'sort' THEN CAST(m.sort_id AS CHAR)
+               WHEN 'day' THEN CAST(DATE(m.created_at) AS CHAR)
+               ELSE ''
+           END,
+           %s
+    FROM messages m
+    JOIN (SELECT 'total' AS scope UNION ALL SELECT 'sort' UNION ALL SELECT 'day') s
+      ON s.scope <> 'sort' OR m.sort_id IS NOT NULL
+    WHERE m.id = %s AND m.is_deleted = 0
+    ON DUPLICATE KEY UPDATE article_count = article_count + VALUES(article_count)
+"""
+
+# 核对：按 messages 重新统计并覆盖计数，本轮没有统计到的键归零
+RECONCILE_UPSERT_SQL = """
+    INSERT INTO content_counters (scope, scope_key, article_count)
+    SELECT * FROM (
+        SELECT 'total' AS scope, '' AS scope_key, COUNT(*) AS total FROM messages WHERE is_deleted = 0
+        UNION ALL
+        SELECT 'sort', CAST(sort_id AS CHAR), COUNT(*) FROM messages
+        WHERE is_deleted = 0 AND sort_id IS NOT NULL GROUP BY sort_id
+        UNION ALL
+        SELECT 'day', CAST(DATE(created_at) AS CHAR), COUNT(*) FROM messages
+        WHERE is_deleted = 0 AND created_at IS NOT NULL GROUP BY DATE(created_at)
+    ) AS counts
+    ON DUPLICATE KEY UPDATE article_count = counts.total, updated_at = NOW()
+"""
+RECONCILE_ZERO_SQL = """
+    UPDATE content_counters SET article_count = 0
+    WHERE updated_at < %s AND article_count <> 0
+"""
+
+
+def counter_delta_statement(message_id, delta):
+    """
+    生成按文章增减计数的语句
+
+    入库后 delta=+1；删除或软删除前 delta=-1；修改分类时改之前 -1、改之后 +1
+    """
+    return _DELTA_SQL, (delta, message_id)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+列表卡片摘要
+
+采集入库和编辑文章时生成 preview_html（卡片摘要）和 image_url（首图），
+列表页只读取这两列，不再加载整篇 content 和逐条跑正则。
+采集、后台和前台三个服务各放一份相同的文件，修改时请同步
+（services/check_shared_modules.py 检查各份是否一致，deploy.sh 构建镜像前自动执行）。
+"""
+
+import re
+
+# 摘要最大长度（按渲染后的 HTML 计）
+PREVIEW_MAX_LENGTH = 200
+
+_IMAGE_PATTERN = re.compile(r'!\[.*?\]\((.*?)\)')
+
+
+def extract_image_url(markdown_image):
+    """从Markdown格式的图片中提取纯URL"""
+    if not markdown_image:
+        return None
+
+    match = _IMAGE_PATTERN.search(markdown_image)
+    if match:
+        return match.group(1)
+
+    # 如果不是Markdown格式，直接返回原值
+    return markdown_image
+
+
+def render_content_preview(content, max_length=PREVIEW_MAX_LENGTH):
+    """渲染内容预览，正确处理图片显示"""
+    if not content:
+        return ""
+
+    def replace_image(match):
+        url = match.group(1)
+        return f'<img src="{url}" class="img-fluid rounded" style="max-width: 100%; height: auto; max-height: 120px; object-fit: contain; margin: 5px 0; display: block;">'
+
+    # 先处理图片，再截断内容
+    processed = _IMAGE_PATTERN.sub(replace_image, content)
+
+    # 如果内容太长，截断并添加省略号
+    if len(processed) > max_length:
+        truncated = processed[:max_length]
+        # 确保不截断HTML标签
+        last_tag = truncated.rfind('>')
+        if last_tag > max_length - 50:  # 如果最后一个标签位置合理
+            truncated = truncated[:last_tag + 1]
+        truncated += "..."
+        return truncated
+
+    return processed
+
+
+def build_preview(content, image_url=None):
+    """
+    生成列表卡片需要的预计算字段
+
+    Args:
+        content: 文章内容（Markdown）
+        image_url: 已知的首图（Markdown 图片或纯URL），为空时从内容中提取
+
+    Returns:
+        (preview_html, image_url)，image_url 统一为纯URL
+    """
+    if not image_url and content:
+        match = _IMAGE_PATTERN.search(content)
+        image_url = match.group(1) if match else None
+    return render_content_preview(content), extract_image_url(image_url)
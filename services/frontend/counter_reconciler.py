@@ -0,0 +1,86 @@
+"""
+内容计数核对模块
+后台线程定期按 messages 重新统计 content_counters，修正增量维护中的偏差
+
+用法（手动核对，在 frontend 容器内）:
+    python counter_reconciler.py
+"""
+
+import atexit
+import logging
+import threading
+import time
+from typing import Callable
+
+from content_counters import RECONCILE_UPSERT_SQL, RECONCILE_ZERO_SQL
+
+logger = logging.getLogger(__name__)
+
+
+class CounterReconciler:
+    """content_counters 定期核对"""
+
+    def __init__(self, connection_factory: Callable, interval: int = 3600):
+        """
+        初始化核对任务（调用 start() 启动后台线程）
+
+        Args:
+            connection_factory: 返回数据库连接上下文管理器的函数
+            interval: 核对间隔（秒）
+        """
+        self.connection_factory = connection_factory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def reconcile(self) -> bool:
+        """重新统计所有计数，返回是否成功"""
+        started = time.perf_counter()
+        try:
+            with self.connection_factory() as conn:
+                cursor = conn.cursor()
+                # 读已提交：统计时不给 messages 加共享锁，不阻塞采集写入
+                cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL READ COMMITTED")
+                try:
+                    cursor.execute("SELECT NOW()")
+                    reconcile_started_at = cursor.fetchone()[0]
+                    cursor.execute(RECONCILE_UPSERT_SQL)
+                    cursor.execute(RECONCILE_ZERO_SQL, (reconcile_started_at,))
+                    zeroed = cursor.rowcount
+                    conn.commit()
+                finally:
+                    cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        except Exception as e:
+            logger.error(f"核对内容计数失败: {e}")
+            return False
+
+        if zeroed:
+            logger.info(f"📊 内容计数核对完成，{zeroed} 个计数归零，耗时 {time.perf_counter() - started:.2f} 秒")
+        return True
+
+    def _run(self):
+        # 启动时先核对一次，计数表为空时即完成初始化
+        self.reconcile()
+        while not self._stop.wait(self.interval):
+            self.reconcile()
+
+    def start(self):
+        """启动后台核对线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='counter-reconciler', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10):
+        """停止后台线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+if __name__ == '__main__':
+    from db_pool import connection_factory_from_env
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    reconciler = CounterReconciler(connection_factory_from_env())
+    print("✅ 核对完成" if reconciler.reconcile() else "❌ 核对失败")
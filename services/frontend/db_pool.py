@@ -0,0 +1,260 @@
+"""
+MySQL连接池模块
+为前端提供线程安全的 pymysql 连接复用
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """等待可用连接超时"""
+
+
+class _PooledConnection:
+    """连接及其创建/归还时间"""
+
+    __slots__ = ('conn', 'created_at', 'returned_at')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.returned_at = self.created_at
+
+
+class ConnectionPool:
+    """线程安全的 MySQL 连接池"""
+
+    def __init__(self, db_config: Dict[str, Any], min_size: int = 2, max_size: int = 10,
+                 recycle: int = 3600, timeout: float = 10, health_check_interval: float = 30):
+        """
+        初始化连接池（不立即建立连接，调用 warm() 预热）
+
+        Args:
+            db_config: pymysql.connect 参数
+            min_size: 预热时建立的连接数
+            max_size: 最大连接数（空闲 + 借出）
+            recycle: 连接存活超过该秒数后重建
+            timeout: 连接耗尽时等待的最长秒数
+            health_check_interval: 空闲超过该秒数的连接在借出前先 ping 检查
+        """
+        self.db_config = db_config
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.recycle = recycle
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._idle: List[_PooledConnection] = []
+        self._in_use: Dict[int, _PooledConnection] = {}
+        self._size = 0
+        self._cond = threading.Condition()
+
+        self._stats = {
+            'created': 0,
+            'closed': 0,
+            'recycled': 0,
+            'health_check_failed': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+            'timeouts': 0
+        }
+
+    def _connect(self) -> _PooledConnection:
+        conn = pymysql.connect(**self.db_config)
+        with self._cond:
+            self._stats['created'] += 1
+        return _PooledConnection(conn)
+
+    def _close(self, pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._stats['closed'] += 1
+            self._cond.notify()
+
+    def _is_usable(self, pooled: _PooledConnection) -> bool:
+        """检查连接是否可以借出（超期的重建，空闲较久的先 ping）"""
+        now = time.monotonic()
+        if self.recycle and now - pooled.created_at > self.recycle:
+            with self._cond:
+                self._stats['recycled'] += 1
+            return False
+        if now - pooled.returned_at > self.health_check_interval:
+            try:
+                pooled.conn.ping(reconnect=False)
+            except Exception:
+                with self._cond:
+                    self._stats['health_check_failed'] += 1
+                return False
+        return True
+
+    def warm(self):
+        """预热连接池，建立 min_size 个连接"""
+        created = []
+        with self._cond:
+            needed = max(0, min(self.min_size, self.max_size) - self._size)
+            self._size += needed
+        try:
+            for _ in range(needed):
+                created.append(self._connect())
+        finally:
+            with self._cond:
+                self._size -= needed - len(created)
+                self._idle.extend(created)
+                self._cond.notify_all()
+        logger.info(f"MySQL连接池预热完成: {len(created)} 个连接")
+
+    def acquire(self):
+        """借出一个连接（连接耗尽时最多等待 timeout 秒）"""
+        started = time.monotonic()
+        waited = False
+
+        while True:
+            pooled = None
+            create = False
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    waited = True
+                    remaining = self.timeout - (time.monotonic() - started)
+                    if remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeoutError(f"等待MySQL连接超时（{self.timeout}秒）")
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    # 后进先出，优先复用刚归还的热连接
+                    pooled = self._idle.pop()
+                else:
+                    self._size += 1
+                    create = True
+
+            if create:
+                try:
+                    pooled = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._is_usable(pooled):
+                self._close(pooled)
+                continue
+
+            with self._cond:
+                self._in_use[id(pooled.conn)] = pooled
+                self._stats['checkouts'] += 1
+                if waited:
+                    wait_time = time.monotonic() - started
+                    self._stats['waits'] += 1
+                    self._stats['wait_time_total'] += wait_time
+                    self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+            return pooled.conn
+
+    def release(self, conn, discard: bool = False):
+        """
+        归还连接
+
+        Args:
+            conn: acquire() 借出的连接
+            discard: 为 True 时直接关闭（例如连接已出错）
+        """
+        with self._cond:
+            pooled = self._in_use.pop(id(conn), None)
+        if pooled is None:
+            return
+
+        if not discard:
+            try:
+                # 结束未提交的事务，下次借出时读取到最新数据
+                conn.rollback()
+            except Exception:
+                discard = True
+
+        if discard or not conn.open:
+            self._close(pooled)
+            return
+
+        pooled.returned_at = time.monotonic()
+        with self._cond:
+            self._idle.append(pooled)
+            self._cond.notify()
+
+    def close(self):
+        """关闭所有空闲连接"""
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for pooled in idle:
+            self._close(pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        """连接池统计信息"""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'checked_out': len(self._in_use),
+                'min_size': self.min_size,
+                'max_size': self.max_size
+            })
+        stats['wait_time_avg'] = stats['wait_time_total'] / stats['waits'] if stats['waits'] else 0.0
+        return stats
+
+
+# 全局连接池实例
+_db_pool: Optional[ConnectionPool] = None
+_db_pool_lock = threading.Lock()
+
+
+def init_db_pool(db_config: Dict[str, Any], **kwargs) -> ConnectionPool:
+    """创建全局连接池"""
+    global _db_pool
+    with _db_pool_lock:
+        if _db_pool is None:
+            _db_pool = ConnectionPool(db_config, **kwargs)
+    return _db_pool
+
+
+def get_db_pool() -> Optional[ConnectionPool]:
+    """获取全局连接池"""
+    return _db_pool
+
+
+def dict_cursor():
+    """返回字典游标类型（命令行脚本使用）"""
+    return pymysql.cursors.DictCursor
+
+
+def connection_factory_from_env():
+    """命令行脚本使用：按前端的环境变量建立数据库连接（不经过连接池）"""
+
+    @contextmanager
+    def connect():
+        conn = pymysql.connect(
+            host=os.environ.get('MYSQL_HOST', 'mysql'),
+            port=int(os.environ.get('MYSQL_PORT', 3306)),
+            user=os.environ.get('MYSQL_USER', 'tg2em'),
+            password=os.environ.get('MYSQL_PASSWORD', 'tg2em2025'),
+            database=os.environ.get('MYSQL_DATABASE', 'tg2em'),
+            charset='utf8mb4'
+        )
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    return connect
@@ -0,0 +1,113 @@
+"""
+进程内缓存模块
+在 Redis 之前提供一层按条目数和字节数限制的 LRU 缓存（L1）
+"""
+
+import fnmatch
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class LocalCache:
+    """线程安全的进程内 LRU 缓存
+
+    缓存的是反序列化后的对象，调用方应把取到的结果当作只读。
+    """
+
+    def __init__(self, max_entries: int = 1000, max_bytes: int = 16 * 1024 * 1024, ttl: float = 10):
+        """
+        Args:
+            max_entries: 最大条目数
+            max_bytes: 最大字节数（按 Redis 中序列化后的长度估算）
+            ttl: 条目最长存活秒数
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (过期时间, 值, 字节数)
+        self._data: 'OrderedDict[str, Tuple[float, Any, int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expired': 0, 'invalidations': 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        """获取缓存，不存在或已过期返回 None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry[0] < time.monotonic():
+                self._remove(key)
+                self._stats['expired'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key: str, value: Any, size: int, ttl: Optional[float] = None):
+        """写入缓存，超出条目数或字节数时淘汰最久未使用的条目"""
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + min(ttl, self.ttl) if ttl else time.monotonic() + self.ttl
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (expires_at, value, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+    def _remove(self, key: str):
+        """删除条目（调用方持有锁）"""
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def delete(self, key: str):
+        """删除指定键"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+
+    def delete_prefix(self, prefix: str):
+        """删除指定前缀的所有键"""
+        with self._lock:
+            for key in [key for key in self._data if key.startswith(prefix)]:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+
+    def delete_pattern(self, pattern: str):
+        """删除匹配通配符模式的所有键"""
+        with self._lock:
+            for key in [key for key in self._data if fnmatch.fnmatchcase(key, pattern)]:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._stats['invalidations'] += len(self._data)
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl
+            })
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] / total * 100) if total > 0 else 0
+        return stats
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+日志配置 - 非阻塞队列日志
+
+业务线程和事件循环只把日志记录放进内存队列（队列满时丢弃，不等待），
+由后台 QueueListener 线程统一写入控制台和滚动文件。
+支持按模块/函数采样或限速，以及可选的 JSON 行格式。
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Any, Dict, Optional
+
+DEFAULT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional['NonBlockingQueueHandler'] = None
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """队列满时丢弃日志而不是阻塞调用方"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RateLimitFilter(logging.Filter):
+    """按模块/函数对 WARNING 以下的日志采样或限速
+
+    rules 的键按优先级匹配：``模块.函数``（如 ``scrape.upload_image``）、
+    模块名（如 ``scrape``）、logger 名称前缀（如 ``frontend``）。
+    规则值：``{'sample': 0.1}`` 只保留 10%；``{'rate': 5}`` 每个调用位置每秒最多 5 条。
+    """
+
+    # 每处理这么多条限速日志清理一次已回满（空闲）的令牌桶
+    SWEEP_EVERY = 1000
+
+    def __init__(self, rules: Dict[str, Dict[str, float]]):
+        super().__init__()
+        self.rules = rules or {}
+        # 调用位置 -> [剩余令牌, 上次更新时间, 每秒速率]
+        self._buckets: Dict[tuple, list] = {}
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def _match(self, record: logging.LogRecord) -> Optional[Dict[str, float]]:
+        rule = self.rules.get(f"{record.module}.{record.funcName}") or self.rules.get(record.module)
+        if rule:
+            return rule
+        name = record.name
+        while name:
+            if name in self.rules:
+                return self.rules[name]
+            name = name.rpartition('.')[0]
+        return None
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rule = self._match(record)
+        if not rule:
+            return True
+
+        sample = rule.get('sample')
+        if sample is not None and random.random() >= sample:
+            return False
+
+        rate = rule.get('rate')
+        if rate is None:
+            return True
+
+        # 令牌桶：按调用位置（文件, 行号）分别限速，f-string 拼出的不同消息共用一个桶
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            self._calls += 1
+            if self._calls >= self.SWEEP_EVERY:
+                self._calls = 0
+                self._sweep(now)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [float(rate), now, float(rate)]
+            tokens = min(float(rate), bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens < 1:
+                bucket[0] = tokens
+                return False
+            bucket[0] = tokens - 1
+            return True
+
+    def _sweep(self, now: float):
+        """删除令牌已回满的桶（调用方持有锁），重新出现时按满桶新建，效果相同"""
+        idle = [
+            key for key, (tokens, updated, rate) in self._buckets.items()
+            if tokens + (now - updated) * rate >= rate
+        ]
+        for key in idle:
+            del self._buckets[key]
+
+
+class JsonFormatter(logging.Formatter):
+    """单行 JSON 日志格式"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'func': record.funcName,
+            'message': record.getMessage(),
+            'process': record.process,
+            'thread': record.threadName
+        }
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload['exception'] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False)
+
+
+def _env_bool(name: str) -> Optional[bool]:
+    value = os.getenv(name)
+    if value is None:
+        return None
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def setup_logging(level: str = 'INFO', fmt: str = DEFAULT_FORMAT, datefmt: Optional[str] = None,
+                  filename: Optional[str] = None,
+                  max_bytes: int = 10 * 1024 * 1024, backup_count: int = 5,
+                  json_format: bool = False, rate_limits: Optional[Dict[str, Dict[str, float]]] = None,
+                  queue_size: int = 10000) -> NonBlockingQueueHandler:
+    """配置根 logger 使用非阻塞队列输出
+
+    环境变量 LOG_LEVEL / LOG_JSON 优先于参数。重复调用会替换之前的配置。
+    """
+    global _listener, _queue_handler
+
+    level = os.getenv('LOG_LEVEL', level).upper()
+    env_json = _env_bool('LOG_JSON')
+    if env_json is not None:
+        json_format = env_json
+
+    formatter = JsonFormatter() if json_format else logging.Formatter(fmt, datefmt)
+    handlers = [logging.StreamHandler(sys.stdout)]
+    if filename:
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        handlers.append(RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    shutdown_logging()
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    if rate_limits:
+        _queue_handler.addFilter(RateLimitFilter(rate_limits))
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(getattr(logging, level, logging.INFO))
+
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    return _queue_handler
+
+
+def shutdown_logging():
+    """停止后台写日志线程并写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def dropped_records() -> int:
+    """队列满时被丢弃的日志条数"""
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,133 @@
+"""
+整页缓存模块
+为匿名访客缓存渲染后的公开页面（gzip 压缩后存入 Redis），支持强 ETag 和 304
+"""
+
+import functools
+import gzip
+import hashlib
+import logging
+from typing import Callable, Optional
+
+from flask import g, make_response, request, session
+
+from cache_manager import CacheKeys, get_cache_manager
+
+logger = logging.getLogger(__name__)
+
+
+class PageCache:
+    """匿名访客的整页缓存"""
+
+    NAMESPACE = "page"
+
+    def __init__(self, ttl: int = 60, enabled: bool = True, compress_level: int = 6):
+        """
+        Args:
+            ttl: 页面缓存时间（秒），内容变化时通过命名空间版本提前失效
+            enabled: 是否启用
+            compress_level: gzip 压缩级别
+        """
+        self.ttl = ttl
+        self.enabled = enabled
+        self.compress_level = compress_level
+        self._stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'bypass': 0}
+
+    def _bypass(self) -> bool:
+        """非 GET 请求和已登录的后台会话不走缓存"""
+        return request.method != 'GET' or bool(session.get('logged_in'))
+
+    def _cache_key(self, cache) -> str:
+        # 页面中引用了 request.url，键包含 host、路径和排序后的查询参数
+        query = '&'.join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True)))
+        digest = hashlib.sha1(f"{request.host}{request.path}?{query}".encode('utf-8')).hexdigest()
+        version = cache.get_namespace_version(self.NAMESPACE)
+        return CacheKeys.PAGE.format(digest=digest, version=version)
+
+    @staticmethod
+    def _accepts_gzip() -> bool:
+        return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+    def _respond(self, entry: dict, cache_status: str):
+        """根据缓存条目生成响应（If-None-Match 命中时返回 304）"""
+        gzip_ok = self._accepts_gzip()
+        etag = f"{entry['etag']}-gz" if gzip_ok else entry['etag']
+
+        if request.if_none_match.contains(etag) or request.if_none_match.contains(entry['etag']):
+            self._stats['not_modified'] += 1
+            response = make_response('', 304)
+        elif gzip_ok:
+            response = make_response(entry['body'])
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = make_response(gzip.decompress(entry['body']))
+
+        response.headers['Content-Type'] = entry['content_type']
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.headers['X-Page-Cache'] = cache_status
+        return response
+
+    def cached(self, on_hit: Optional[Callable] = None):
+        """
+        整页缓存装饰器
+
+        视图可以设置 g.page_cache_skip = True 跳过本次缓存（如降级页面），
+        设置 g.page_cache_meta 保存命中时 on_hit 需要的数据。
+
+        Args:
+            on_hit: 缓存命中时调用的函数，接收 (meta, **view_args)，用于补做点击、搜索日志等副作用
+        """
+        def decorator(view: Callable) -> Callable:
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                cache = get_cache_manager()
+                if not self.enabled or self._bypass() or not cache.is_available():
+                    self._stats['bypass'] += 1
+                    return view(*args, **kwargs)
+
+                cache_key = self._cache_key(cache)
+                entry = cache.get(cache_key)
+                if entry is not None:
+                    self._stats['hits'] += 1
+                    if on_hit is not None:
+                        try:
+                            on_hit(entry.get('meta') or {}, *args, **kwargs)
+                        except Exception as e:
+                            logger.error(f"页面缓存命中回调失败 {request.path}: {e}")
+                    return self._respond(entry, 'HIT')
+
+                self._stats['misses'] += 1
+                response = make_response(view(*args, **kwargs))
+                if (response.status_code != 200 or response.mimetype != 'text/html'
+                        or response.direct_passthrough or g.get('page_cache_skip')):
+                    return response
+
+                body = response.get_data()
+                entry = {
+                    'body': gzip.compress(body, self.compress_level),
+                    'etag': hashlib.sha1(body).hexdigest(),
+                    'content_type': response.headers.get('Content-Type'),
+                    'meta': g.get('page_cache_meta')
+                }
+                cache.set(cache_key, entry, self.ttl)
+
+                # 保留视图设置的其他响应头（如 Set-Cookie）
+                cached_response = self._respond(entry, 'MISS')
+                for header, value in response.headers.items():
+                    if header not in cached_response.headers and header.lower() != 'content-length':
+                        cached_response.headers.add(header, value)
+                return cached_response
+
+            return wrapper
+        return decorator
+
+    def stats(self) -> dict:
+        """页面缓存统计"""
+        stats = dict(self._stats)
+        total = stats['hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] / total * 100) if total > 0 else 0
+        stats['enabled'] = self.enabled
+        stats['ttl'] = self.ttl
+        return stats
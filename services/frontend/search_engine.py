@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+进程内搜索引擎模块
+对标题和标签建立倒排索引（中日韩文字按二元组切分，其余按单词），BM25 排序，
+按 messages.updated_at 增量更新，查询不访问 MySQL
+
+用法:
+    python search_engine.py rebuild [--output search_index.pkl]   # 全量重建并保存快照
+    python search_engine.py query 关键词 [--index search_index.pkl]
+"""
+
+import argparse
+import atexit
+import heapq
+import logging
+import math
+import os
+import pickle
+import re
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter, OrderedDict
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from db_pool import connection_factory_from_env, dict_cursor
+
+logger = logging.getLogger(__name__)
+
+# 中日韩文字（连续片段切成二元组）或小写字母数字单词
+_TOKEN_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+|[0-9a-z]+')
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]')
+
+SNAPSHOT_VERSION = 1
+
+# 增量更新时从水位线往回重扫的时间窗口：updated_at 精确到秒且取语句执行时刻，
+# 晚提交的事务可能带着比水位线更早的时间戳，重扫的行指纹不变时不会重复处理
+REFRESH_OVERLAP = timedelta(seconds=5)
+
+
+def tokenize(text: str) -> List[str]:
+    """切分词项：中日韩片段取相邻二元组（单字片段保留单字），其余取单词"""
+    tokens = []
+    for match in _TOKEN_RE.findall((text or '').lower()):
+        if _CJK_RE.match(match) and len(match) > 1:
+            tokens.extend(match[i:i + 2] for i in range(len(match) - 1))
+        else:
+            tokens.append(match)
+    return tokens
+
+
+# ngram 全文索引的分词长度（与 MySQL ngram_token_size 一致，默认 2）
+NGRAM_TOKEN_SIZE = int(os.environ.get('NGRAM_TOKEN_SIZE', 2))
+
+
+def build_fulltext_query(query: str) -> Optional[str]:
+    """
+    将搜索词转换为 BOOLEAN MODE 查询：每个词作为短语必须出现（+"词"），去掉布尔运算符
+    （进程内索引未就绪时前台退回 ngram 全文索引使用）
+
+    Returns:
+        查询字符串；所有词都短于 ngram 分词长度时返回 None（此时全文索引无法命中）
+    """
+    words = [word for word in re.findall(r'[^\s"+\-<>()~*@#]+', query) if len(word) >= NGRAM_TOKEN_SIZE]
+    if not words:
+        return None
+    return ' '.join(f'+"{word}"' for word in words)
+
+
+class SearchEngine:
+    """标题/标签倒排索引（BM25）
+
+    文章更新时旧的文档槽位只做删除标记，新内容写入新槽位；
+    已删除槽位超过 compact_ratio 时全量重建。
+    """
+
+    # 标签词项的权重（按词频倍数计）
+    TAG_WEIGHT = 2
+
+    def __init__(self, connection_factory: Callable, refresh_interval: int = 30,
+                 rebuild_interval: int = 3600, compact_ratio: float = 0.25,
+                 k1: float = 1.2, b: float = 0.75):
+        """
+        初始化搜索引擎（调用 start() 构建索引并启动后台增量更新）
+
+        Args:
+            connection_factory: 返回数据库连接上下文管理器的函数
+            refresh_interval: 增量更新间隔（秒）
+            rebuild_interval: 全量重建间隔（秒），用于清理被物理删除的文章
+            compact_ratio: 已删除槽位占比超过该值时全量重建
+            k1, b: BM25 参数
+        """
+        self.connection_factory = connection_factory
+        self.refresh_interval = refresh_interval
+        self.rebuild_interval = rebuild_interval
+        self.compact_ratio = compact_ratio
+        self.k1 = k1
+        self.b = b
+
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset()
+        self._stats = {'queries': 0, 'query_time_total': 0.0, 'result_cache_hits': 0,
+                       'refreshes': 0, 'rebuilds': 0, 'updated_docs': 0}
+
+    def _reset(self):
+        # 词项 -> (槽位数组, BM25 词频分量数组)；分量按写入时的平均文档长度预先算好，查询时只乘 idf
+        self._postings: Dict[str, Tuple[array, array]] = {}
+        self._ids = array('l')            # 槽位 -> 文章ID
+        self._created = array('d')        # 槽位 -> 发布时间戳
+        self._lengths = array('I')        # 槽位 -> 文档长度（词项数）
+        self._fingerprints = array('L')   # 槽位 -> 标题+标签的 crc32，内容未变时跳过重建
+        self._dead: Set[int] = set()      # 已删除的槽位
+        self._slot_of: Dict[int, int] = {}
+        self._total_length = 0
+        self._avg_length = 1.0
+        self._watermark = None            # (updated_at, id)，增量更新的起点
+        self._built_at = None
+        # 查询结果缓存：查询词 -> (排好序的前 RESULT_CACHE_DEPTH 个文章ID, 总数)，索引变化时清空
+        self._results: 'OrderedDict[str, Tuple[List[int], int]]' = OrderedDict()
+
+    @property
+    def ready(self) -> bool:
+        return self._built_at is not None
+
+    # ---------- 索引维护 ----------
+
+    def _analyze(self, row: dict) -> Tuple[Counter, int]:
+        """文章的词频和指纹"""
+        title, tags = row.get('title') or '', row.get('tags') or ''
+        counts = Counter(tokenize(title))
+        for token in tokenize(tags):
+            counts[token] += self.TAG_WEIGHT
+        return counts, zlib.crc32(f"{title}\x00{tags}".encode('utf-8'))
+
+    def _remove(self, article_id: int) -> bool:
+        """标记文章的旧槽位为已删除，返回索引是否变化（调用方持有锁）"""
+        slot = self._slot_of.pop(article_id, None)
+        if slot is None:
+            return False
+        self._dead.add(slot)
+        self._total_length -= self._lengths[slot]
+        return True
+
+    def _add(self, row: dict, analyzed: Tuple[Counter, int]) -> bool:
+        """为文章分配新槽位并写入倒排表，标题和标签未变时跳过并返回 False（调用方持有锁）"""
+        counts, fingerprint = analyzed
+        slot = self._slot_of.get(row['id'])
+        if slot is not None and self._fingerprints[slot] == fingerprint:
+            return False
+        self._remove(row['id'])
+
+        length = sum(counts.values())
+        slot = len(self._ids)
+        created_at = row.get('created_at')
+        self._ids.append(row['id'])
+        self._created.append(created_at.timestamp() if created_at else 0.0)
+        self._lengths.append(length)
+        self._fingerprints.append(fingerprint)
+        self._slot_of[row['id']] = slot
+        self._total_length += length
+
+        k1, b = self.k1, self.b
+        norm = k1 * (1 - b + b * length / self._avg_length)
+        for term, tf in counts.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = (array('I'), array('f'))
+            postings[0].append(slot)
+            postings[1].append(tf * (k1 + 1) / (tf + norm))
+        return True
+
+    def _apply_rows(self, rows: List[dict]):
+        with self._lock:
+            changed = False
+            for row in rows:
+                if row.get('is_deleted'):
+                    changed |= self._remove(row['id'])
+                else:
+                    changed |= self._add(row, self._analyze(row))
+                updated_at = row.get('updated_at')
+                if updated_at is not None:
+                    mark = (updated_at, row['id'])
+                    self._watermark = max(self._watermark, mark) if self._watermark else mark
+            # 点击数合并等只改 updated_at 的行不影响搜索结果，保留查询缓存
+            if changed:
+                self._results.clear()
+
+    def rebuild(self, batch_size: int = 5000):
+        """全量重建（在新实例上构建后整体替换，期间查询不受影响）"""
+        started = time.monotonic()
+        rows, analyzed = [], []
+        with self.connection_factory() as conn:
+            cursor = conn.cursor(dict_cursor())
+            # 先记下当前最大更新时间，重建期间的修改由下一次增量更新补上
+            cursor.execute("SELECT MAX(updated_at) AS max_updated FROM messages")
+            max_updated = cursor.fetchone()['max_updated']
+            last_id = 0
+            while True:
+                cursor.execute("""
+                    SELECT id, title, tags, created_at
+                    FROM messages
+                    WHERE id > %s AND is_deleted = 0
+                    ORDER BY id
+                    LIMIT %s
+                """, (last_id, batch_size))
+                batch = cursor.fetchall()
+                if not batch:
+                    break
+                rows.extend(batch)
+                analyzed.extend(self._analyze(row) for row in batch)
+                last_id = batch[-1]['id']
+
+        # 先统计平均文档长度，再写入倒排表
+        fresh = SearchEngine(self.connection_factory, k1=self.k1, b=self.b)
+        if rows:
+            fresh._avg_length = sum(sum(counts.values()) for counts, _ in analyzed) / len(rows) or 1.0
+        for row, item in zip(rows, analyzed):
+            fresh._add(row, item)
+
+        with self._lock:
+            self._postings, self._ids, self._created = fresh._postings, fresh._ids, fresh._created
+            self._lengths, self._fingerprints, self._dead = fresh._lengths, fresh._fingerprints, fresh._dead
+            self._slot_of, self._total_length, self._avg_length = fresh._slot_of, fresh._total_length, fresh._avg_length
+            self._watermark = (max_updated, 0) if max_updated else None
+            self._built_at = time.time()
+            self._results.clear()
+            self._stats['rebuilds'] += 1
+        logger.info(f"🔍 搜索索引重建完成: {len(self._slot_of)} 篇文章, {len(self._postings)} 个词项, "
+                    f"耗时 {time.monotonic() - started:.2f} 秒")
+
+    def refresh(self, batch_size: int = 2000) -> int:
+        """按 updated_at 增量更新（从水位线前 REFRESH_OVERLAP 开始），返回处理的文章数"""
+        if self._watermark is None:
+            self.rebuild()
+            return len(self._slot_of)
+
+        processed = 0
+        updated_at, last_id = self._watermark[0] - REFRESH_OVERLAP, 0
+        with self.connection_factory() as conn:
+            cursor = conn.cursor(dict_cursor())
+            while True:
+                cursor.execute("""
+                    SELECT id, title, tags, created_at, updated_at, is_deleted
+                    FROM messages
+                    WHERE updated_at > %s OR (updated_at = %s AND id > %s)
+                    ORDER BY updated_at, id
+                    LIMIT %s
+                """, (updated_at, updated_at, last_id, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+                self._apply_rows(rows)
+                processed += len(rows)
+                updated_at, last_id = rows[-1]['updated_at'], rows[-1]['id']
+
+        with self._lock:
+            self._stats['refreshes'] += 1
+            self._stats['updated_docs'] += processed
+            dead_ratio = len(self._dead) / len(self._ids) if self._ids else 0
+        if dead_ratio > self.compact_ratio:
+            self.rebuild()
+        return processed
+
+    # ---------- 查询 ----------
+
+    # 每个查询缓存的排序结果数（翻页超出时重新计算）
+    RESULT_CACHE_DEPTH = 200
+    RESULT_CACHE_SIZE = 512
+
+    def search(self, query: str, limit: int = 10, offset: int = 0) -> Optional[Tuple[List[int], int]]:
+        """
+        搜索文章（所有词项都须出现），按 BM25 得分、发布时间排序
+
+        Returns:
+            (当前页文章ID列表, 结果总数)；索引未就绪或查询没有可用词项时返回 None，由调用方退回数据库搜索
+        """
+        terms = sorted(set(tokenize(query)))
+        if not self.ready or not terms:
+            return None
+        # 单字词项只在单字片段中出现，无法代表多字片段中的匹配
+        if any(len(term) == 1 and _CJK_RE.match(term) for term in terms):
+            return None
+
+        started = time.perf_counter()
+        cache_key = ' '.join(terms)
+        with self._lock:
+            cached = self._results.get(cache_key)
+            # 缓存的排序结果覆盖所请求的页（或已包含全部结果）时直接使用
+            if cached is not None and (offset + limit <= len(cached[0]) or len(cached[0]) == cached[1]):
+                self._results.move_to_end(cache_key)
+                self._stats['result_cache_hits'] += 1
+                ranked, total = cached
+            else:
+                ranked, total = self._rank(terms, max(offset + limit, self.RESULT_CACHE_DEPTH))
+                self._results[cache_key] = (ranked, total)
+                if len(self._results) > self.RESULT_CACHE_SIZE:
+                    self._results.popitem(last=False)
+            self._stats['queries'] += 1
+            self._stats['query_time_total'] += time.perf_counter() - started
+        return ranked[offset:offset + limit], total
+
+    def _rank(self, terms: List[str], depth: int) -> Tuple[List[int], int]:
+        """计算得分并返回前 depth 个文章ID和总数（调用方持有锁）"""
+        postings = [self._postings.get(term) for term in terms]
+        if any(p is None for p in postings):
+            return [], 0
+
+        docs = len(self._slot_of) or 1
+        # 从最短的倒排表开始求交集，交集和删除过滤都用集合运算
+        postings.sort(key=lambda p: len(p[0]))
+        scores: Dict[int, float] = {}
+        for index, (slots, impacts) in enumerate(postings):
+            df = len(slots)
+            idf = math.log(1 + (docs - df + 0.5) / (df + 0.5))
+            term_scores = dict(zip(slots, impacts))
+            if index == 0:
+                scores = {slot: idf * impact for slot, impact in term_scores.items()}
+                for slot in self._dead.intersection(scores):
+                    del scores[slot]
+            else:
+                scores = {slot: scores[slot] + idf * term_scores[slot] for slot in scores.keys() & term_scores.keys()}
+            if not scores:
+                return [], 0
+
+        # 得分相同时按发布时间倒序；元组在 C 层比较，避免逐个调用 Python 排序键
+        created = self._created
+        top = heapq.nlargest(depth, zip(scores.values(), map(created.__getitem__, scores.keys()), scores.keys()))
+        ids = self._ids
+        return [ids[slot] for _, _, slot in top], len(scores)
+
+    # ---------- 快照 ----------
+
+    def save(self, path: str):
+        """保存索引快照（新进程加载后只需增量更新）"""
+        with self._lock:
+            state = {
+                'version': SNAPSHOT_VERSION,
+                'postings': self._postings,
+                'ids': self._ids,
+                'created': self._created,
+                'lengths': self._lengths,
+                'fingerprints': self._fingerprints,
+                'dead': self._dead,
+                'avg_length': self._avg_length,
+                'watermark': self._watermark,
+                'built_at': self._built_at
+            }
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        logger.info(f"搜索索引快照已保存: {path}")
+
+    def load(self, path: str) -> bool:
+        """加载索引快照，版本不符或文件不存在时返回 False"""
+        try:
+            with open(path, 'rb') as f:
+                state = pickle.load(f)
+            if state.get('version') != SNAPSHOT_VERSION:
+                logger.warning(f"搜索索引快照版本不符，忽略: {path}")
+                return False
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            logger.error(f"加载搜索索引快照失败 {path}: {e}")
+            return False
+
+        with self._lock:
+            self._postings, self._ids, self._created = state['postings'], state['ids'], state['created']
+            self._lengths, self._fingerprints, self._dead = state['lengths'], state['fingerprints'], state['dead']
+            self._slot_of = {self._ids[slot]: slot for slot in range(len(self._ids)) if slot not in self._dead}
+            self._total_length = sum(self._lengths[slot] for slot in self._slot_of.values())
+            self._avg_length = state['avg_length']
+            self._watermark = state['watermark']
+            self._built_at = state['built_at']
+            self._results.clear()
+        logger.info(f"🔍 已加载搜索索引快照: {len(self._slot_of)} 篇文章")
+        return True
+
+    # ---------- 后台线程 ----------
+
+    def _run(self):
+        last_rebuild = time.monotonic()
+        while True:
+            try:
+                if not self.ready or time.monotonic() - last_rebuild > self.rebuild_interval:
+                    self.rebuild()
+                    last_rebuild = time.monotonic()
+                else:
+                    self.refresh()
+            except Exception as e:
+                logger.error(f"更新搜索索引失败: {e}")
+            if self._stop.wait(self.refresh_interval):
+                return
+
+    def start(self, snapshot_path: Optional[str] = None):
+        """加载快照（如有）并启动后台构建/增量更新线程"""
+        if snapshot_path:
+            self.load(snapshot_path)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='search-index', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 5):
+        """停止后台线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        """索引统计信息"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                'ready': self.ready,
+                'documents': len(self._slot_of),
+                'slots': len(self._ids),
+                'terms': len(self._postings),
+                'built_at': self._built_at,
+                'watermark': str(self._watermark[0]) if self._watermark else None
+            })
+        stats['query_time_avg_ms'] = stats['query_time_total'] / stats['queries'] * 1000 if stats['queries'] else 0.0
+        return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='搜索索引管理')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    rebuild_parser = subparsers.add_parser('rebuild', help='全量重建索引并保存快照')
+    rebuild_parser.add_argument('--output', default=os.environ.get('SEARCH_INDEX_PATH', 'search_index.pkl'))
+    query_parser = subparsers.add_parser('query', help='用快照查询')
+    query_parser.add_argument('query')
+    query_parser.add_argument('--index', default=os.environ.get('SEARCH_INDEX_PATH', 'search_index.pkl'))
+    query_parser.add_argument('--limit', type=int, default=10)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    engine = SearchEngine(connection_factory_from_env())
+    if args.command == 'rebuild':
+        engine.rebuild()
+        engine.save(args.output)
+        print(engine.stats())
+    else:
+        if not engine.load(args.index):
+            print(f"❌ 无法加载索引快照: {args.index}")
+            return
+        started = time.perf_counter()
+        result = engine.search(args.query, args.limit)
+        elapsed = (time.perf_counter() - started) * 1000
+        if result is None:
+            print("查询没有可用词项（单字查询由数据库处理）")
+        else:
+            ids, total = result
+            print(f"共 {total} 条，耗时 {elapsed:.3f} ms: {ids}")
+
+
+if __name__ == '__main__':
+    main()
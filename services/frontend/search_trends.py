@@ -0,0 +1,111 @@
+"""
+热门搜索模块
+搜索词规范化后按小时累加到 Redis 有序集合，读取时按时间衰减合并最近的小时桶并缓存合并结果，
+首页一次 ZREVRANGE 取前 N 个；过期的小时桶由 Redis 自动删除
+"""
+
+import logging
+import time
+import unicodedata
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 搜索词最大长度（与 search_logs.search_keyword 一致）
+QUERY_MAX_LENGTH = 255
+
+
+def normalize_query(query: str) -> str:
+    """规范化搜索词：全角转半角、合并空白、转小写，大小写和空白不同的写法计为同一个词"""
+    if not query:
+        return ''
+    return ' '.join(unicodedata.normalize('NFKC', query).split()).lower()[:QUERY_MAX_LENGTH]
+
+
+class SearchTrends:
+    """基于 Redis 有序集合的时间衰减热门搜索"""
+
+    # 每小时一个桶：trending:search:{小时序号}；合并后的排行：trending:search:top
+    BUCKET_KEY = "trending:search:{hour}"
+    TOP_KEY = "trending:search:top"
+
+    def __init__(self, cache_getter: Callable, window_hours: int = 24,
+                 half_life_hours: float = 6, top_ttl: int = 60):
+        """
+        初始化热门搜索
+
+        Args:
+            cache_getter: 返回 CacheManager 的函数
+            window_hours: 统计最近多少个小时桶
+            half_life_hours: 衰减半衰期（小时），桶每老这么多小时权重减半
+            top_ttl: 合并排行的缓存时间（秒）
+        """
+        self.cache_getter = cache_getter
+        self.window_hours = window_hours
+        self.half_life_hours = half_life_hours
+        self.top_ttl = top_ttl
+
+    def _redis(self):
+        cache = self.cache_getter()
+        return cache.redis_client if cache.is_available() else None
+
+    def record(self, query: str) -> bool:
+        """记录一次搜索（ZINCRBY，O(log n)），Redis 不可用时返回 False"""
+        keyword = normalize_query(query)
+        if not keyword:
+            return True
+        client = self._redis()
+        if client is None:
+            return False
+
+        hour = int(time.time() // 3600)
+        key = self.BUCKET_KEY.format(hour=hour)
+        try:
+            pipe = client.pipeline(transaction=False)
+            pipe.zincrby(key, 1, keyword)
+            # 桶在移出统计窗口后自动过期
+            pipe.expire(key, (self.window_hours + 1) * 3600)
+            pipe.execute()
+            return True
+        except Exception as e:
+            self.cache_getter().report_error(e)
+            logger.error(f"记录热门搜索失败: {e}")
+            return False
+
+    def top(self, limit: int = 5) -> Optional[List[dict]]:
+        """
+        获取热门搜索
+
+        Returns:
+            [{'search_keyword': 词, 'search_count': 衰减后的次数}, ...]；Redis 不可用时返回 None
+        """
+        client = self._redis()
+        if client is None:
+            return None
+        try:
+            rows = client.zrevrange(self.TOP_KEY, 0, limit - 1, withscores=True)
+            if not rows:
+                rows = self._rebuild(client, limit)
+        except Exception as e:
+            self.cache_getter().report_error(e)
+            logger.error(f"获取热门搜索失败: {e}")
+            return None
+        return [
+            {'search_keyword': keyword, 'search_count': max(1, round(score))}
+            for keyword, score in rows if keyword
+        ]
+
+    def _rebuild(self, client, limit):
+        """按衰减权重合并窗口内的小时桶，写入排行缓存后返回前 limit 个"""
+        hour = int(time.time() // 3600)
+        weights = {
+            self.BUCKET_KEY.format(hour=hour - age): 0.5 ** (age / self.half_life_hours)
+            for age in range(self.window_hours)
+        }
+        pipe = client.pipeline(transaction=True)
+        pipe.zunionstore(self.TOP_KEY, weights)
+        # 占位成员（分数 0 排在最后，读取时过滤）：窗口内没有搜索时也不必每次重新合并
+        pipe.zadd(self.TOP_KEY, {'': 0})
+        pipe.expire(self.TOP_KEY, self.top_ttl)
+        pipe.zrevrange(self.TOP_KEY, 0, limit - 1, withscores=True)
+        return pipe.execute()[-1]
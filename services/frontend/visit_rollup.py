@@ -0,0 +1,166 @@
+"""
+访问日志小时汇总模块
+后台线程按小时把 visit_logs 汇总到 visit_stats_hourly（小时、来源、页面分类、访问次数、独立访客），
+后台统计只读汇总表；已汇总且超过保留天数的原始访问日志分批删除
+
+用法（手动汇总并清理，在 frontend 容器内）:
+    python visit_rollup.py
+"""
+
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+HOUR = timedelta(hours=1)
+
+# 来源归类与原先统计口径一致，页面按路径前缀分类
+ROLLUP_SQL = """
+    INSERT INTO visit_stats_hourly (hour_start, visit_source, page_bucket, visit_count, unique_visitors)
+    SELECT %s, source, bucket, COUNT(*), COUNT(DISTINCT visitor_ip)
+    FROM (
+        SELECT visitor_ip,
+               IF(visit_source IN ('搜索引擎', '直接访问', '社交媒体', '即时通讯', '外部网站'),
+                  visit_source, '其他') AS source,
+               CASE
+                   WHEN page_path = '/' THEN 'home'
+                   WHEN page_path LIKE '/article/%%' THEN 'article'
+                   WHEN page_path LIKE '/search%%' THEN 'search'
+                   WHEN page_path LIKE '/tag/%%' THEN 'tag'
+                   WHEN page_path LIKE '/api/%%' THEN 'api'
+                   ELSE 'other'
+               END AS bucket
+        FROM visit_logs
+        WHERE created_at >= %s AND created_at < %s
+    ) AS visits
+    GROUP BY source, bucket
+    ON DUPLICATE KEY UPDATE visit_count = VALUES(visit_count), unique_visitors = VALUES(unique_visitors)
+"""
+
+
+class VisitRollup:
+    """访问日志小时汇总与原始日志清理"""
+
+    def __init__(self, connection_factory: Callable, interval: int = 3600,
+                 retention_days: int = 30, batch_size: int = 5000):
+        """
+        初始化汇总任务（调用 start() 启动后台线程）
+
+        Args:
+            connection_factory: 返回数据库连接上下文管理器的函数
+            interval: 汇总间隔（秒）
+            retention_days: 原始访问日志保留天数，0 表示不清理
+            batch_size: 每批删除的原始日志行数
+        """
+        self.connection_factory = connection_factory
+        self.interval = interval
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def rollup(self) -> bool:
+        """汇总所有已结束的小时（最近一次汇总的小时重新计算，补上延迟写入的日志），返回是否成功"""
+        started = time.perf_counter()
+        hours = 0
+        try:
+            with self.connection_factory() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT NOW()")
+                current_hour = cursor.fetchone()[0].replace(minute=0, second=0, microsecond=0)
+
+                cursor.execute("SELECT MAX(hour_start) FROM visit_stats_hourly")
+                hour = cursor.fetchone()[0]
+                if hour is None:
+                    # 首次运行从最早的访问日志开始
+                    cursor.execute("SELECT MIN(created_at) FROM visit_logs")
+                    earliest = cursor.fetchone()[0]
+                    if earliest is None:
+                        return True
+                    hour = earliest.replace(minute=0, second=0, microsecond=0)
+
+                while hour < current_hour and not self._stop.is_set():
+                    cursor.execute(ROLLUP_SQL, (hour, hour, hour + HOUR))
+                    conn.commit()
+                    hour += HOUR
+                    hours += 1
+        except Exception as e:
+            logger.error(f"汇总访问日志失败: {e}")
+            return False
+
+        if hours > 1:
+            logger.info(f"📊 访问日志汇总完成，{hours} 个小时，耗时 {time.perf_counter() - started:.2f} 秒")
+        return True
+
+    def purge(self) -> int:
+        """分批删除已汇总且超过保留天数的原始访问日志，返回删除行数"""
+        if self.retention_days <= 0:
+            return 0
+
+        deleted = 0
+        try:
+            with self.connection_factory() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT MAX(hour_start) FROM visit_stats_hourly")
+                rolled_up_to = cursor.fetchone()[0]
+                if rolled_up_to is None:
+                    return 0
+                cursor.execute("SELECT NOW()")
+                cutoff = min(cursor.fetchone()[0] - timedelta(days=self.retention_days), rolled_up_to)
+
+                while not self._stop.is_set():
+                    cursor.execute(
+                        "DELETE FROM visit_logs WHERE created_at < %s LIMIT %s",
+                        (cutoff, self.batch_size)
+                    )
+                    conn.commit()
+                    deleted += cursor.rowcount
+                    if cursor.rowcount < self.batch_size:
+                        break
+                    time.sleep(0.1)
+        except Exception as e:
+            logger.error(f"清理访问日志失败: {e}")
+
+        if deleted:
+            logger.info(f"🧹 已删除 {deleted} 条 {self.retention_days} 天前的访问日志")
+        return deleted
+
+    def _run(self):
+        while True:
+            if self.rollup():
+                self.purge()
+            if self._stop.wait(self.interval):
+                break
+
+    def start(self):
+        """启动后台汇总线程"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='visit-rollup', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+
+    def stop(self, timeout: float = 10):
+        """停止后台线程"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+if __name__ == '__main__':
+    import os
+
+    from db_pool import connection_factory_from_env
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    rollup = VisitRollup(
+        connection_factory_from_env(),
+        retention_days=int(os.environ.get('VISIT_LOG_RETENTION_DAYS', 30))
+    )
+    if rollup.rollup():
+        print(f"✅ 汇总完成，清理 {rollup.purge()} 条原始访问日志")
+    else:
+        print("❌ 汇总失败")
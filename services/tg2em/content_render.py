@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+文章正文渲染
+
+正文 HTML 与 content 的哈希一起存入 messages（content_html / content_hash），
+详情页只在哈希不一致（新文章、内容被编辑、渲染规则升级）时重新渲染。
+采集器 parse_log 生成的固定格式（图片 + 描述 / 大小 / 链接）走快速路径，
+输出与完整 Markdown 渲染逐字节一致；其他内容交给 markdown 库。
+采集、后台和前台三个服务各放一份相同的文件，修改时请同步
+（services/check_shared_modules.py 检查各份是否一致，deploy.sh 构建镜像前自动执行）；
+采集和后台没有安装 markdown，非固定格式的内容留给前台渲染。
+"""
+
+import hashlib
+import re
+import threading
+
+# 渲染规则变化时递增，已存储的 HTML 会因哈希不一致而重新渲染
+RENDER_VERSION = 1
+
+MARKDOWN_EXTENSIONS = [
+    'markdown.extensions.fenced_code',
+    'markdown.extensions.tables',
+    'markdown.extensions.toc',
+    'markdown.extensions.codehilite',
+    'markdown.extensions.nl2br',
+    'markdown.extensions.sane_lists'
+]
+MARKDOWN_EXTENSION_CONFIGS = {
+    'markdown.extensions.codehilite': {
+        'css_class': 'highlight'
+    }
+}
+
+_IMG_TAG = re.compile(r'<img([^>]*?)src="([^"]*?)"([^>]*?)>')
+_IMG_STYLE = r'<img\1src="\2"\3 class="img-fluid rounded shadow" style="max-width: 100%; height: auto; margin: 10px 0;">'
+
+# parse_log 的固定格式；任何一段含有 Markdown/HTML 语法时不走快速路径
+_FIXED_FORMAT = re.compile(
+    r'(?:!\[\]\((?P<image>[^\s()"<>&]+)\)\n\n)?'
+    r'\*\*描述\*\*: (?P<description>[^\n].*?)\n\n'
+    r'\*\*📁 大小\*\*: (?P<size>[^\n]+)\n\n'
+    r'\*\*链接\*\*: (?P<link>[^\n]+)',
+    re.DOTALL
+)
+_BLOCK_START = re.compile(r'\s|[-+=>#|*]|\d+[.)](?:\s|$)')
+_UNSAFE_CHARS = re.compile(r'[*`_\[\]<>!\\~{}\r\t]|&#?\w+;|\s$')
+_ANCHOR = re.compile(r'<a href="(?P<href>[^"<>&\s]*)" target="_blank">(?P<text>[^<>&*`_\[\]!\\~{}]+)</a>')
+
+_local = threading.local()
+
+
+def content_hash(content):
+    """正文哈希（包含渲染规则版本）"""
+    return hashlib.sha1(f"{RENDER_VERSION}:{content or ''}".encode('utf-8')).hexdigest()
+
+
+def _plain_line(line):
+    """纯文本行转义为 HTML；行内含 Markdown 语法或以块级标记开头时返回 None"""
+    if not line or _BLOCK_START.match(line) or _UNSAFE_CHARS.search(line):
+        return None
+    return line.replace('&', '&amp;')
+
+
+def render_fixed_format(content):
+    """
+    快速渲染 parse_log 固定格式的正文
+
+    Returns:
+        HTML；内容不是固定格式（或含有需要完整解析的语法）时返回 None
+    """
+    match = _FIXED_FORMAT.fullmatch(content)
+    if not match:
+        return None
+
+    description_lines = [_plain_line(line) for line in match.group('description').split('\n')]
+    size = _plain_line(match.group('size'))
+    if size is None or any(line is None for line in description_lines):
+        return None
+
+    anchor = _ANCHOR.fullmatch(match.group('link'))
+    link = match.group('link') if anchor else _plain_line(match.group('link'))
+    if link is None:
+        return None
+
+    paragraphs = []
+    if match.group('image'):
+        paragraphs.append(f'<p><img alt="" src="{match.group("image")}" /></p>')
+    paragraphs.append('<p><strong>描述</strong>: ' + '<br />\n'.join(description_lines) + '</p>')
+    paragraphs.append(f'<p><strong>📁 大小</strong>: {size}</p>')
+    paragraphs.append(f'<p><strong>链接</strong>: {link}</p>')
+    return '\n'.join(paragraphs)
+
+
+def render_markdown_full(text):
+    """完整 Markdown 渲染（每个线程复用一个解析器实例）；未安装 markdown 时返回 None"""
+    md = getattr(_local, 'md', None)
+    if md is None:
+        try:
+            import markdown
+        except ImportError:
+            return None
+        md = _local.md = markdown.Markdown(
+            extensions=MARKDOWN_EXTENSIONS,
+            extension_configs=MARKDOWN_EXTENSION_CONFIGS
+        )
+    return md.reset().convert(text)
+
+
+def render_content_html(content):
+    """
+    渲染文章正文为 HTML（图片添加响应式样式）
+
+    Returns:
+        HTML；需要完整渲染但当前服务没有 markdown 库时返回 None
+    """
+    if not content:
+        return ""
+
+    html = render_fixed_format(content)
+    if html is None:
+        html = render_markdown_full(content)
+        if html is None:
+            return None
+
+    # 处理图片，添加响应式样式
+    return _IMG_TAG.sub(_IMG_STYLE, html)
+
+
+def build_rendered(content):
+    """
+    生成入库/编辑时写入的 (content_html, content_hash)
+
+    当前服务无法渲染时两者都为 None，由前台详情页渲染后写回
+    """
+    html = render_content_html(content)
+    if html is None:
+        return None, None
+    return html, content_hash(content)
@@ -499,6 +499,40 @@ def handle_scrape_status():
             'message': f'查询采集状态失败: {str(e)}'
         })
 
+@app.route('/api/scrape/jobs', methods=['GET', 'POST'])
+@app.route('/api/scrape/jobs/<job_id>', methods=['GET'])
+@app.route('/api/scrape/jobs/<job_id>/cancel', methods=['POST'])
+def handle_scrape_jobs(job_id=None):
+    """处理采集作业请求（代理到采集服务）"""
+    if not management_service.is_running:
+        return jsonify({
+            'success': False,
+            'message': '采集服务未运行'
+        })
+
+    try:
+        path = request.path.replace('/api/scrape/jobs', '/api/scraper/jobs', 1)
+        scraper_url = f"http://localhost:{management_service.config['scraper_port']}{path}"
+
+        response = requests.request(
+            request.method,
+            scraper_url,
+            json=request.get_json(silent=True) if request.method == 'POST' else None,
+            timeout=10
+        )
+        return jsonify(response.json()), response.status_code
+
+    except requests.exceptions.ConnectionError:
+        return jsonify({
+            'success': False,
+            'message': '无法连接到采集服务'
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'采集作业请求失败: {str(e)}'
+        })
+
 @app.route('/')
 def index():
     """管理页面"""
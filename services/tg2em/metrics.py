@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+采集服务运行指标 - Prometheus 文本格式
+
+指标更新只做字典累加，不加锁、不做 I/O，可以在采集事件循环中常开；
+/metrics 请求在 Flask 线程中读取快照并渲染文本，不占用采集循环。
+"""
+
+import asyncio
+import bisect
+import logging
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = '') -> str:
+    pairs = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """指标基类"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Tuple[str, ...]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}")
+        return tuple(str(label) for label in labels)
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}"
+        ]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels, amount: float = 1):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        return [
+            ('', _format_labels(self.labelnames, key), value)
+            for key, value in list(self._values.items())
+        ]
+
+
+class Gauge(Metric):
+    """瞬时值；可设置回调在渲染时取值"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callback: Callable[[], Dict[Tuple[str, ...], float]] = None
+
+    def set(self, value: float, *labels):
+        self._values[self._key(labels)] = value
+
+    def set_function(self, callback: Callable[[], Dict[Tuple[str, ...], float]]):
+        """渲染时调用 callback，返回 {标签值元组: 数值}"""
+        self._callback = callback
+
+    def samples(self):
+        values = dict(self._values)
+        if self._callback:
+            try:
+                values.update(self._callback())
+            except Exception as e:
+                logging.debug(f"读取指标 {self.name} 失败: {e}")
+        return [
+            ('', _format_labels(self.labelnames, key), value)
+            for key, value in values.items()
+        ]
+
+
+class Histogram(Metric):
+    """分桶直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 标签值元组 -> [各桶计数..., +Inf 计数, 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def samples(self):
+        samples = []
+        for key, state in list(self._values.items()):
+            state = list(state)
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+                cumulative += count
+                le = 'le="{}"'.format(_format_value(bound) if bound == float('inf') else bound)
+                samples.append(('_bucket', _format_labels(self.labelnames, key, le), cumulative))
+            samples.append(('_sum', _format_labels(self.labelnames, key), state[-1]))
+            samples.append(('_count', _format_labels(self.labelnames, key), cumulative))
+        return samples
+
+
+class Registry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+# 消息
+MESSAGES_FETCHED = REGISTRY.register(Counter(
+    'scraper_messages_fetched_total', '从 Telegram 拉取的消息数', ('channel',)))
+MESSAGES_DUPLICATE = REGISTRY.register(Counter(
+    'scraper_messages_duplicate_total', '已处理过（去重命中）的消息数', ('channel',)))
+MESSAGES_INGESTED = REGISTRY.register(Counter(
+    'scraper_messages_ingested_total', '新入库的消息数', ('channel',)))
+
+# 图片处理
+IMAGE_DOWNLOAD_SECONDS = REGISTRY.register(Histogram(
+    'scraper_image_download_seconds', '从 Telegram 下载图片耗时'))
+IMAGE_COMPRESS_SECONDS = REGISTRY.register(Histogram(
+    'scraper_image_compress_seconds', '图片压缩耗时'))
+IMAGE_UPLOAD_SECONDS = REGISTRY.register(Histogram(
+    'scraper_image_upload_seconds', '图床上传耗时'))
+IMAGE_BYTES = REGISTRY.register(Counter(
+    'scraper_image_bytes_total', '图片流量字节数', ('direction',)))
+
+# MySQL
+MYSQL_ACQUIRE_SECONDS = REGISTRY.register(Histogram(
+    'scraper_mysql_pool_acquire_seconds', '从 MySQL 连接池获取连接的等待时间',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)))
+
+# 事件循环
+EVENT_LOOP_LAG_SECONDS = REGISTRY.register(Histogram(
+    'scraper_event_loop_lag_seconds', '采集事件循环调度延迟',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 5)))
+EVENT_LOOP_LAG_CURRENT = REGISTRY.register(Gauge(
+    'scraper_event_loop_lag_current_seconds', '最近一次测得的事件循环调度延迟'))
+
+# Telegram 限流
+FLOOD_WAIT_SECONDS = REGISTRY.register(Counter(
+    'scraper_flood_wait_seconds_total', 'Telegram FloodWait 累计等待秒数'))
+FLOOD_WAIT_EVENTS = REGISTRY.register(Counter(
+    'scraper_flood_wait_total', 'Telegram FloodWait 次数'))
+
+# 去重命中率（渲染时由计数器计算）
+DEDUP_HIT_RATIO = REGISTRY.register(Gauge(
+    'scraper_dedup_hit_ratio', '去重命中率（重复消息数 / 拉取消息数）', ('channel',)))
+
+
+def _dedup_hit_ratio():
+    duplicates = dict(MESSAGES_DUPLICATE._values)
+    return {
+        key: duplicates.get(key, 0) / fetched
+        for key, fetched in list(MESSAGES_FETCHED._values.items()) if fetched
+    }
+
+
+DEDUP_HIT_RATIO.set_function(_dedup_hit_ratio)
+
+# 队列深度（渲染时回调取值）
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'scraper_queue_depth', '各队列当前长度', ('queue',)))
+
+
+class FloodWaitLogHandler(logging.Handler):
+    """
+    从 Telethon 自动休眠日志中记录 FloodWait 秒数
+
+    Telethon 的日志参数为 (' early' 或 '', 秒数, timedelta, 请求名)，秒数在第二个参数
+    """
+
+    def emit(self, record: logging.LogRecord):
+        if 'flood wait' not in str(record.msg) or not isinstance(record.args, tuple) or len(record.args) < 2:
+            return
+        try:
+            seconds = float(record.args[1])
+        except (TypeError, ValueError):
+            return
+        FLOOD_WAIT_EVENTS.inc()
+        FLOOD_WAIT_SECONDS.inc(amount=seconds)
+
+
+def install_flood_wait_hook():
+    """挂载 Telethon FloodWait 日志钩子（重复调用只挂载一次）"""
+    telethon_logger = logging.getLogger('telethon.client.users')
+    # Telethon 以 INFO 级别输出自动休眠日志
+    if telethon_logger.getEffectiveLevel() > logging.INFO:
+        telethon_logger.setLevel(logging.INFO)
+    if not any(isinstance(handler, FloodWaitLogHandler) for handler in telethon_logger.handlers):
+        telethon_logger.addHandler(FloodWaitLogHandler())
+
+
+async def monitor_event_loop_lag(interval: float = 0.5):
+    """在采集事件循环中周期性测量调度延迟"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        EVENT_LOOP_LAG_SECONDS.observe(lag)
+        EVENT_LOOP_LAG_CURRENT.set(lag)
@@ -1,11 +1,20 @@
 import os
+import time
+import uuid
 import logging
-from logging.handlers import RotatingFileHandler
+import contextvars
+from contextlib import contextmanager
+import log_setup
+import metrics
+from content_counters import counter_delta_statement
+from content_preview import build_preview
+from content_render import build_rendered
+from tag_index import RELATED_CANDIDATES_SQL, related_refresh_statements, tag_sync_statements
 import asyncio
 import yaml
 from telethon import TelegramClient
 from telethon.tl.types import PeerChannel
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, date
 import aiomysql
 from urllib.parse import quote
 import aiohttp
@@ -13,25 +22,46 @@ from PIL import Image
 import signal
 import sys
 
-# 限制并发数为 5
-semaphore = asyncio.Semaphore(5)
+# 限制并发数为 5（在实际运行的事件循环中延迟创建，避免绑定到导入时的循环）
+semaphore = None
+
+def get_upload_semaphore():
+    """获取图片上传并发信号量"""
+    global semaphore
+    if semaphore is None:
+        semaphore = asyncio.Semaphore(5)
+    return semaphore
+
+# 采集串行锁与客户端初始化锁：所有采集共用一个 Telegram 客户端，同一时间只允许一个采集在跑
+scrape_lock = None
+client_lock = None
+
+def get_scrape_lock():
+    """获取采集串行锁"""
+    global scrape_lock
+    if scrape_lock is None:
+        scrape_lock = asyncio.Lock()
+    return scrape_lock
+
+def get_client_lock():
+    """获取 Telegram 客户端初始化锁"""
+    global client_lock
+    if client_lock is None:
+        client_lock = asyncio.Lock()
+    return client_lock
 
 # 日志函数
 def setup_logging(config):
-    """配置日志"""
+    """配置日志（非阻塞队列输出，热点日志按配置采样/限速）"""
     logging_config = config["logging"]["scrape"]
-    os.makedirs(os.path.dirname(logging_config["filename"]), exist_ok=True)
-    logging.basicConfig(
-        level=getattr(logging, logging_config["level"]),
-        format=logging_config["format"],
-        handlers=[
-            logging.StreamHandler(),
-            RotatingFileHandler(
-                logging_config["filename"],
-                maxBytes=logging_config["max_bytes"],
-                backupCount=logging_config["backup_count"]
-            )
-        ]
+    log_setup.setup_logging(
+        level=logging_config["level"],
+        fmt=logging_config["format"],
+        filename=logging_config["filename"],
+        max_bytes=logging_config["max_bytes"],
+        backup_count=logging_config["backup_count"],
+        json_format=logging_config.get("json", False),
+        rate_limits=logging_config.get("rate_limits")
     )
 
 # 加载配置文件
@@ -98,22 +128,111 @@ async def close_mysql_pool():
         mysql_pool = None
         logging.info("MySQL 连接池已关闭")
 
+# 当前采集运行的统计（由 scrape_channel 按频道设置，供各阶段计时）
+current_run = contextvars.ContextVar("current_scrape_run", default=None)
+
+class ScrapeRunStats:
+    """一次采集运行（或运行中单个频道）的计数、流量和阶段耗时"""
+
+    STAGES = ("telegram", "image", "upload", "db")
+
+    def __init__(self, run_id, channel=None, parent=None):
+        self.run_id = run_id
+        self.channel = channel
+        self.parent = parent
+        self.started_at = datetime.now()
+        self.finished_at = None
+        self.error = None
+        self.counts = {"total": 0, "duplicate": 0, "new": 0, "blocked_tags_removed": 0}
+        self.bytes = {"downloaded": 0, "uploaded": 0}
+        self.stage_seconds = dict.fromkeys(self.STAGES, 0.0)
+        self.channels = []
+
+    def _chain(self):
+        """自身及上级运行（频道的统计同时累加到整次运行）"""
+        node = self
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def count(self, key, amount=1):
+        for node in self._chain():
+            node.counts[key] += amount
+
+    def add_bytes(self, key, amount):
+        for node in self._chain():
+            node.bytes[key] += amount
+
+    def add_time(self, stage, seconds):
+        for node in self._chain():
+            node.stage_seconds[stage] += seconds
+
+    def start_channel(self, channel):
+        """开始统计一个频道，并结束上一个频道"""
+        if self.channels and self.channels[-1].finished_at is None:
+            self.channels[-1].finished_at = datetime.now()
+        child = ScrapeRunStats(self.run_id, str(channel), parent=self)
+        self.channels.append(child)
+        return child
+
+    def finish(self, error=None):
+        now = datetime.now()
+        for child in self.channels:
+            if child.finished_at is None:
+                child.finished_at = now
+        self.finished_at = now
+        self.error = error
+
+    def to_row(self):
+        finished_at = self.finished_at or datetime.now()
+        error = self.error or (self.parent.error if self.parent else None)
+        return (
+            self.run_id, self.channel, "failed" if error else "completed", error,
+            self.started_at, finished_at,
+            int((finished_at - self.started_at).total_seconds() * 1000),
+            self.counts["total"], self.counts["duplicate"], self.counts["new"],
+            self.counts["blocked_tags_removed"],
+            self.bytes["downloaded"], self.bytes["uploaded"],
+            *(int(self.stage_seconds[stage] * 1000) for stage in self.STAGES)
+        )
+
+@contextmanager
+def run_stage(stage, histogram=None):
+    """将代码块耗时计入当前采集运行的指定阶段（并可记录到直方图指标）"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        if histogram is not None:
+            histogram.observe(elapsed)
+        run = current_run.get()
+        if run is not None:
+            run.add_time(stage, elapsed)
+
 class MySQLConnectionManager:
     """异步上下文管理器，用于管理 MySQL 连接"""
     def __init__(self):
         self.conn = None
+        self.started = None
 
     async def __aenter__(self):
         global mysql_pool
+        self.started = time.perf_counter()
         if mysql_pool is None:
             await init_mysql_pool()
         self.conn = await mysql_pool.acquire()
+        metrics.MYSQL_ACQUIRE_SECONDS.observe(time.perf_counter() - self.started)
         return self.conn
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         global mysql_pool
         if self.conn:
             await mysql_pool.release(self.conn)
+        # 连接获取到释放的耗时计入 DB 阶段
+        run = current_run.get()
+        if run is not None:
+            run.add_time("db", time.perf_counter() - self.started)
 
 async def close_mysql_pool():
     """关闭 MySQL 连接池"""
@@ -144,39 +263,177 @@ async def mark_message_processed(channel_id, message_id):
         async with MySQLConnectionManager() as conn:
             async with conn.cursor() as cursor:
                 await cursor.execute(
-                    "INSERT INTO processed_messages (channel_id, message_id, created_at) VALUES (%s, %s, NOW())",
+                    "INSERT IGNORE INTO processed_messages (channel_id, message_id, created_at) VALUES (%s, %s, NOW())",
                     (channel_id, message_id)
                 )
     except Exception as e:
         logging.error(f"标记消息为已处理时发生错误: {e}")
 
 async def save_message(title, content, tags, sort_id=None, image_url=None):
-    """将消息保存到 MySQL 数据库"""
+    """
+    将消息保存到 MySQL 数据库（同时写入列表卡片摘要、首图、渲染好的正文、内容计数和标签索引），
+    提交后再单独刷新相关推荐
+
+    Returns:
+        成功时返回消息ID，失败时返回 None（调用方不应标记为已处理，下次采集重试）
+    """
     try:
+        preview_html, image_url = build_preview(content, image_url)
+        content_html, content_hash = build_rendered(content)
         async with MySQLConnectionManager() as conn:
-            async with conn.cursor() as cursor:
-                await cursor.execute(
-                    "INSERT INTO messages (title, content, tags, sort_id, image_url) VALUES (%s, %s, %s, %s, %s)",
-                    (title, content, ', '.join(tags), sort_id, image_url)
-                )
-                logging.info(f"消息已保存到数据库: title={title}")
+            # 消息、内容计数和标签索引在同一事务中写入
+            await conn.begin()
+            try:
+                async with conn.cursor() as cursor:
+                    await cursor.execute(
+                        "INSERT INTO messages (title, content, tags, sort_id, image_url, preview_html, content_html, content_hash) "
+                        "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                        (title, content, ', '.join(tags), sort_id, image_url, preview_html, content_html, content_hash)
+                    )
+                    message_id = cursor.lastrowid
+                    await cursor.execute(*counter_delta_statement(message_id, 1))
+                    statements = tag_sync_statements(message_id, [], tags)
+                    for sql, params in statements:
+                        await cursor.execute(sql, params)
+                await conn.commit()
+            except Exception:
+                await conn.rollback()
+                raise
+            logging.info(f"消息已保存到数据库: title={title}")
+
+            if statements:
+                await refresh_related_articles(conn, message_id, tags)
+            return message_id
     except Exception as e:
         logging.error(f"保存消息到数据库时发生错误: {e}")
+        return None
+
+async def refresh_related_articles(conn, message_id, tags):
+    """
+    计算新消息的相关推荐，同时把它写进相似文章的推荐列表
+
+    单独的事务，尽力而为：与后台编辑或 backfill_tags.py 锁冲突失败时只记录日志，
+    消息本身已经提交，缺失的推荐由 backfill_tags.py --related-only 补齐
+    """
+    await conn.begin()
+    try:
+        async with conn.cursor() as cursor:
+            await cursor.execute(RELATED_CANDIDATES_SQL, (message_id, message_id))
+            candidates = await cursor.fetchall()
+            for sql, params in related_refresh_statements(message_id, tags, candidates):
+                await cursor.execute(sql, params)
+        await conn.commit()
+    except Exception as e:
+        await conn.rollback()
+        logging.warning(f"刷新相关推荐失败（消息已保存）: message_id={message_id}, {e}")
 
-async def clean_processed_messages(retention_days=7):
-    """清理超过指定天数的记录"""
+async def clean_processed_messages(retention_days=7, batch_size=1000):
+    """清理超过指定天数的记录（未分区表的兜底方案，分批删除避免长时间锁表）"""
     try:
         async with MySQLConnectionManager() as conn:
             async with conn.cursor() as cursor:
-                await cursor.execute(
-                    "DELETE FROM processed_messages WHERE created_at < NOW() - INTERVAL %s DAY",
-                    (retention_days,)
-                )
-                deleted_rows = cursor.rowcount
+                deleted_rows = 0
+                while True:
+                    await cursor.execute(
+                        "DELETE FROM processed_messages WHERE created_at < NOW() - INTERVAL %s DAY LIMIT %s",
+                        (retention_days, batch_size)
+                    )
+                    deleted_rows += cursor.rowcount
+                    if cursor.rowcount < batch_size:
+                        break
+                    await asyncio.sleep(0)
                 logging.info(f"清理 processed_messages 表，删除 {deleted_rows} 条过期记录")
     except Exception as e:
         logging.error(f"清理 processed_messages 表时发生错误: {e}")
 
+def _from_days(days):
+    """TO_DAYS() 天数编号转换为日期"""
+    return date.fromordinal(days - 365)
+
+async def maintain_processed_partitions(retention_days=7, precreate_days=3):
+    """维护 processed_messages 分区：预建未来分区，整分区删除过期数据"""
+    try:
+        async with MySQLConnectionManager() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute("SELECT TO_DAYS(CURDATE())")
+                today_days = (await cursor.fetchone())[0]
+
+                await cursor.execute("""
+                    SELECT PARTITION_NAME, PARTITION_DESCRIPTION
+                    FROM information_schema.PARTITIONS
+                    WHERE TABLE_SCHEMA = DATABASE()
+                      AND TABLE_NAME = 'processed_messages'
+                      AND PARTITION_NAME IS NOT NULL
+                    ORDER BY PARTITION_ORDINAL_POSITION
+                """)
+                partitions = await cursor.fetchall()
+
+                if not partitions:
+                    logging.warning("processed_messages 表未分区，使用分批 DELETE 清理（建议执行 sql/partition_processed_messages.sql）")
+                    await clean_processed_messages(retention_days)
+                    return
+
+                bounds = {
+                    name: int(description)
+                    for name, description in partitions
+                    if description != 'MAXVALUE'
+                }
+
+                # 删除所有数据均早于保留期的分区（元数据操作，耗时与数据量无关）
+                cutoff_days = today_days - retention_days
+                expired = [name for name, bound in bounds.items() if bound <= cutoff_days]
+                if expired:
+                    await cursor.execute(
+                        f"ALTER TABLE processed_messages DROP PARTITION {', '.join(expired)}"
+                    )
+                    logging.info(f"processed_messages 删除过期分区: {', '.join(expired)}")
+
+                # 从 pmax 拆分出今天及未来 precreate_days 天的分区
+                # （迁移脚本已按保留期建好日分区，pmax 中没有数据，拆分只改元数据）
+                last_bound = max(bounds.values()) if bounds else today_days
+                target_bound = today_days + precreate_days + 1
+                new_partitions = []
+                for bound in range(max(last_bound, today_days) + 1, target_bound + 1):
+                    name = f"p{_from_days(bound - 1).strftime('%Y%m%d')}"
+                    new_partitions.append(f"PARTITION {name} VALUES LESS THAN ({bound})")
+                if new_partitions:
+                    await cursor.execute(
+                        "ALTER TABLE processed_messages REORGANIZE PARTITION pmax INTO ("
+                        + ", ".join(new_partitions)
+                        + ", PARTITION pmax VALUES LESS THAN MAXVALUE)"
+                    )
+                    logging.info(f"processed_messages 新建 {len(new_partitions)} 个分区")
+    except Exception as e:
+        logging.error(f"维护 processed_messages 分区时发生错误: {e}")
+
+async def run_partition_maintenance():
+    """独立于采集周期的分区维护任务"""
+    collect_config = config["task"]["collect"]
+    retention_days = collect_config.get("retention_days", 7)
+    precreate_days = collect_config.get("partition_precreate_days", 3)
+    interval_minutes = collect_config.get("partition_maintenance_minutes", 60)
+
+    while not shutdown_requested:
+        await maintain_processed_partitions(retention_days, precreate_days)
+        await asyncio.sleep(interval_minutes * 60)
+
+async def save_scrape_run(run):
+    """将采集运行及各频道统计写入 scrape_runs 表"""
+    try:
+        rows = [run.to_row()] + [child.to_row() for child in run.channels]
+        async with MySQLConnectionManager() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.executemany("""
+                    INSERT INTO scrape_runs (
+                        run_id, channel, status, error, started_at, finished_at, duration_ms,
+                        total_messages, duplicate_messages, new_messages, blocked_tags_removed,
+                        bytes_downloaded, bytes_uploaded,
+                        telegram_ms, image_ms, upload_ms, db_ms
+                    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, rows)
+    except Exception as e:
+        logging.error(f"保存采集运行记录时发生错误: {e}")
+
 def get_image_directory(date_str):
     """生成图片保存目录，从配置文件读取根路径"""
     directory = os.path.join(config["image"]["upload_dir"], date_str)
@@ -211,13 +468,24 @@ async def compress_image(input_path, output_path):
         except AttributeError:
             resample_filter = Image.LANCZOS
 
+        with run_stage("image", metrics.IMAGE_COMPRESS_SECONDS):
+            return _compress_image_file(
+                input_path, output_path, int(compression_quality), compression_format, resample_filter
+            )
+
+    except Exception as e:
+        logging.error(f"❌ 压缩图片时出错: {e}")
+        return None
+
+def _compress_image_file(input_path, output_path, quality, compression_format, resample_filter):
+    """压缩图片文件（同步执行 Pillow 处理）"""
+    try:
         img = Image.open(input_path)
         original_size_bytes = os.path.getsize(input_path)
         max_size = (1024, 1024)
         img.thumbnail(max_size, resample_filter)
 
         # 保存压缩图像
-        quality = int(compression_quality)
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
 
         if compression_format == "webp":
@@ -308,7 +576,7 @@ async def mark_verification_completed():
 
 async def upload_image(image_path):
     """上传图片到图床"""
-    async with semaphore:
+    async with get_upload_semaphore():
         try:
             # 从数据库动态获取tgState配置
             tgstate_port = await get_tgstate_config('tgstate_port') or '8088'
@@ -325,36 +593,39 @@ async def upload_image(image_path):
             tgstate_pass = await get_tgstate_config('tgstate_pass') or 'none'
             cookies = {"p": tgstate_pass} if tgstate_pass != "none" else {}
             
-            # 调试信息
-            logging.info(f"🔍 图片上传调试信息:")
-            logging.info(f"  - tgstate_port: {tgstate_port}")
-            logging.info(f"  - tgstate_url: {tgstate_url}")
-            logging.info(f"  - public_url: {public_url}")
-            logging.info(f"  - container_api_url: {container_api_url}")
-            logging.info(f"  - base_url: {base_url}")
-            logging.info(f"  - tgstate_pass: {'已配置' if tgstate_pass != 'none' else '未配置'}")
-            logging.info(f"  - cookies: {cookies}")
+            # 调试信息（不输出访问密码）
+            logging.debug(
+                f"🔍 图片上传: api={container_api_url}, base_url={base_url}, "
+                f"tgstate_pass={'已配置' if tgstate_pass != 'none' else '未配置'}"
+            )
             
-            async with aiohttp.ClientSession(cookies=cookies) as session:
-                with open(image_path, "rb") as file:
-                    form_data = aiohttp.FormData()
-                    form_data.add_field("image", file, filename=os.path.basename(image_path))
-                    async with session.post(container_api_url, data=form_data) as response:
-                        logging.info(f"📡 图片上传响应状态: {response.status}")
-                        result = await response.json()
-                        logging.info(f"📡 图片上传响应内容: {result}")
-                        if result.get("code") == 1:
-                            # 使用public_url构建返回地址
-                            img_path = result.get('message', '')
-                            if img_path.startswith('/'):
-                                img_path = img_path[1:]  # 移除开头的斜杠
-                            image_url = f"{base_url}/{img_path}"
-                            os.remove(image_path)
-                            logging.info(f"图片上传成功并删除本地文件: {image_url}")
-                            return image_url
-                        else:
-                            logging.error(f"图片上传失败: {result.get('message')}")
-                            return None
+            upload_size = os.path.getsize(image_path)
+            with run_stage("upload", metrics.IMAGE_UPLOAD_SECONDS):
+                async with aiohttp.ClientSession(cookies=cookies) as session:
+                    with open(image_path, "rb") as file:
+                        form_data = aiohttp.FormData()
+                        form_data.add_field("image", file, filename=os.path.basename(image_path))
+                        async with session.post(container_api_url, data=form_data) as response:
+                            result = await response.json()
+                            logging.debug(f"📡 图片上传响应: {response.status} {result}")
+
+            metrics.IMAGE_BYTES.inc("uploaded", amount=upload_size)
+            run = current_run.get()
+            if run is not None:
+                run.add_bytes("uploaded", upload_size)
+
+            if result.get("code") == 1:
+                # 使用public_url构建返回地址
+                img_path = result.get('message', '')
+                if img_path.startswith('/'):
+                    img_path = img_path[1:]  # 移除开头的斜杠
+                image_url = f"{base_url}/{img_path}"
+                os.remove(image_path)
+                logging.info(f"图片上传成功并删除本地文件: {image_url}")
+                return image_url
+            else:
+                logging.error(f"图片上传失败: {result.get('message')}")
+                return None
         except Exception as e:
             logging.error(f"上传图片时发生错误: {e}")
             return None
@@ -364,11 +635,18 @@ async def download_image_from_message(message, date_str):
     try:
         if message.media and hasattr(message.media, 'photo'):
             directory = get_image_directory(date_str)
-            local_path = await client.download_media(message, directory)
-            if not os.path.exists(local_path):
+            with run_stage("telegram", metrics.IMAGE_DOWNLOAD_SECONDS):
+                local_path = await client.download_media(message, directory)
+            if not local_path or not os.path.exists(local_path):
                 logging.error(f"文件不存在: {local_path}")
                 return None
             
+            download_size = os.path.getsize(local_path)
+            metrics.IMAGE_BYTES.inc("downloaded", amount=download_size)
+            run = current_run.get()
+            if run is not None:
+                run.add_bytes("downloaded", download_size)
+            
             # 动态获取压缩格式
             compression_format = await get_tgstate_config('image_compression_format') or 'webp'
             compressed_path = local_path.replace(".jpg", f"_compressed.{compression_format}")
@@ -464,7 +742,11 @@ async def check_session_validity(session_file, api_id, api_hash):
         return False
 
 async def init_telegram_client():
-    """初始化并登录 Telegram 客户端"""
+    """初始化并登录 Telegram 客户端（并发调用时排队，避免重复登录）"""
+    async with get_client_lock():
+        return await _init_telegram_client()
+
+async def _init_telegram_client():
     global client
     
     try:
@@ -582,8 +864,24 @@ async def init_telegram_client():
         logging.error(f"❌ 初始化Telegram客户端失败: {e}")
         raise
 
-async def scrape_channel():
-    """抓取 Telegram 频道消息"""
+async def scrape_channel(channels=None, limit=None, progress=None):
+    """抓取 Telegram 频道消息
+
+    Args:
+        channels: 指定采集的频道列表（URL/@/ID），默认读取 scrape_channels 配置
+        limit: 指定每个频道的采集数量，默认读取 scrape_limit 配置
+        progress: 进度回调，接收当前统计快照
+
+    Returns:
+        本次采集的统计信息
+    """
+    lock = get_scrape_lock()
+    if lock.locked():
+        logging.info("⏳ 已有采集在运行，等待其完成后开始")
+    async with lock:
+        return await _scrape_channel(channels, limit, progress)
+
+async def _scrape_channel(channels, limit, progress):
     global client
     
     # 确保 Telegram 客户端已初始化和登录
@@ -591,44 +889,51 @@ async def scrape_channel():
         logging.info("🔄 Telegram客户端未连接，开始初始化和登录...")
         await init_telegram_client()
     
+    run = ScrapeRunStats(uuid.uuid4().hex)
+    stats = run.counts
+    run_token = current_run.set(None)
+    
     try:
         logging.info("Telegram 客户端启动成功")
         collect_start_time = datetime.now()
-        stats = {"total": 0, "duplicate": 0, "new": 0, "blocked_tags_removed": 0}
 
         blocked_tags = set(config["task"]["collect"]["blocked_tags"])
-        retention_days = config["task"]["collect"].get("retention_days", 7)
         default_limit = config["task"]["collect"].get("default_limit", 25)
-        await clean_processed_messages(retention_days)
 
-        # 从数据库获取频道配置
-        channels_config = await get_config_from_db("scrape_channels") or ""
-        scrape_limit = int(await get_config_from_db("scrape_limit") or config["task"]["collect"]["default_limit"])
+        # 从数据库获取频道配置（可由调用方覆盖）
+        if channels is None:
+            channels_config = await get_config_from_db("scrape_channels") or ""
+            channels = channels_config.strip().split('\n') if channels_config else []
+        if limit is None:
+            limit = await get_config_from_db("scrape_limit") or config["task"]["collect"]["default_limit"]
+        scrape_limit = int(limit)
         
         # 解析频道配置
         channel_urls = []
-        if channels_config:
-            for line in channels_config.strip().split('\n'):
-                normalized = normalize_channel(line)
-                if normalized:
-                    normalized["limit"] = scrape_limit
-                    channel_urls.append(normalized)
+        for line in channels:
+            normalized = normalize_channel(str(line))
+            if normalized:
+                normalized["limit"] = scrape_limit
+                channel_urls.append(normalized)
         
         if not channel_urls:
             logging.error("❌ 未配置采集频道，请在后台管理页面配置scrape_channels参数")
-            return
+            return stats
         
         logging.info(f"✅ 已配置 {len(channel_urls)} 个采集频道")
         
         for channel_config in channel_urls:
             limit = channel_config.get("limit", default_limit)
+            channel_run = run.start_channel(channel_config.get("url") or channel_config.get("id"))
+            current_run.set(channel_run)
             
             # 支持频道URL和频道ID两种方式
             if "url" in channel_config:
                 channel_url = channel_config["url"]
                 logging.info(f"开始抓取频道: {channel_url} (limit={limit})")
                 try:
-                    channel = await client.get_entity(channel_url)
+                    with run_stage("telegram"):
+                        channel = await client.get_entity(channel_url)
                     channel_id = channel.id
                 except Exception as e:
                     logging.error(f"获取频道实体失败: {e}")
@@ -652,7 +957,8 @@ async def scrape_channel():
                         # 已经是整数，使用PeerChannel
                         entity_id = PeerChannel(channel_id)
                     
-                    channel = await client.get_entity(entity_id)
+                    with run_stage("telegram"):
+                        channel = await client.get_entity(entity_id)
                     channel_id = channel.id
                 except Exception as e:
                     logging.error(f"获取频道实体失败: {e}")
@@ -661,10 +967,12 @@ async def scrape_channel():
                 logging.error("频道配置必须包含 'url' 或 'id' 字段")
                 continue
 
-            async for message in client.iter_messages(channel, limit=limit):
-                stats["total"] += 1
+            async for message in timed_messages(client.iter_messages(channel, limit=limit)):
+                channel_run.count("total")
+                metrics.MESSAGES_FETCHED.inc(channel_run.channel)
                 if await is_message_processed(channel_id, message.id):
-                    stats["duplicate"] += 1
+                    channel_run.count("duplicate")
+                    metrics.MESSAGES_DUPLICATE.inc(channel_run.channel)
                     continue
 
                 title, content, tags, sort_id = await parse_log(message)
@@ -673,7 +981,7 @@ async def scrape_channel():
                 blocked_in_message = message_tags & blocked_tags
                 if blocked_in_message:
                     filtered_tags = [tag for tag in tags if tag not in blocked_tags]
-                    stats["blocked_tags_removed"] += len(blocked_in_message)
+                    channel_run.count("blocked_tags_removed", len(blocked_in_message))
                     logging.info(f"从消息中移除屏蔽标签: {blocked_in_message}, 剩余标签: {filtered_tags}, title={title}")
                     tags = filtered_tags
                 else:
@@ -684,43 +992,73 @@ async def scrape_channel():
                 if image_url:
                     content = f"{image_url}\n\n{content}"
 
-                await save_message(title, content, filtered_tags, sort_id, image_url)
-                stats["new"] += 1
+                if await save_message(title, content, filtered_tags, sort_id, image_url) is None:
+                    # 未标记为已处理，下次采集重试
+                    continue
+                channel_run.count("new")
+                metrics.MESSAGES_INGESTED.inc(channel_run.channel)
                 await mark_message_processed(channel_id, message.id)
+                if progress:
+                    progress(dict(stats, channel=channel_id))
 
         elapsed_time = datetime.now() - collect_start_time
         logging.info(f"本次采集完成，耗时: {elapsed_time}, 总消息数={stats['total']}, 重复={stats['duplicate']}, 新增={stats['new']}, 移除屏蔽标签数={stats['blocked_tags_removed']}")
         next_run = datetime.now() + timedelta(minutes=config["task"]["collect"]["interval_minutes"])
         logging.info(f"下次采集时间: {next_run.strftime('%Y-%m-%d %H:%M:%S')}")
+        if progress:
+            progress(dict(stats, finished=True))
     except Exception as e:
         logging.error(f"抓取频道消息时发生错误: {e}")
+        run.error = str(e)
+    finally:
+        current_run.reset(run_token)
+    
+    run.finish(run.error)
+    await save_scrape_run(run)
+    return stats
 
-async def run_periodic_scraper():
+async def timed_messages(messages):
+    """迭代 Telegram 消息，并将等待消息的耗时计入 telegram 阶段"""
+    iterator = messages.__aiter__()
+    while True:
+        with run_stage("telegram"):
+            try:
+                message = await iterator.__anext__()
+            except StopAsyncIteration:
+                return
+        yield message
+
+async def run_periodic_scraper(progress=None):
     """定时抓取任务"""
     global shutdown_requested
     interval_minutes = config["task"]["collect"]["interval_minutes"]
     
-    while not shutdown_requested:
-        try:
-            await scrape_channel()
-            
-            # 可中断的等待
-            wait_seconds = interval_minutes * 60
-            for _ in range(wait_seconds):
-                if shutdown_requested:
-                    logging.info("收到退出请求，停止等待")
-                    break
-                await asyncio.sleep(1)
+    # 分区维护与采集周期解耦，单独运行
+    maintenance_task = asyncio.create_task(run_partition_maintenance())
+    
+    try:
+        while not shutdown_requested:
+            try:
+                await scrape_channel(progress=progress)
                 
-        except Exception as e:
-            logging.error(f"采集中出现错误: {e}")
-            if not shutdown_requested:
-                logging.info(f"错误后等待 {interval_minutes} 分钟后重试...")
-                await asyncio.sleep(interval_minutes * 60)
-
-def get_code_input():
-    """获取验证码输入的交互函数"""
-    import time
+                # 可中断的等待
+                wait_seconds = interval_minutes * 60
+                for _ in range(wait_seconds):
+                    if shutdown_requested:
+                        logging.info("收到退出请求，停止等待")
+                        break
+                    await asyncio.sleep(1)
+                    
+            except Exception as e:
+                logging.error(f"采集中出现错误: {e}")
+                if not shutdown_requested:
+                    logging.info(f"错误后等待 {interval_minutes} 分钟后重试...")
+                    await asyncio.sleep(interval_minutes * 60)
+    finally:
+        maintenance_task.cancel()
+
+async def get_code_input():
+    """获取验证码输入的交互函数（Telethon 会 await 协程回调；数据库读写放到线程中，等待期间不阻塞常驻事件循环）"""
     import pymysql
     
     print("\n" + "="*50)
@@ -739,8 +1077,7 @@ def get_code_input():
         'charset': 'utf8mb4'
     }
     
-    # 标记需要验证码
-    try:
+    def mark_required():
         conn = pymysql.connect(**DB_CONFIG)
         cursor = conn.cursor()
         
@@ -770,9 +1107,40 @@ def get_code_input():
         
         conn.commit()
         conn.close()
+    
+    def read_code():
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
         
-        logging.info("✅ 已在数据库中标记需要验证码")
+        # 检查是否有验证码
+        cursor.execute("""
+            SELECT config_value FROM system_config 
+            WHERE config_key = 'telegram_verification_code'
+        """)
+        result = cursor.fetchone()
         
+        # 检查是否已提交
+        cursor.execute("""
+            SELECT config_value FROM system_config 
+            WHERE config_key = 'telegram_verification_submitted'
+        """)
+        submitted_result = cursor.fetchone()
+        
+        conn.close()
+        return result, submitted_result
+    
+    def clear_state():
+        conn = pymysql.connect(**DB_CONFIG)
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM system_config WHERE config_key = 'telegram_verification_required'")
+        cursor.execute("DELETE FROM system_config WHERE config_key = 'telegram_verification_submitted'")
+        conn.commit()
+        conn.close()
+    
+    # 标记需要验证码
+    try:
+        await asyncio.to_thread(mark_required)
+        logging.info("✅ 已在数据库中标记需要验证码")
     except Exception as e:
         logging.error(f"❌ 数据库操作失败: {e}")
     
@@ -783,24 +1151,7 @@ def get_code_input():
     
     while waited_time < max_wait_time:
         try:
-            conn = pymysql.connect(**DB_CONFIG)
-            cursor = conn.cursor()
-            
-            # 检查是否有验证码
-            cursor.execute("""
-                SELECT config_value FROM system_config 
-                WHERE config_key = 'telegram_verification_code'
-            """)
-            result = cursor.fetchone()
-            
-            # 检查是否已提交
-            cursor.execute("""
-                SELECT config_value FROM system_config 
-                WHERE config_key = 'telegram_verification_submitted'
-            """)
-            submitted_result = cursor.fetchone()
-            
-            conn.close()
+            result, submitted_result = await asyncio.to_thread(read_code)
             
             if submitted_result and submitted_result[0] == 'true' and result and result[0].strip():
                 verification_code = result[0].strip()
@@ -811,12 +1162,7 @@ def get_code_input():
                     
                     # 清除验证状态
                     try:
-                        conn = pymysql.connect(**DB_CONFIG)
-                        cursor = conn.cursor()
-                        cursor.execute("DELETE FROM system_config WHERE config_key = 'telegram_verification_required'")
-                        cursor.execute("DELETE FROM system_config WHERE config_key = 'telegram_verification_submitted'")
-                        conn.commit()
-                        conn.close()
+                        await asyncio.to_thread(clear_state)
                     except:
                         pass
                     
@@ -825,12 +1171,12 @@ def get_code_input():
                     print(f"❌ 验证码格式错误: {verification_code}")
             
             print(f"⏳ 等待验证码输入... ({waited_time}s/{max_wait_time}s)")
-            time.sleep(check_interval)
+            await asyncio.sleep(check_interval)
             waited_time += check_interval
             
         except Exception as e:
             logging.error(f"❌ 检查验证码时发生错误: {e}")
-            time.sleep(check_interval)
+            await asyncio.sleep(check_interval)
             waited_time += check_interval
     
     # 超时处理
@@ -10,37 +10,105 @@ import sys
 import json
 import time
 import signal
+import uuid
 import argparse
 import asyncio
 import logging
+import threading
+import concurrent.futures
+from collections import OrderedDict
 from datetime import datetime
-from flask import Flask, request, jsonify
-from typing import Dict, Any
+from flask import Flask, Response, request, jsonify
+from typing import Dict, Any, Optional
 
-# 设置日志格式
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+import log_setup
+import metrics
+
+# 设置日志格式（非阻塞队列输出；导入 scrape 模块后会按 config.yaml 重新配置）
+log_setup.setup_logging()
 
 # 创建logger
 logger = logging.getLogger('scraper')
 
 app = Flask(__name__)
 
+class AsyncRuntime:
+    """进程内常驻事件循环，Telegram 客户端和 MySQL 连接池都归属于该循环"""
+    
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name='scraper-runtime', daemon=True)
+    
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+    
+    def start(self):
+        """启动事件循环线程"""
+        self.thread.start()
+    
+    def submit(self, coro) -> concurrent.futures.Future:
+        """从任意线程提交协程到常驻循环"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+    
+    def call_soon(self, callback, *args):
+        """从任意线程在常驻循环中执行回调"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+class ScrapeJob:
+    """采集作业"""
+    
+    TYPES = ('periodic', 'scrape', 'backfill')
+    
+    def __init__(self, job_id: str, job_type: str, params: Dict[str, Any]):
+        self.id = job_id
+        self.type = job_type
+        self.params = params
+        self.status = 'pending'
+        self.progress: Dict[str, Any] = {}
+        self.cycles = 0
+        self.error = None
+        self.created_at = datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.task: Optional[asyncio.Task] = None
+    
+    @property
+    def is_active(self) -> bool:
+        return self.status in ('pending', 'running')
+    
+    def to_dict(self) -> Dict[str, Any]:
+        def fmt(value):
+            return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+        
+        return {
+            'id': self.id,
+            'type': self.type,
+            'params': self.params,
+            'status': self.status,
+            'progress': self.progress,
+            'cycles': self.cycles,
+            'error': self.error,
+            'created_at': fmt(self.created_at),
+            'started_at': fmt(self.started_at),
+            'finished_at': fmt(self.finished_at)
+        }
+
 class ScraperService:
     """采集服务"""
     
+    # 保留的已结束作业数量
+    MAX_FINISHED_JOBS = 50
+    
     def __init__(self, config: Dict[str, Any]):
         self.config = config
         self.pid = os.getpid()
         self.start_time = datetime.now()
-        self.is_scraping = False
         self.last_scrape_time = None
         self.scrape_count = 0
+        self.jobs: Dict[str, ScrapeJob] = OrderedDict()
+        self.jobs_lock = threading.Lock()
+        self.runtime = AsyncRuntime()
         
         # 导入采集相关模块
         try:
@@ -53,6 +121,14 @@ class ScraperService:
         except ImportError as e:
             logger.error(f"❌ 采集模块导入失败: {e}")
             self.scrape_module = None
+        
+        self.runtime.start()
+        self._init_metrics()
+    
+    @property
+    def is_scraping(self) -> bool:
+        with self.jobs_lock:
+            return any(job.is_active for job in self.jobs.values())
     
     def get_status(self) -> Dict[str, Any]:
         """获取服务状态"""
@@ -88,128 +164,216 @@ class ScraperService:
             }
         }
     
-    async def start_scraping(self) -> Dict[str, Any]:
-        """开始采集任务"""
-        try:
-            if self.is_scraping:
-                return {
-                    'success': False,
-                    'message': '采集任务已在运行中'
-                }
-            
-            if not self.scrape_module:
-                return {
-                    'success': False,
-                    'message': '采集模块未正确加载'
-                }
-            
-            self.is_scraping = True
-            logger.info("🚀 开始采集任务...")
-            
-            # 初始化数据库连接
-            await self.scrape_module.init_mysql_pool()
-            
-            # 初始化并登录 Telegram 客户端
-            logger.info("🔐 初始化 Telegram 客户端...")
-            await self.scrape_module.init_telegram_client()
-            logger.info("✅ Telegram 客户端初始化成功")
-            
-            # 执行采集任务
-            await self.scrape_module.scrape_channel()
+    def _init_metrics(self):
+        """挂载运行指标采集（事件循环延迟监控运行在常驻循环中）"""
+        metrics.install_flood_wait_hook()
+        metrics.QUEUE_DEPTH.set_function(self._queue_depths)
+        self.runtime.submit(metrics.monitor_event_loop_lag())
+    
+    def _queue_depths(self) -> Dict[tuple, int]:
+        """渲染 /metrics 时读取各队列长度"""
+        with self.jobs_lock:
+            statuses = [job.status for job in self.jobs.values()]
+        depths = {
+            ('jobs_pending',): statuses.count('pending'),
+            ('jobs_running',): statuses.count('running')
+        }
+        
+        if self.scrape_module:
+            semaphore = self.scrape_module.semaphore
+            waiters = getattr(semaphore, '_waiters', None) if semaphore else None
+            depths[('upload_waiters',)] = len(waiters) if waiters else 0
             
+            pool = self.scrape_module.mysql_pool
+            if pool is not None:
+                depths[('mysql_pool_in_use',)] = pool.size - pool.freesize
+                depths[('mysql_pool_free',)] = pool.freesize
+        
+        return depths
+    
+    async def ensure_ready(self):
+        """确保连接池和 Telegram 客户端就绪（已就绪时直接复用）"""
+        await self.scrape_module.init_mysql_pool()
+        await self.scrape_module.init_telegram_client()
+    
+    def _on_progress(self, job: ScrapeJob, stats: Dict[str, Any]):
+        """采集进度回调（在常驻循环中执行）"""
+        job.progress = stats
+        if stats.get('finished'):
+            job.cycles += 1
             self.last_scrape_time = datetime.now()
             self.scrape_count += 1
+    
+    async def _run_job(self, job: ScrapeJob):
+        """在常驻循环中执行作业"""
+        job.task = asyncio.current_task()
+        job.status = 'running'
+        job.started_at = datetime.now()
+        progress = lambda stats: self._on_progress(job, stats)
+        
+        try:
+            await self.ensure_ready()
             
-            # 启动定时采集任务
-            logger.info("🔄 启动定时采集任务...")
-            await self.scrape_module.run_periodic_scraper()
-            
-            logger.info("✅ 采集任务完成")
+            if job.type == 'periodic':
+                await self.scrape_module.run_periodic_scraper(progress=progress)
+            elif job.type == 'backfill':
+                await self.scrape_module.scrape_channel(
+                    channels=[job.params['channel']],
+                    limit=job.params['limit'],
+                    progress=progress
+                )
+            else:
+                await self.scrape_module.scrape_channel(progress=progress)
             
+            job.status = 'completed'
+            logger.info(f"✅ 采集作业完成: {job.id} ({job.type})")
+        except asyncio.CancelledError:
+            job.status = 'cancelled'
+            logger.info(f"🛑 采集作业已取消: {job.id} ({job.type})")
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            logger.error(f"❌ 采集作业失败: {job.id} ({job.type}): {e}")
+        finally:
+            job.finished_at = datetime.now()
+            job.task = None
+    
+    def _prune_jobs(self):
+        """清理过多的已结束作业（调用方持有 jobs_lock）"""
+        finished = [job_id for job_id, job in self.jobs.items() if not job.is_active]
+        for job_id in finished[:max(0, len(finished) - self.MAX_FINISHED_JOBS)]:
+            del self.jobs[job_id]
+    
+    def submit_job(self, job_type: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """提交采集作业"""
+        if not self.scrape_module:
             return {
-                'success': True,
-                'message': '采集任务完成',
-                'scrape_time': self.last_scrape_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'scrape_count': self.scrape_count
+                'success': False,
+                'message': '采集模块未正确加载'
             }
-            
-        except Exception as e:
-            logger.error(f"❌ 采集任务失败: {e}")
+        
+        if job_type not in ScrapeJob.TYPES:
             return {
                 'success': False,
-                'message': f'采集任务失败: {str(e)}'
+                'message': f'未知的作业类型: {job_type}'
             }
-        finally:
-            self.is_scraping = False
-    
-    async def init_telegram_only(self) -> Dict[str, Any]:
-        """初始化Telegram客户端并自动开始采集任务"""
-        try:
-            if not self.scrape_module:
+        
+        params = params or {}
+        if job_type == 'backfill':
+            if not params.get('channel'):
                 return {
                     'success': False,
-                    'message': '采集模块未正确加载'
+                    'message': '回填作业需要指定 channel'
                 }
+            params = {'channel': params['channel'], 'limit': int(params.get('limit', 200))}
+        
+        with self.jobs_lock:
+            # 定时采集作业全局只允许一个
+            if job_type == 'periodic':
+                for job in self.jobs.values():
+                    if job.type == 'periodic' and job.is_active:
+                        return {
+                            'success': False,
+                            'message': '采集任务已在运行中',
+                            'job': job.to_dict()
+                        }
             
-            logger.info("🔐 开始初始化Telegram客户端...")
-            
-            # 初始化数据库连接
-            await self.scrape_module.init_mysql_pool()
-            
-            # 初始化并登录 Telegram 客户端
-            await self.scrape_module.init_telegram_client()
-            logger.info("✅ Telegram 客户端初始化成功")
-            
-            # 初始化完成后自动开始采集任务
-            logger.info("🚀 开始执行采集任务...")
-            await self.scrape_module.scrape_channel()
-            
-            # 启动定时采集任务
-            logger.info("🔄 启动定时采集任务...")
-            await self.scrape_module.run_periodic_scraper()
-            
-            self.last_scrape_time = datetime.now()
-            self.scrape_count += 1
-            
-            logger.info("✅ 采集任务完成")
-            
+            job = ScrapeJob(uuid.uuid4().hex[:12], job_type, params)
+            self.jobs[job.id] = job
+            self._prune_jobs()
+        
+        self.runtime.submit(self._run_job(job))
+        logger.info(f"📥 已提交采集作业: {job.id} ({job_type})")
+        
+        return {
+            'success': True,
+            'message': '采集作业已提交',
+            'job': job.to_dict()
+        }
+    
+    def list_jobs(self) -> Dict[str, Any]:
+        """列出采集作业"""
+        with self.jobs_lock:
+            jobs = [job.to_dict() for job in reversed(self.jobs.values())]
+        
+        return {
+            'success': True,
+            'data': jobs
+        }
+    
+    def get_job(self, job_id: str) -> Optional[ScrapeJob]:
+        """获取采集作业"""
+        with self.jobs_lock:
+            return self.jobs.get(job_id)
+    
+    def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """取消采集作业"""
+        job = self.get_job(job_id)
+        if not job:
             return {
-                'success': True,
-                'message': 'Telegram客户端初始化成功，采集任务已开始',
-                'scrape_time': self.last_scrape_time.strftime('%Y-%m-%d %H:%M:%S'),
-                'scrape_count': self.scrape_count
+                'success': False,
+                'message': '作业不存在'
             }
-            
-        except Exception as e:
-            logger.error(f"❌ Telegram客户端初始化失败: {e}")
+        
+        if not job.is_active:
             return {
                 'success': False,
-                'message': f'Telegram客户端初始化失败: {str(e)}'
+                'message': f'作业已结束: {job.status}'
             }
-
+        
+        def cancel():
+            if job.task:
+                job.task.cancel()
+        
+        self.runtime.call_soon(cancel)
+        logger.info(f"🛑 正在取消采集作业: {job.id}")
+        
+        return {
+            'success': True,
+            'message': '作业取消请求已发送',
+            'job': job.to_dict()
+        }
+    
     def stop_scraping(self) -> Dict[str, Any]:
-        """停止采集任务"""
-        try:
-            if not self.is_scraping:
-                return {
-                    'success': False,
-                    'message': '采集任务未运行'
-                }
-            
-            self.is_scraping = False
-            logger.info("🛑 采集任务已停止")
-            
-            return {
-                'success': True,
-                'message': '采集任务已停止'
-            }
-            
-        except Exception as e:
-            logger.error(f"❌ 停止采集任务失败: {e}")
+        """停止采集任务（取消所有运行中的作业）"""
+        with self.jobs_lock:
+            active = [job.id for job in self.jobs.values() if job.is_active]
+        
+        if not active:
             return {
                 'success': False,
-                'message': f'停止采集任务失败: {str(e)}'
+                'message': '采集任务未运行'
             }
+        
+        for job_id in active:
+            self.cancel_job(job_id)
+        
+        logger.info("🛑 采集任务已停止")
+        return {
+            'success': True,
+            'message': '采集任务已停止'
+        }
+    
+    async def _shutdown(self):
+        """取消作业并释放客户端和连接池"""
+        with self.jobs_lock:
+            tasks = [job.task for job in self.jobs.values() if job.task]
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        
+        if self.scrape_module:
+            if self.scrape_module.client:
+                await self.scrape_module.client.disconnect()
+            await self.scrape_module.close_mysql_pool()
+    
+    def shutdown(self, timeout: float = 10):
+        """关闭常驻循环中的资源"""
+        try:
+            self.runtime.submit(self._shutdown()).result(timeout)
+        except Exception as e:
+            logger.error(f"❌ 关闭采集资源时出错: {e}")
 
 # 全局采集服务实例
 scraper_service = None
@@ -238,7 +402,7 @@ def handle_config():
 
 @app.route('/api/telegram/init', methods=['POST'])
 def handle_telegram_init():
-    """处理Telegram客户端初始化请求"""
+    """处理Telegram客户端初始化请求（初始化后自动开始定时采集）"""
     logger.info("🔐 收到Telegram客户端初始化请求")
     
     if not scraper_service:
@@ -248,51 +412,18 @@ def handle_telegram_init():
             'message': '采集服务未初始化'
         })
     
-    # 在后台线程中运行异步Telegram初始化
-    import threading
-    
-    def run_telegram_init():
-        logger.info("🔄 Telegram初始化线程启动")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            logger.info("⏳ 开始初始化Telegram客户端...")
-            # 只初始化Telegram客户端，不执行采集任务
-            result = loop.run_until_complete(scraper_service.init_telegram_only())
-            logger.info(f"✅ Telegram初始化结果: {result}")
-        except Exception as e:
-            logger.error(f"❌ Telegram初始化异常: {e}")
-            import traceback
-            logger.error(f"异常堆栈: {traceback.format_exc()}")
-        finally:
-            # 安全关闭事件循环
-            try:
-                # 取消所有待处理的任务
-                pending = asyncio.all_tasks(loop)
-                for task in pending:
-                    task.cancel()
-                
-                # 等待所有任务完成
-                if pending:
-                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-                
-                loop.close()
-                logger.info("🔄 Telegram初始化线程结束")
-            except Exception as cleanup_error:
-                logger.error(f"❌ 清理事件循环时出错: {cleanup_error}")
-                try:
-                    loop.close()
-                except:
-                    pass
-    
-    thread = threading.Thread(target=run_telegram_init)
-    thread.daemon = True
-    thread.start()
+    # 定时采集作业会先复用或初始化 Telegram 客户端
+    result = scraper_service.submit_job('periodic')
+    if not result['success'] and 'job' in result:
+        result = {
+            'success': True,
+            'message': 'Telegram客户端已就绪，采集任务已在运行中',
+            'job': result['job']
+        }
+    elif result['success']:
+        result['message'] = 'Telegram客户端初始化已启动，请查看日志了解进度'
     
-    return jsonify({
-        'success': True,
-        'message': 'Telegram客户端初始化已启动，请查看日志了解进度'
-    })
+    return jsonify(result)
 
 @app.route('/api/scraper/start', methods=['POST'])
 def handle_start_scraping():
@@ -306,54 +437,63 @@ def handle_start_scraping():
             'message': '采集服务未初始化'
         })
     
-    logger.info("✅ 采集服务已初始化，准备启动采集任务")
+    result = scraper_service.submit_job('periodic')
+    if result['success']:
+        result['message'] = '采集任务已启动，请查看日志了解进度'
     
-    # 在后台线程中运行异步采集任务
-    import threading
+    return jsonify(result)
+
+@app.route('/api/scraper/jobs', methods=['GET', 'POST'])
+def handle_jobs():
+    """列出或提交采集作业
+
+    POST 参数: {"type": "scrape" | "backfill" | "periodic", "channel": "...", "limit": 200}
+    """
+    if not scraper_service:
+        return jsonify({
+            'success': False,
+            'message': '采集服务未初始化'
+        })
     
-    def run_scraping():
-        logger.info("🔄 采集线程启动")
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        try:
-            logger.info("⏳ 开始执行采集任务...")
-            result = loop.run_until_complete(scraper_service.start_scraping())
-            logger.info(f"✅ 采集任务结果: {result}")
-        except Exception as e:
-            logger.error(f"❌ 采集任务异常: {e}")
-            import traceback
-            logger.error(f"异常堆栈: {traceback.format_exc()}")
-        finally:
-            # 安全关闭事件循环
-            try:
-                # 取消所有待处理的任务
-                pending = asyncio.all_tasks(loop)
-                for task in pending:
-                    task.cancel()
-                
-                # 等待所有任务完成
-                if pending:
-                    loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
-                
-                loop.close()
-                logger.info("🔄 采集线程结束")
-            except Exception as cleanup_error:
-                logger.error(f"❌ 清理事件循环时出错: {cleanup_error}")
-                try:
-                    loop.close()
-                except:
-                    pass
-    
-    thread = threading.Thread(target=run_scraping)
-    thread.daemon = True
-    thread.start()
-    
-    logger.info("✅ 采集任务已在后台线程启动")
+    if request.method == 'GET':
+        return jsonify(scraper_service.list_jobs())
     
-    return jsonify({
-        'success': True,
-        'message': '采集任务已启动，请查看日志了解进度'
-    })
+    data = request.get_json(silent=True) or {}
+    job_type = data.get('type', 'scrape')
+    params = {key: value for key, value in data.items() if key != 'type'}
+    
+    try:
+        result = scraper_service.submit_job(job_type, params)
+    except (TypeError, ValueError) as e:
+        return jsonify({'success': False, 'message': f'作业参数错误: {e}'}), 400
+    
+    return jsonify(result), (200 if result['success'] else 400)
+
+@app.route('/api/scraper/jobs/<job_id>', methods=['GET'])
+def handle_job_detail(job_id):
+    """查询采集作业"""
+    if not scraper_service:
+        return jsonify({
+            'success': False,
+            'message': '采集服务未初始化'
+        })
+    
+    job = scraper_service.get_job(job_id)
+    if not job:
+        return jsonify({'success': False, 'message': '作业不存在'}), 404
+    
+    return jsonify({'success': True, 'data': job.to_dict()})
+
+@app.route('/api/scraper/jobs/<job_id>/cancel', methods=['POST'])
+def handle_job_cancel(job_id):
+    """取消采集作业"""
+    if not scraper_service:
+        return jsonify({
+            'success': False,
+            'message': '采集服务未初始化'
+        })
+    
+    return jsonify(scraper_service.cancel_job(job_id))
 
 @app.route('/api/scraper/stop', methods=['POST'])
 def handle_stop_scraping():
@@ -366,6 +506,11 @@ def handle_stop_scraping():
     
     return jsonify(scraper_service.stop_scraping())
 
+@app.route('/metrics', methods=['GET'])
+def handle_metrics():
+    """Prometheus 指标（在 Flask 线程中渲染快照，不占用采集循环）"""
+    return Response(metrics.REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """健康检查"""
@@ -427,6 +572,8 @@ def index():
 def signal_handler(signum, frame):
     """信号处理器"""
     logger.info("🛑 采集服务正在关闭...")
+    if scraper_service:
+        scraper_service.shutdown()
     sys.exit(0)
 
 def main():
@@ -475,8 +622,8 @@ def main():
     logger.info(f"📡 服务端口: {config['port']}")
     logger.info(f"📱 Telegram配置: API_ID={args.api_id[:4]}***, Phone={args.phone}")
     
-    # 启动Flask应用
-    app.run(host='0.0.0.0', port=int(config['port']), debug=False)
+    # 启动Flask应用（采集作业运行在常驻事件循环中，请求线程只负责提交）
+    app.run(host='0.0.0.0', port=int(config['port']), debug=False, threaded=True)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+标签倒排索引
+
+messages.tags 仍保留逗号分隔的原始标签用于展示；tags 表保存去重后的标签和文章数，
+message_tags 保存标签到文章的映射（冗余文章发布时间，标签页按索引做游标分页）。
+related_articles 保存按标签 Jaccard 相似度预先算好的相关文章，文章入库或标签变化时增量更新；
+文章被移出其他文章的列表时，在同一事务中为这些列表补位（refill_statement / related_replace_statements）。
+这里只生成 SQL 语句，由各服务用自己的数据库驱动执行；
+采集、后台和前台三个服务各放一份相同的文件，修改时请同步
+（services/check_shared_modules.py 检查各份是否一致，deploy.sh 构建镜像前自动执行）。
+"""
+
+# 单个标签最大长度（与 tags.name 一致）
+TAG_MAX_LENGTH = 100
+
+# 每篇文章保存的相关文章数（详情页展示其中前几篇）
+RELATED_LIMIT = 12
+
+# 计算相关文章时每个标签只看最新的这么多篇文章，热门标签不会拖慢写入
+POSTINGS_PER_TAG = 500
+
+# 查询文章当前的索引标签
+CURRENT_TAGS_SQL = """
+    SELECT t.name FROM message_tags mt JOIN tags t ON t.id = mt.tag_id
+    WHERE mt.message_id = %s
+"""
+
+
+def split_tags(tags):
+    """
+    规范化标签：去掉空白和 #，去除空标签，按不区分大小写去重（保留首次出现的写法）
+
+    Args:
+        tags: 逗号分隔的字符串或标签列表
+    """
+    if not tags:
+        return []
+    if isinstance(tags, str):
+        tags = tags.replace('，', ',').split(',')
+
+    names = {}
+    for tag in tags:
+        name = (tag or '').strip().lstrip('#').strip()[:TAG_MAX_LENGTH]
+        if name and name.lower() not in names:
+            names[name.lower()] = name
+    return list(names.values())
+
+
+def _placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def tag_sync_statements(message_id, current_tags, new_tags):
+    """
+    生成把文章的索引标签从 current_tags 更新为 new_tags 的语句（同时维护每个标签的文章数）
+
+    Args:
+        message_id: 文章ID
+        current_tags: 索引中已有的标签（新文章为空）
+        new_tags: 文章现在的标签，传空列表表示删除文章的全部索引
+
+    Returns:
+        [(sql, params), ...]，按顺序在同一事务中执行
+    """
+    current = {name.lower(): name for name in split_tags(current_tags)}
+    new = {name.lower(): name for name in split_tags(new_tags)}
+    added = [name for key, name in new.items() if key not in current]
+    removed = [name for key, name in current.items() if key not in new]
+
+    statements = []
+    if added:
+        statements.append((
+            f"INSERT IGNORE INTO tags (name) VALUES ({'), ('.join(['%s'] * len(added))})",
+            tuple(added)
+        ))
+        statements.append((f"""
+            INSERT IGNORE INTO message_tags (tag_id, message_id, message_created_at)
+            SELECT t.id, m.id, m.created_at FROM tags t JOIN messages m ON m.id = %s
+            WHERE t.name IN ({_placeholders(added)})
+        """, (message_id, *added)))
+        statements.append((
+            f"UPDATE tags SET article_count = article_count + 1 WHERE name IN ({_placeholders(added)})",
+            tuple(added)
+        ))
+    if removed:
+        statements.append((f"""
+            DELETE mt FROM message_tags mt JOIN tags t ON t.id = mt.tag_id
+            WHERE mt.message_id = %s AND t.name IN ({_placeholders(removed)})
+        """, (message_id, *removed)))
+        statements.append((
+            f"UPDATE tags SET article_count = GREATEST(article_count - 1, 0) WHERE name IN ({_placeholders(removed)})",
+            tuple(removed)
+        ))
+    return statements
+
+
+# 候选相关文章：与文章共享标签的其他文章、共享标签数和各自的标签数
+RELATED_CANDIDATES_SQL = f"""
+    SELECT c.related_id, c.common, COUNT(*) AS tag_count
+    FROM (
+        SELECT p.message_id AS related_id, COUNT(*) AS common
+        FROM message_tags own,
+        LATERAL (
+            SELECT mt.message_id FROM message_tags mt
+            WHERE mt.tag_id = own.tag_id
+            ORDER BY mt.message_created_at DESC, mt.message_id DESC
+            LIMIT {POSTINGS_PER_TAG}
+        ) AS p
+        WHERE own.message_id = %s AND p.message_id <> %s
+        GROUP BY p.message_id
+    ) c
+    JOIN message_tags t ON t.message_id = c.related_id
+    GROUP BY c.related_id, c.common
+"""
+
+
+def rank_related(tag_count, candidates, limit=RELATED_LIMIT):
+    """
+    按 Jaccard 相似度排序候选文章（相同分数时新文章在前）
+
+    Args:
+        tag_count: 文章自身的标签数
+        candidates: RELATED_CANDIDATES_SQL 的结果行 (related_id, common, tag_count)
+
+    Returns:
+        [(related_id, score), ...]
+    """
+    scored = [
+        (related_id, common / (tag_count + other_count - common))
+        for related_id, common, other_count in candidates
+        if tag_count + other_count - common > 0
+    ]
+    scored.sort(key=lambda item: (-item[1], -item[0]))
+    return scored[:limit]
+
+
+def related_refresh_statements(message_id, tags, candidates, limit=RELATED_LIMIT):
+    """
+    生成刷新文章相关推荐的语句
+
+    先清掉该文章自己的列表和它在其他文章列表中的旧记录（标签变了，旧分数失效），
+    再写入新的前 limit 篇；相似度是对称的，同时把本文写进这些文章的列表并裁剪到 limit 篇。
+
+    Args:
+        message_id: 文章ID
+        tags: 文章现在的标签，为空表示删除文章（只清理）
+        candidates: RELATED_CANDIDATES_SQL 的结果行
+
+    Returns:
+        [(sql, params), ...]
+    """
+    statements = [
+        ("DELETE FROM related_articles WHERE message_id = %s", (message_id,)),
+        ("DELETE FROM related_articles WHERE related_id = %s", (message_id,)),
+    ]
+    ranked = rank_related(len(split_tags(tags)), candidates, limit) if tags else []
+    if not ranked:
+        return statements
+
+    rows = []
+    for related_id, score in ranked:
+        rows.extend([(message_id, related_id, score), (related_id, message_id, score)])
+    statements.append((
+        f"""INSERT INTO related_articles (message_id, related_id, score)
+            VALUES {', '.join(['(%s, %s, %s)'] * len(rows))}
+            ON DUPLICATE KEY UPDATE score = VALUES(score)""",
+        tuple(value for row in rows for value in row)
+    ))
+    # 被写入的文章各自只保留分数最高的 limit 篇
+    for related_id, _ in ranked:
+        statements.append(("""
+            DELETE r FROM related_articles r
+            JOIN (
+                SELECT related_id FROM related_articles WHERE message_id = %s
+                ORDER BY score DESC, related_id DESC
+                LIMIT 18446744073709551615 OFFSET %s
+            ) extra ON extra.related_id = r.related_id
+            WHERE r.message_id = %s
+        """, (related_id, limit, related_id)))
+    return statements
+
+
+# 列表中包含某篇文章的其他文章（在刷新前查询：刷新会把该文章从这些列表中移除）
+RELATED_REFERRERS_SQL = "SELECT message_id FROM related_articles WHERE related_id = %s"
+
+
+def refill_statement(message_ids, limit=RELATED_LIMIT):
+    """
+    生成查询需要补位的文章的语句：相关列表不足 limit 篇且仍有索引标签的文章
+
+    Args:
+        message_ids: 要检查的文章ID（通常是 RELATED_REFERRERS_SQL 的结果）
+
+    Returns:
+        (sql, params)，结果行为 (message_id, tag_count)；没有要检查的文章时返回 None
+    """
+    if not message_ids:
+        return None
+    return (f"""
+        SELECT mt.message_id, COUNT(*) AS tag_count
+        FROM message_tags mt
+        WHERE mt.message_id IN ({_placeholders(message_ids)})
+        GROUP BY mt.message_id
+        HAVING (SELECT COUNT(*) FROM related_articles r WHERE r.message_id = mt.message_id) < %s
+    """, (*message_ids, limit))
+
+
+def related_replace_statements(message_id, tag_count, candidates, limit=RELATED_LIMIT):
+    """
+    生成重写文章自己的相关列表的语句（补位用，不改动其他文章的列表）
+
+    Args:
+        message_id: 文章ID
+        tag_count: 文章的标签数
+        candidates: RELATED_CANDIDATES_SQL 的结果行
+
+    Returns:
+        [(sql, params), ...]
+    """
+    statements = [("DELETE FROM related_articles WHERE message_id = %s", (message_id,))]
+    ranked = rank_related(tag_count, candidates, limit)
+    if ranked:
+        statements.append((
+            f"""INSERT INTO related_articles (message_id, related_id, score)
+                VALUES {', '.join(['(%s, %s, %s)'] * len(ranked))}""",
+            tuple(value for related_id, score in ranked for value in (message_id, related_id, score))
+        ))
+    return statements
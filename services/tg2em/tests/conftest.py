@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 采集服务的模块以脚本目录为根导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
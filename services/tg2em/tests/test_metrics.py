@@ -0,0 +1,49 @@
+"""采集指标测试"""
+
+import logging
+
+import pytest
+
+import metrics
+
+users = pytest.importorskip('telethon.client.users')
+
+
+class _Request:
+    """代替 Telethon 请求对象，日志只用到类名"""
+
+
+def _flood_wait_total():
+    return (
+        metrics.FLOOD_WAIT_EVENTS._values.get((), 0),
+        metrics.FLOOD_WAIT_SECONDS._values.get((), 0)
+    )
+
+
+@pytest.fixture
+def telethon_logger():
+    logger = logging.getLogger('telethon.client.users')
+    metrics.install_flood_wait_hook()
+    yield logger
+    for handler in list(logger.handlers):
+        if isinstance(handler, metrics.FloodWaitLogHandler):
+            logger.removeHandler(handler)
+
+
+@pytest.mark.parametrize('early', [False, True])
+def test_flood_wait_counted_from_telethon_log(telethon_logger, early):
+    events, seconds = _flood_wait_total()
+
+    # 与 Telethon 自动休眠时的日志调用一致
+    telethon_logger.info(*users._fmt_flood(42, _Request(), early=early))
+
+    assert _flood_wait_total() == (events + 1, seconds + 42)
+
+
+def test_other_logs_ignored(telethon_logger):
+    before = _flood_wait_total()
+
+    telethon_logger.info('Connecting to %s...', '149.154.167.51:443')
+    telethon_logger.info('flood wait without arguments')
+
+    assert _flood_wait_total() == before
@@ -0,0 +1,22 @@
+-- 为已有部署添加文章点击统计字段和点击日志表
+-- 点击数先累加在 Redis 中，由前端后台线程定期合并到 messages.click_count
+
+USE `tg2em`;
+
+ALTER TABLE `messages`
+  ADD COLUMN `click_count` int(11) NOT NULL DEFAULT 0 COMMENT '点击次数（由前端定期从 Redis 合并）' AFTER `is_deleted`,
+  ADD COLUMN `last_clicked_at` datetime DEFAULT NULL COMMENT '最后点击时间' AFTER `click_count`,
+  ADD KEY `idx_click_count` (`click_count`);
+
+CREATE TABLE IF NOT EXISTS `article_click_logs` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `article_id` int(11) NOT NULL COMMENT '文章ID',
+  `visitor_ip` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '访问者IP',
+  `user_agent` text COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '用户代理',
+  `referrer` text COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '来源页面',
+  `session_id` varchar(64) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '会话ID',
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '点击时间',
+  PRIMARY KEY (`id`),
+  KEY `idx_article_id` (`article_id`),
+  KEY `idx_created_at` (`created_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='文章点击日志表';
@@ -0,0 +1,25 @@
+-- 内容计数物化表
+-- 首页分类、文章总数、/api/stats、后台首页和 v_statistics 原先每次都对 messages 做 COUNT(*) / GROUP BY，
+-- 文章越多越慢；现在由采集入库、删除、软删除和修改分类时在同一事务中增量更新本表，
+-- 统计只按主键读取。前台启动时和之后每小时（COUNTER_RECONCILE_SECONDS）按 messages 重新核对一次，
+-- 首次核对即完成已有数据的初始化，也可在 frontend 容器内手动执行
+--     python counter_reconciler.py
+
+USE `tg2em`;
+
+CREATE TABLE IF NOT EXISTS `content_counters` (
+  `scope` varchar(16) NOT NULL COMMENT '计数范围：total / sort / day',
+  `scope_key` varchar(32) NOT NULL DEFAULT '' COMMENT '范围键：sort 为 sort_id，day 为 YYYY-MM-DD，total 为空',
+  `article_count` int(11) NOT NULL DEFAULT 0 COMMENT '未删除文章数',
+  `updated_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新时间',
+  PRIMARY KEY (`scope`,`scope_key`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='内容计数';
+
+CREATE OR REPLACE VIEW `v_statistics` AS
+SELECT 
+    (SELECT COALESCE(MAX(`article_count`), 0) FROM `content_counters` WHERE `scope` = 'total' AND `scope_key` = '') AS `total_messages`,
+    (SELECT COALESCE(MAX(`article_count`), 0) FROM `content_counters` WHERE `scope` = 'day' AND `scope_key` = CAST(CURDATE() AS CHAR)) AS `today_count`,
+    (SELECT COUNT(*) FROM `channels` WHERE `is_active` = 1) AS `active_channels`,
+    (SELECT COUNT(*) FROM `content_counters` WHERE `scope` = 'sort' AND `article_count` > 0) AS `total_categories`,
+    (SELECT COUNT(*) FROM `messages` WHERE `is_pinned` = 1 AND `is_deleted` = 0) AS `pinned_messages`,
+    (SELECT COUNT(*) FROM `advertisements` WHERE `is_active` = 1) AS `active_ads`;
@@ -0,0 +1,11 @@
+-- 存储渲染后的文章正文
+-- 详情页不再每次访问都用 markdown 渲染正文：content_html 与 content_hash（正文 + 渲染版本的 SHA1）
+-- 由采集入库、后台编辑写入，哈希不一致（或为空）时详情页重新渲染并写回，旧文章无需单独回填
+-- 添加可空列支持 INSTANT，不复制表
+
+USE `tg2em`;
+
+ALTER TABLE `messages`
+  ADD COLUMN `content_html` mediumtext COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '渲染后的正文HTML' AFTER `preview_html`,
+  ADD COLUMN `content_hash` char(40) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '生成 content_html 时的正文哈希（含渲染版本）' AFTER `content_html`,
+  ALGORITHM = INSTANT;
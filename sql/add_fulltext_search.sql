@@ -0,0 +1,12 @@
+-- 为已有部署添加标题/标签的 ngram 全文索引，替代 LIKE '%词%' 全表扫描
+-- 分词长度由 MySQL 的 ngram_token_size 决定（默认 2），前端/后台通过 NGRAM_TOKEN_SIZE 与之保持一致
+--
+-- InnoDB 添加全文索引使用 INPLACE 算法，构建期间允许读、阻塞写（全文索引不支持 LOCK=NONE）；
+-- 表中还没有全文索引时会额外重建一次表以加入 FTS_DOC_ID。
+-- 数据量较大时请在采集空闲时段执行，或使用 pt-online-schema-change / gh-ost 执行同一 ALTER。
+
+USE `tg2em`;
+
+ALTER TABLE `messages`
+  ADD FULLTEXT INDEX `ft_title_tags` (`title`, `tags`) WITH PARSER ngram,
+  ALGORITHM = INPLACE, LOCK = SHARED;
@@ -0,0 +1,11 @@
+-- 为游标分页添加分类 + 发布时间的组合索引
+-- 列表按 (created_at, id) 倒序分页：WHERE created_at < ? OR (created_at = ? AND id < ?)
+-- InnoDB 二级索引隐含主键，idx_created_at 实际上就是 (created_at, id)，全站列表无需新索引；
+-- 按分类浏览时需要 (sort_id, created_at, id)，由下面的索引提供
+-- 添加二级索引支持在线执行，不阻塞读写
+
+USE `tg2em`;
+
+ALTER TABLE `messages`
+  ADD KEY `idx_sort_created` (`sort_id`, `created_at`),
+  ALGORITHM = INPLACE, LOCK = NONE;
@@ -0,0 +1,12 @@
+-- 为列表卡片添加预先生成的摘要列
+-- 列表页（首页瀑布流、搜索、分类）只查询卡片需要的列，不再读取 longtext 的 content，
+-- 摘要和首图由采集入库、后台编辑时写入；已有文章执行完本脚本后运行
+--     python backfill_previews.py
+-- 分批回填。回填完成前 preview_html 为 NULL 的文章由前端现场生成摘要，页面不受影响
+-- 添加可空列支持 INSTANT，不复制表
+
+USE `tg2em`;
+
+ALTER TABLE `messages`
+  ADD COLUMN `preview_html` text COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '列表卡片摘要（入库和编辑时生成）' AFTER `image_url`,
+  ALGORITHM = INSTANT;
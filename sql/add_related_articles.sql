@@ -0,0 +1,18 @@
+-- 预先计算的相关文章
+-- 详情页原先每次访问都取最新 100 篇文章在 Python 里算标签 Jaccard 相似度，
+-- 现在文章入库或标签变化时按标签倒排索引（message_tags，见 add_tag_index.sql）计算前 12 篇写入本表，
+-- 并把新文章写进相似文章的列表；详情页只按 (message_id, score) 索引读取。
+-- 已有文章执行完本脚本后运行
+--     python backfill_tags.py --related-only
+-- 重建全部文章的相关推荐
+
+USE `tg2em`;
+
+CREATE TABLE IF NOT EXISTS `related_articles` (
+  `message_id` int(11) NOT NULL COMMENT '文章ID',
+  `related_id` int(11) NOT NULL COMMENT '相关文章ID',
+  `score` float NOT NULL COMMENT '标签 Jaccard 相似度',
+  PRIMARY KEY (`message_id`,`related_id`),
+  KEY `idx_message_score` (`message_id`,`score`),
+  KEY `idx_related_id` (`related_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='相关文章';
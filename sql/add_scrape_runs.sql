@@ -0,0 +1,29 @@
+-- 为已有部署添加 scrape_runs 采集运行记录表
+-- 每次采集写入一条汇总行（channel 为 NULL）和每个频道一条明细行
+
+USE `tg2em`;
+
+CREATE TABLE IF NOT EXISTS `scrape_runs` (
+  `id` bigint(20) NOT NULL AUTO_INCREMENT,
+  `run_id` char(32) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '采集运行ID',
+  `channel` varchar(255) COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '频道（NULL表示整次运行汇总）',
+  `status` enum('completed','failed') NOT NULL DEFAULT 'completed' COMMENT '运行结果',
+  `error` text COLLATE utf8mb4_unicode_ci DEFAULT NULL COMMENT '错误信息',
+  `started_at` datetime NOT NULL COMMENT '开始时间',
+  `finished_at` datetime NOT NULL COMMENT '结束时间',
+  `duration_ms` int(11) NOT NULL DEFAULT 0 COMMENT '总耗时（毫秒）',
+  `total_messages` int(11) NOT NULL DEFAULT 0 COMMENT '拉取消息数',
+  `duplicate_messages` int(11) NOT NULL DEFAULT 0 COMMENT '重复消息数',
+  `new_messages` int(11) NOT NULL DEFAULT 0 COMMENT '新增消息数',
+  `blocked_tags_removed` int(11) NOT NULL DEFAULT 0 COMMENT '移除屏蔽标签数',
+  `bytes_downloaded` bigint(20) NOT NULL DEFAULT 0 COMMENT '下载字节数',
+  `bytes_uploaded` bigint(20) NOT NULL DEFAULT 0 COMMENT '上传字节数',
+  `telegram_ms` int(11) NOT NULL DEFAULT 0 COMMENT 'Telegram 耗时（毫秒）',
+  `image_ms` int(11) NOT NULL DEFAULT 0 COMMENT '图片处理耗时（毫秒）',
+  `upload_ms` int(11) NOT NULL DEFAULT 0 COMMENT '图床上传耗时（毫秒）',
+  `db_ms` int(11) NOT NULL DEFAULT 0 COMMENT '数据库耗时（毫秒）',
+  PRIMARY KEY (`id`),
+  KEY `idx_run_id` (`run_id`),
+  KEY `idx_channel_started_at` (`channel`,`started_at`),
+  KEY `idx_started_at` (`started_at`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='采集运行记录表';
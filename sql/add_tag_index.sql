@@ -0,0 +1,28 @@
+-- 标签倒排索引
+-- 标签原先只保存在 messages.tags（逗号分隔），/tag/<tag> 只能对标题做 LIKE 扫描且没有准确总数。
+-- tags 保存去重后的标签和文章数，message_tags 保存标签到文章的映射；
+-- 标签页沿 idx_tag_created 倒序做游标分页，总数直接读 tags.article_count。
+-- 新文章由采集器入库时写入，后台编辑/删除时同步；已有文章执行完本脚本后运行
+--     python backfill_tags.py
+-- 回填映射并重新统计每个标签的文章数
+
+USE `tg2em`;
+
+CREATE TABLE IF NOT EXISTS `tags` (
+  `id` int(11) NOT NULL AUTO_INCREMENT,
+  `name` varchar(100) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '标签名',
+  `article_count` int(11) NOT NULL DEFAULT 0 COMMENT '带有该标签的文章数',
+  `created_at` timestamp NULL DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+  PRIMARY KEY (`id`),
+  UNIQUE KEY `uk_name` (`name`),
+  KEY `idx_article_count` (`article_count`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='标签表';
+
+CREATE TABLE IF NOT EXISTS `message_tags` (
+  `tag_id` int(11) NOT NULL COMMENT '标签ID',
+  `message_id` int(11) NOT NULL COMMENT '文章ID',
+  `message_created_at` timestamp NULL DEFAULT NULL COMMENT '文章发布时间（冗余，用于标签页排序）',
+  PRIMARY KEY (`tag_id`,`message_id`),
+  KEY `idx_tag_created` (`tag_id`,`message_created_at`,`message_id`),
+  KEY `idx_message_id` (`message_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='标签倒排索引';
@@ -0,0 +1,10 @@
+-- 为搜索索引的增量更新添加 (updated_at, id) 索引
+-- 前台搜索引擎每 30 秒按 WHERE updated_at > ? OR (updated_at = ? AND id > ?) ORDER BY updated_at, id
+-- 读取变化的文章，没有索引时每次都是全表扫描加文件排序
+-- 添加二级索引支持在线执行，不阻塞读写
+
+USE `tg2em`;
+
+ALTER TABLE `messages`
+  ADD KEY `idx_updated_id` (`updated_at`, `id`),
+  ALGORITHM = INPLACE, LOCK = NONE;
@@ -0,0 +1,18 @@
+-- 访问日志小时汇总
+-- 后台首页的访问来源统计原先每次都对最近 7 天的 visit_logs 做 CASE ... GROUP BY，
+-- 而 visit_logs 每个公开请求写入一行；现在前台后台线程每小时（VISIT_ROLLUP_SECONDS）
+-- 把已结束的小时按来源和页面分类汇总到本表，统计只读汇总表。
+-- 已汇总且超过 VISIT_LOG_RETENTION_DAYS 天（默认 30，0 表示不清理）的原始访问日志分批删除。
+-- 首次运行会从最早的访问日志开始补齐汇总，也可在 frontend 容器内手动执行
+--     python visit_rollup.py
+
+USE `tg2em`;
+
+CREATE TABLE IF NOT EXISTS `visit_stats_hourly` (
+  `hour_start` datetime NOT NULL COMMENT '小时开始时间',
+  `visit_source` varchar(100) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '访问来源类型',
+  `page_bucket` varchar(16) COLLATE utf8mb4_unicode_ci NOT NULL COMMENT '页面分类：home / article / search / tag / api / other',
+  `visit_count` int(11) NOT NULL DEFAULT 0 COMMENT '访问次数',
+  `unique_visitors` int(11) NOT NULL DEFAULT 0 COMMENT '该小时内的独立访客数（按IP）',
+  PRIMARY KEY (`hour_start`,`visit_source`,`page_bucket`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci COMMENT='访问日志小时汇总';
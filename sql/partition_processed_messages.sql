@@ -0,0 +1,41 @@
+-- 将已有部署中的 processed_messages 表转换为按天 RANGE 分区
+-- 转换后过期记录由采集服务的分区维护任务通过 DROP PARTITION 清理，
+-- 不再在每次采集时执行 DELETE ... WHERE created_at < ...
+
+USE `tg2em`;
+
+-- 分区键必须非空且包含在主键中
+UPDATE `processed_messages` SET `created_at` = NOW() WHERE `created_at` IS NULL;
+
+ALTER TABLE `processed_messages`
+  MODIFY `created_at` datetime NOT NULL DEFAULT CURRENT_TIMESTAMP COMMENT '处理时间',
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (`channel_id`, `message_id`, `created_at`);
+
+-- 按保留期预先建好每天的分区，历史数据直接落到各自的日分区，pmax 保持为空：
+-- 维护任务之后只从空的 pmax 拆分未来分区，不会搬动数据，也不会把历史数据并进同一个分区。
+-- 早于保留期的记录落在 p_init，维护任务首次运行时整分区删除。
+-- 两个天数与 config.yaml 中的 retention_days、partition_precreate_days 保持一致
+SET @retention_days = 7;
+SET @precreate_days = 3;
+SET SESSION group_concat_max_len = 65535;
+
+WITH RECURSIVE `days` (`d`) AS (
+  SELECT CURDATE() - INTERVAL @retention_days DAY
+  UNION ALL
+  SELECT `d` + INTERVAL 1 DAY FROM `days` WHERE `d` < CURDATE() + INTERVAL @precreate_days DAY
+)
+SELECT CONCAT(
+  'ALTER TABLE `processed_messages` PARTITION BY RANGE (TO_DAYS(`created_at`)) (',
+  'PARTITION `p_init` VALUES LESS THAN (', TO_DAYS(MIN(`d`)), '), ',
+  GROUP_CONCAT(
+    CONCAT('PARTITION `p', DATE_FORMAT(`d`, '%Y%m%d'), '` VALUES LESS THAN (', TO_DAYS(`d`) + 1, ')')
+    ORDER BY `d` SEPARATOR ', '
+  ),
+  ', PARTITION `pmax` VALUES LESS THAN MAXVALUE)'
+) INTO @partition_sql
+FROM `days`;
+
+PREPARE `partition_stmt` FROM @partition_sql;
+EXECUTE `partition_stmt`;
+DEALLOCATE PREPARE `partition_stmt`;